@@ -0,0 +1,211 @@
+"""
+This module provides Annealer, a class searching for colorings with low global frustration by simulated annealing:
+MonteCarlo updates of a graph while its temperature is lowered.
+
+Requirements
+------------
+Python 3.7 or higher.
+
+Notes
+-----
+The annealer works on the colors and local actions of an existing GraphCreater, which are kept up to date by every
+swap, so changing the temperature costs only a new acceptance table of 2 * max degree + 1 entries.
+Linear and geometric schedules lower the temperature with the fraction of the budget (sweeps or seconds) used so far.
+The adaptive schedule holds each temperature for a block of sweeps and lowers it by
+T / (1 + T ln(1 + delta) / (3 sigma)), where sigma is the standard deviation of the global frustration in the block,
+so it cools slowly where the frustration fluctuates most.
+A run can be checkpointed and resumed (see run). A resumed run with a sweep budget repeats the original run exactly,
+a time budget continues with the seconds that were left.
+"""
+
+# Import dependencies
+from array import array
+from time import perf_counter
+from typing import Optional
+import math as math
+from checkpoint import Checkpointer
+from graph import GraphCreater
+
+
+class Annealer:
+    """Each instance of this class anneals a graph from a start temperature towards an end temperature."""
+
+    def __init__(
+        self,
+        graph: GraphCreater,
+        schedule: str = 'geometric',
+        start_temperature: Optional[float] = None,
+        end_temperature: float = 0.05,
+        sweeps: Optional[int] = None,
+        time_budget: Optional[float] = None,
+        rule: str = 'metropolis',
+        sweeps_per_temperature: int = 10,
+        delta: float = 1.0) -> None:
+        """
+        Parameters
+        ----------
+        graph: GraphCreater
+            Graph whose coloring is annealed in place.
+        schedule: str, default = 'geometric'
+            Temperature schedule: 'linear', 'geometric' or 'adaptive'.
+        start_temperature: Optional[float], default = None
+            First temperature, above end_temperature. By default the maximum degree of the graph, where every swap is
+            likely.
+        end_temperature: float, default = 0.05
+            Last temperature, must be positive.
+        sweeps: Optional[int], default = None
+            Largest number of sweeps.
+        time_budget: Optional[float], default = None
+            Largest number of seconds. The annealing stops at whichever budget is used up first.
+        rule: str, default = 'metropolis'
+            Acceptance rule of the MonteCarlo updates: 'metropolis' or 'heatbath'.
+        sweeps_per_temperature: int, default = 10
+            Sweeps at each temperature of the adaptive schedule.
+        delta: float, default = 1.0
+            Cooling speed of the adaptive schedule, larger is faster.
+        """
+        if schedule not in ('linear', 'geometric', 'adaptive'):
+            raise ValueError(f"Unknown schedule '{schedule}'. Use 'linear', 'geometric' or 'adaptive'.")
+        if sweeps is None and time_budget is None:
+            raise ValueError("Set a sweep budget, a time budget or both.")
+        if end_temperature <= 0:
+            raise ValueError("The end temperature must be positive.")
+
+        if start_temperature is None:
+            start_temperature = float(max(1, graph.adjacency.max_degree()))
+        if start_temperature <= end_temperature:
+            raise ValueError("The start temperature must be above the end temperature.")
+
+        self.graph = graph
+        self.schedule = schedule
+        self.start_temperature = start_temperature
+        self.end_temperature = end_temperature
+        self.sweeps = sweeps
+        self.time_budget = time_budget
+        self.rule = rule
+        self.sweeps_per_temperature = sweeps_per_temperature
+        self.delta = delta
+        self.temperature = start_temperature
+        self.best_frustration = graph.global_frustration
+        self.best_colors = array('b', graph.colors)
+        self.best_sweep = 0
+        self.temperatures = []
+
+    def temperature_at(self, progress: float) -> float:
+        """Return the temperature of the linear or geometric schedule after a fraction progress of the budget"""
+        start = self.start_temperature
+        end = self.end_temperature
+        if self.schedule == 'linear':
+            return start + (end - start) * progress
+        return start * (end / start) ** progress
+
+    def adaptive_temperature(self, block: list) -> float:
+        """Return the temperature after the current one, from the global frustration of a block of sweeps"""
+        mean = sum(block) / len(block)
+        sigma = math.sqrt(sum((h - mean) ** 2 for h in block) / len(block))
+        if sigma == 0:
+            # the coloring is frozen at this temperature
+            return self.end_temperature
+        temperature = self.temperature
+        return max(self.end_temperature, temperature / (1 + temperature * math.log(1 + self.delta) / (3 * sigma)))
+
+    def progress(self, sweep: int, elapsed: float) -> float:
+        """Return the fraction of the sweep or time budget used so far, whichever is larger"""
+        fractions = []
+        if self.sweeps is not None:
+            fractions.append(sweep / self.sweeps if self.sweeps else 1.0)
+        if self.time_budget is not None:
+            fractions.append(elapsed / self.time_budget if self.time_budget else 1.0)
+        return min(1.0, max(fractions))
+
+    def record_best(self, sweep: int) -> None:
+        """Store the coloring of the graph if its global frustration is the lowest seen"""
+        graph = self.graph
+        if graph.global_frustration < self.best_frustration:
+            self.best_frustration = graph.global_frustration
+            self.best_colors[:] = graph.colors
+            self.best_sweep = sweep
+
+    def save_checkpoint(self, checkpointer: Checkpointer, sweep: int, block: list, elapsed: float) -> None:
+        """Save the state of the graph and of the annealing after sweep sweeps"""
+        meta, arrays, series = self.graph.checkpoint_state()
+        meta['annealing'] = {'sweep': sweep, 'block': block, 'elapsed': elapsed, 'temperature': self.temperature,
+                             'best_frustration': self.best_frustration, 'best_sweep': self.best_sweep}
+        arrays['best_colors'] = self.best_colors
+        series['temperatures'] = self.temperatures
+        checkpointer.save(meta, arrays, series)
+
+    def run(self, restore_best: bool = True, checkpoint: Optional[str] = None, checkpoint_interval: float = 5.0,
+            resume: bool = False) -> dict:
+        """Anneal the graph until the budget is used up (or the adaptive schedule has reached its end temperature).
+        The global frustration after every sweep is added to the total_frustration of the graph.
+        If restore_best is true, the graph is left in the best coloring found.
+        If checkpoint is a path, the state of the annealing is saved there every checkpoint_interval seconds and at
+        the end. If resume is true, the annealing continues from that checkpoint, which must be of the same graph
+        and annealer settings.
+        Return dictionary with keys 'best_frustration', 'best_colors' (vertex label as key and color as value),
+        'best_sweep', 'final_temperature', 'sweeps', 'elapsed' (seconds) and the 'seed' and 'spawn_key' of the
+        random numbers of the graph.
+        """
+        graph = self.graph
+        start_time = perf_counter()
+        sweep = 0
+        block = []
+
+        checkpointer = Checkpointer(checkpoint, checkpoint_interval) if checkpoint else None
+        if resume:
+            if checkpointer is None:
+                raise ValueError("Resuming an annealing needs the path of its checkpoint.")
+            saved = checkpointer.load()
+            graph.restore_checkpoint(saved)
+            state = saved.meta['annealing']
+            sweep, block = state['sweep'], state['block']
+            start_time -= state['elapsed']
+            self.temperature = state['temperature']
+            self.best_frustration = state['best_frustration']
+            self.best_sweep = state['best_sweep']
+            self.best_colors[:] = saved.arrays['best_colors']
+            self.temperatures[:] = saved.series['temperatures'].tolist()
+
+        while True:
+            elapsed = perf_counter() - start_time
+            progress = self.progress(sweep, elapsed)
+            if progress >= 1.0:
+                break
+
+            if self.schedule != 'adaptive':
+                self.temperature = self.temperature_at(progress)
+            elif len(block) == self.sweeps_per_temperature:
+                if self.temperature <= self.end_temperature:
+                    break
+                self.temperature = self.adaptive_temperature(block)
+                block = []
+
+            graph.update_monte_carlo(self.temperature, self.rule)
+            sweep += 1
+            self.temperatures.append(self.temperature)
+            graph.total_frustration.append(graph.global_frustration)
+            block.append(graph.global_frustration)
+            self.record_best(sweep)
+            graph.notify_observers(sweep)
+
+            if checkpointer is not None and checkpointer.due():
+                self.save_checkpoint(checkpointer, sweep, block, perf_counter() - start_time)
+
+        if checkpointer is not None:
+            self.save_checkpoint(checkpointer, sweep, block, perf_counter() - start_time)
+
+        if restore_best and graph.colors != self.best_colors:
+            graph.colors[:] = self.best_colors
+            graph.update_vertex_frustration()
+
+        return {
+            'best_frustration': self.best_frustration,
+            'best_colors': graph.label_map.to_label_dict(self.best_colors),
+            'best_sweep': self.best_sweep,
+            'final_temperature': self.temperature,
+            'sweeps': sweep,
+            'elapsed': perf_counter() - start_time,
+            'seed': graph.rng.seed,
+            'spawn_key': graph.rng.spawn_key,
+        }
@@ -0,0 +1,247 @@
+"""
+This module provides run_benchmarks, a function timing the main operations of the simulation on generated graphs of
+growing size, fit_exponent, which fits how their time scales with the number of vertices, and compare_benchmarks,
+which lists the operations that got slower between two runs.
+
+Requirements
+------------
+Python 3.7 or higher.
+Optional: package numpy https://numpy.org/, needed for the Checkerboard sweeps (left out without it).
+
+Notes
+-----
+Every operation is timed on every graph family and size: building a GraphCreater from a list of edges,
+update_vertex_frustration, one sweep of each update procedure, global_metric and create_graph_from_file (without the
+graph cache, so the file is parsed every time). An iteration of MaxViolation is a single flip, so its sweep is one
+flip per vertex. The MaxViolation queue, the Ordered worklist and the Checkerboard independent sets are built
+before a sweep is timed. A time is the best of several repeats, repeated until min_time
+seconds are used, so small graphs are not dominated by timer noise. The scaling exponent of an operation is the slope
+of log(time) against log(vertices) in a least squares fit; it is about 1 for linear operations and 2 for an
+O(V * E) regression on sparse graphs. Results are written as JSON together with the commit they were measured on.
+
+Run as a script: python benchmarks.py --max-vertices 100000 --output benchmarks.json --compare old.json
+"""
+
+# Import dependencies
+from array import array
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Sequence
+import argparse as argparse
+import json as json
+import math as math
+import os as os
+import platform as platform
+import subprocess as subprocess
+import tempfile as tempfile
+from edge_parser import edges_to_tuples
+from graph import GraphCreater, create_graph_from_file, np
+from random_graphs import gnm_edges
+
+# Average degree of the random graphs
+AVERAGE_DEGREE = 6
+DEFAULT_SIZES = (10 ** 2, 10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6)
+SWEEP_PROCEDURES = ('Ordered', 'MaxViolation', 'MonteCarlo', 'HeatBath', 'Checkerboard')
+
+
+def random_graph_edges(num_vertices: int, seed: int = 0) -> List[tuple]:
+    """Return the edges of a G(n, m) random graph with average degree AVERAGE_DEGREE"""
+    num_edges = min(num_vertices * AVERAGE_DEGREE // 2, num_vertices * (num_vertices - 1) // 2)
+    return edges_to_tuples(gnm_edges(num_vertices, num_edges, seed))
+
+
+def lattice_edges(num_vertices: int, seed: int = 0) -> List[tuple]:
+    """Return the edges of a square lattice with periodic boundaries of about num_vertices vertices"""
+    side = max(3, round(math.sqrt(num_vertices)))
+    edges = []
+    for row in range(side):
+        for column in range(side):
+            vertex = row * side + column
+            edges.append((vertex, row * side + (column + 1) % side))
+            edges.append((vertex, ((row + 1) % side) * side + column))
+    return edges
+
+
+# Generated graph families by name
+GRAPH_FAMILIES = {
+    'random': random_graph_edges,
+    'lattice': lattice_edges,
+}
+
+
+def time_operation(operation: Callable[[], object], min_time: float = 0.2, max_repeats: int = 20,
+                   setup: Optional[Callable[[], object]] = None) -> float:
+    """Return the lowest time in seconds of calls of operation, repeated until min_time is used up.
+    setup is called before every call and not timed.
+    """
+    best = math.inf
+    total = 0.0
+    for _ in range(max_repeats):
+        if setup is not None:
+            setup()
+        start = perf_counter()
+        operation()
+        elapsed = perf_counter() - start
+        best = min(best, elapsed)
+        total += elapsed
+        if total >= min_time:
+            break
+    return best
+
+
+def fit_exponent(sizes: Sequence[float], times: Sequence[float]) -> Optional[float]:
+    """Return the slope of log(times) against log(sizes) by least squares, or None for fewer than 2 sizes"""
+    points = [(math.log(size), math.log(max(time, 1e-9))) for size, time in zip(sizes, times)]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+    if spread == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / spread
+
+
+def _commit() -> Optional[str]:
+    """Return the git commit of the working tree, or None outside a git repository"""
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark_graph(edges: List[tuple], directory: str, min_time: float = 0.2) -> Dict[str, float]:
+    """Return dictionary with operation name as key and seconds as value for one graph"""
+    times = {'construct': time_operation(lambda: GraphCreater(edges, 'All random', seed=1), min_time)}
+    graph = GraphCreater(edges, 'All random', temperature=1.0, seed=1)
+    times['update_vertex_frustration'] = time_operation(graph.update_vertex_frustration, min_time)
+    times['global_metric'] = time_operation(graph.global_metric, min_time)
+
+    # every sweep starts from the same random coloring, not from where the previous sweep left the graph
+    initial_colors = array('b', graph.colors)
+    num_vertices = len(initial_colors)
+    worklist = set()
+
+    def reset(procedure):
+        if procedure == 'Checkerboard' and graph.kernel is None and graph.checkerboard_kernel is None:
+            # the kernel and independent sets are built on the first Checkerboard sweep
+            graph.update_checkerboard()
+        graph.colors[:] = initial_colors
+        graph.update_vertex_frustration()
+        if procedure == 'MaxViolation':
+            graph._violation_queue()
+        elif procedure == 'Ordered':
+            worklist.clear()
+            worklist.update(graph.positive_vertices())
+
+    def max_violation_sweep():
+        for _ in range(num_vertices):
+            graph.update_max_violation()
+
+    sweeps = {
+        'Ordered': lambda: graph._ordered_sweep(worklist),
+        'MaxViolation': max_violation_sweep,
+        'MonteCarlo': graph.update_monte_carlo,
+        'HeatBath': lambda: graph.update_monte_carlo(rule='heatbath'),
+        'Checkerboard': graph.update_checkerboard,
+    }
+    for procedure in SWEEP_PROCEDURES:
+        if procedure == 'Checkerboard' and np is None:
+            continue
+        times['sweep_' + procedure] = time_operation(sweeps[procedure], min_time, setup=lambda: reset(procedure))
+
+    file_path = os.path.join(directory, 'edges.txt')
+    with open(file_path, 'w') as file:
+        file.write(''.join(f"{u}, {v}\n" for u, v in edges))
+    times['create_graph_from_file'] = time_operation(lambda: create_graph_from_file(file_path, use_cache=False),
+                                                     min_time)
+    return times
+
+
+def run_benchmarks(sizes: Sequence[int] = DEFAULT_SIZES, families: Sequence[str] = tuple(GRAPH_FAMILIES),
+                   min_time: float = 0.2, verbose: bool = False) -> dict:
+    """Time every operation on every graph family and size. Return dictionary with keys 'commit', 'python',
+    'numpy', 'sizes', 'results' (list of dictionaries with keys 'family', 'vertices', 'edges', 'operation' and
+    'seconds') and 'exponents' (family as key and dictionary of operation and fitted exponent as value).
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for family in families:
+            for size in sizes:
+                edges = GRAPH_FAMILIES[family](size)
+                num_vertices = len({vertex for edge in edges for vertex in edge})
+                for operation, seconds in benchmark_graph(edges, directory, min_time).items():
+                    results.append({'family': family, 'vertices': num_vertices, 'edges': len(edges),
+                                    'operation': operation, 'seconds': seconds})
+                    if verbose:
+                        print(f"{family:>8} {num_vertices:>9} {operation:>26} {seconds:.6f} s")
+
+    exponents = {}
+    for family in families:
+        exponents[family] = {}
+        for operation in dict.fromkeys(result['operation'] for result in results):
+            points = [(result['vertices'], result['seconds']) for result in results
+                      if result['family'] == family and result['operation'] == operation]
+            exponents[family][operation] = fit_exponent([v for v, _ in points], [s for _, s in points])
+
+    return {
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__ if np is not None else None,
+        'sizes': list(sizes),
+        'results': results,
+        'exponents': exponents,
+    }
+
+
+def compare_benchmarks(old: dict, new: dict, exponent_tolerance: float = 0.3, time_factor: float = 2.0) -> List[str]:
+    """Return list of messages for the operations of new whose scaling exponent grew by more than
+    exponent_tolerance, or whose time at the same family and size grew by more than time_factor, compared to old.
+    """
+    regressions = []
+    for family, operations in new['exponents'].items():
+        for operation, exponent in operations.items():
+            old_exponent = old['exponents'].get(family, {}).get(operation)
+            if exponent is not None and old_exponent is not None and exponent > old_exponent + exponent_tolerance:
+                regressions.append(f"{family} {operation}: scaling exponent {old_exponent:.2f} -> {exponent:.2f}")
+
+    old_times = {(r['family'], r['vertices'], r['operation']): r['seconds'] for r in old['results']}
+    for result in new['results']:
+        old_seconds = old_times.get((result['family'], result['vertices'], result['operation']))
+        if old_seconds and result['seconds'] > time_factor * old_seconds:
+            regressions.append(f"{result['family']} {result['operation']} at {result['vertices']} vertices: "
+                               f"{old_seconds:.6f} s -> {result['seconds']:.6f} s")
+    return regressions
+
+
+def main(arguments: Optional[List[str]] = None) -> int:
+    """Run the benchmarks from the command line. Return 1 if a comparison found regressions, otherwise 0"""
+    parser = argparse.ArgumentParser(description="Time graph construction, sweeps and file reading.")
+    parser.add_argument('--max-vertices', type=float, default=1e6, help="largest graph size (default 1e6)")
+    parser.add_argument('--families', nargs='+', default=list(GRAPH_FAMILIES), choices=list(GRAPH_FAMILIES))
+    parser.add_argument('--min-time', type=float, default=0.2, help="seconds spent timing each operation")
+    parser.add_argument('--output', default='benchmarks.json', help="JSON file of the results")
+    parser.add_argument('--compare', help="JSON file of an earlier run to compare with")
+    options = parser.parse_args(arguments)
+
+    sizes = [size for size in DEFAULT_SIZES if size <= options.max_vertices]
+    report = run_benchmarks(sizes, options.families, options.min_time, verbose=True)
+    with open(options.output, 'w') as file:
+        json.dump(report, file, indent=2)
+
+    for family, operations in report['exponents'].items():
+        for operation, exponent in operations.items():
+            if exponent is not None:
+                print(f"{family:>8} {operation:>26} scales as V^{exponent:.2f}")
+
+    if options.compare:
+        with open(options.compare) as file:
+            regressions = compare_benchmarks(json.load(file), report)
+        for regression in regressions:
+            print("Regression:", regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,139 @@
+"""
+This module provides BucketQueue, an indexed priority queue of vertices keyed by their (integer) local action.
+
+Requirements
+------------
+Python 3.7 or higher.
+
+Notes
+-----
+Local actions are integers between -max degree and +max degree, so every possible key has its own bucket.
+Moving a vertex between buckets and finding the largest key are O(1) amortised, which makes one MaxViolation
+step cost O(degree) instead of a scan over all vertices.
+"""
+
+# Import dependencies
+from array import array
+from heapq import heappush, heappop
+import random as random
+
+# Ways of breaking ties between vertices with the largest key
+TIE_BREAKS = ('first', 'random')
+
+
+def check_tie_break(tie_break: str) -> None:
+    """Raise ValueError if tie_break is not one of TIE_BREAKS"""
+    if tie_break not in TIE_BREAKS:
+        raise ValueError(f"Unknown tie break '{tie_break}'. Use 'first' or 'random'.")
+
+
+class BucketQueue:
+    """Each instance of this class keeps the vertices of a graph in buckets by local action
+    and returns a vertex with the largest local action."""
+
+    def __init__(self, keys, max_key: int, tie_break: str = 'first', rng=random) -> None:
+        """
+        Parameters
+        ----------
+        keys: sequence of int
+            Local action of each vertex, indexed by dense index.
+        max_key: int
+            Largest absolute value a key can take (the maximum degree of the graph).
+        tie_break: str, default = 'first'
+            'first' returns the vertex with the lowest dense index among the largest keys (the order of vertices_list),
+            'random' returns a uniformly random vertex among the largest keys.
+        rng: default = random
+            Source of random numbers for random tie breaking. Must provide randrange.
+        """
+        check_tie_break(tie_break)
+
+        self.tie_break = tie_break
+        self.rng = rng
+        self.max_key = max_key
+        self.keys = array('q', keys)
+        num_buckets = 2 * max_key + 1
+        self.counts = array('q', [0]) * num_buckets
+        self.top = -1
+
+        if tie_break == 'first':
+            # one heap of dense indices per bucket, entries of vertices that moved away are dropped lazily
+            self.heaps = [[] for _ in range(num_buckets)]
+            self.in_heap = [set() for _ in range(num_buckets)]
+        else:
+            # one list per bucket with the position of each vertex in its list, for O(1) removal
+            self.buckets = [[] for _ in range(num_buckets)]
+            self.positions = array('q', [0]) * len(self.keys)
+
+        for i in range(len(self.keys)):
+            self._insert(i, self.keys[i] + max_key)
+
+    def _insert(self, i: int, bucket: int) -> None:
+        """Add the vertex at dense index i to bucket"""
+        self.counts[bucket] += 1
+        if bucket > self.top:
+            self.top = bucket
+
+        if self.tie_break == 'first':
+            if i not in self.in_heap[bucket]:
+                self.in_heap[bucket].add(i)
+                heappush(self.heaps[bucket], i)
+        else:
+            self.positions[i] = len(self.buckets[bucket])
+            self.buckets[bucket].append(i)
+
+    def _remove(self, i: int, bucket: int) -> None:
+        """Remove the vertex at dense index i from bucket"""
+        self.counts[bucket] -= 1
+
+        if self.tie_break == 'random':
+            # move the last vertex of the bucket into the free position
+            members = self.buckets[bucket]
+            last = members.pop()
+            if last != i:
+                position = self.positions[i]
+                members[position] = last
+                self.positions[last] = position
+
+    def update(self, i: int, key: int) -> None:
+        """Move the vertex at dense index i to the bucket of key"""
+        old_key = self.keys[i]
+        if old_key == key:
+            return
+
+        self.keys[i] = key
+        self._remove(i, old_key + self.max_key)
+        self._insert(i, key + self.max_key)
+
+    def peek_max(self):
+        """Return the dense index of a vertex with the largest key, or None if the queue is empty"""
+        counts = self.counts
+
+        # lower the top bucket past buckets that have been emptied
+        while self.top >= 0 and counts[self.top] == 0:
+            self.top -= 1
+        if self.top < 0:
+            return None
+
+        bucket = self.top
+        if self.tie_break == 'first':
+            heap = self.heaps[bucket]
+            in_heap = self.in_heap[bucket]
+            keys = self.keys
+            key = bucket - self.max_key
+
+            # drop entries of vertices that are no longer in this bucket
+            while keys[heap[0]] != key:
+                in_heap.discard(heappop(heap))
+            return heap[0]
+
+        members = self.buckets[bucket]
+        return members[self.rng.randrange(len(members))]
+
+    def max_key_value(self):
+        """Return the largest key in the queue, or None if the queue is empty"""
+        i = self.peek_max()
+        return None if i is None else self.keys[i]
+
+    def __len__(self):
+        """Return the number of vertices in the queue"""
+        return len(self.keys)
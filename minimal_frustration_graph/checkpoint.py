@@ -0,0 +1,170 @@
+"""
+This module provides Checkpointer, a class saving the state of a long run to a checkpoint file every few seconds,
+and Checkpoint, the state read back from such a file.
+
+Requirements
+------------
+Python 3.7 or higher.
+
+Notes
+-----
+A checkpoint file is a fixed header (magic, version, length of the JSON metadata, number of arrays) followed by the
+JSON metadata and the arrays (such as the colors), each as typecode, length and little endian values. It is
+written next to its final place and renamed over the old checkpoint in one step, so a crash leaves either the old
+or the new checkpoint, never a mixture. Series that only grow (such as the global frustration of every sweep) are
+appended to a file of their own, path.<name>, so saving costs only the values added since the last checkpoint.
+The checkpoint records how many values of each series it covers, and values written after it are dropped on load.
+"""
+
+# Import dependencies
+from array import array
+from time import perf_counter
+from typing import Dict, Optional, Sequence
+import json as json
+import os as os
+import struct as struct
+import sys as sys
+
+# Checkpoint files: magic, version, bytes of the JSON metadata and number of arrays, all little endian
+CHECKPOINT_MAGIC = b'MFCHKPT\0'
+CHECKPOINT_VERSION = 2
+CHECKPOINT_HEADER = struct.Struct('<8sIQI')
+ARRAY_HEADER = struct.Struct('<cQ')
+
+
+def _little_endian(values: array) -> bytes:
+    """Return the values of an array as little endian bytes"""
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_little_endian(typecode: str, data: bytes) -> array:
+    """Return the array of little endian bytes"""
+    values = array(typecode, data)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+class Checkpoint:
+    """Each instance of this class is the state of a run read from a checkpoint file."""
+
+    def __init__(self, meta: dict, arrays: Dict[str, array], series: Dict[str, array]) -> None:
+        """
+        Parameters
+        ----------
+        meta: dict
+            JSON metadata of the run, such as the step and the state of the random numbers.
+        arrays: Dict[str, array]
+            Arrays saved in full with every checkpoint, such as the colors.
+        series: Dict[str, array]
+            Series of floats appended to with every checkpoint, such as the history of the global frustration.
+        """
+        self.meta = meta
+        self.arrays = arrays
+        self.series = series
+
+    def __repr__(self):
+        """Return a Python-like representation of this instance"""
+        return (f"Checkpoint(flips={self.meta.get('flip_count')}, arrays={list(self.arrays)}, "
+                f"series={list(self.series)})")
+
+
+class Checkpointer:
+    """Each instance of this class saves checkpoints of a run to one path, at most once per interval."""
+
+    def __init__(self, path: str, interval: float = 5.0) -> None:
+        """
+        Parameters
+        ----------
+        path: str
+            Path of the checkpoint file. Series are appended to path.<name>.
+        interval: float, default = 5.0
+            Seconds between checkpoints, see due.
+        """
+        self.path = path
+        self.interval = interval
+        self.last_saved = perf_counter()
+        # values of every series already written
+        self.series_lengths = {}
+
+    def due(self) -> bool:
+        """Return true if the last checkpoint is at least interval seconds old"""
+        return perf_counter() - self.last_saved >= self.interval
+
+    def _series_path(self, name: str) -> str:
+        """Return the path of the file of a series"""
+        return f"{self.path}.{name}"
+
+    def save(self, meta: dict, arrays: Optional[Dict[str, array]] = None,
+             series: Optional[Dict[str, Sequence[float]]] = None) -> None:
+        """Save a checkpoint: meta, the arrays in full and the values of every series added since the last save"""
+        arrays = arrays or {}
+        series = series or {}
+
+        lengths = {}
+        for name, values in series.items():
+            written = self.series_lengths.get(name, 0)
+            # a new run starts its series files again
+            with open(self._series_path(name), 'ab' if written else 'wb') as file:
+                file.write(_little_endian(array('d', values[written:])))
+                file.flush()
+                os.fsync(file.fileno())
+            lengths[name] = len(values)
+
+        meta_bytes = json.dumps(dict(meta, series=lengths)).encode()
+        temporary_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary_path, 'wb') as file:
+            file.write(CHECKPOINT_HEADER.pack(CHECKPOINT_MAGIC, CHECKPOINT_VERSION, len(meta_bytes), len(arrays)))
+            file.write(meta_bytes)
+            for name, values in arrays.items():
+                name_bytes = name.encode()
+                file.write(struct.pack('<I', len(name_bytes)) + name_bytes)
+                file.write(ARRAY_HEADER.pack(values.typecode.encode(), len(values)))
+                file.write(_little_endian(values))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, self.path)
+
+        self.series_lengths = lengths
+        self.last_saved = perf_counter()
+
+    def load(self) -> Checkpoint:
+        """Return the last checkpoint saved to path. Later saves append to the series of this checkpoint."""
+        with open(self.path, 'rb') as file:
+            data = file.read()
+
+        if len(data) < CHECKPOINT_HEADER.size:
+            raise ValueError(f"{self.path} is not a checkpoint file.")
+        magic, version, meta_length, num_arrays = CHECKPOINT_HEADER.unpack_from(data)
+        if magic != CHECKPOINT_MAGIC:
+            raise ValueError(f"{self.path} is not a checkpoint file.")
+        if version != CHECKPOINT_VERSION:
+            raise ValueError(f"{self.path} has checkpoint version {version}, expected {CHECKPOINT_VERSION}.")
+
+        position = CHECKPOINT_HEADER.size
+        meta = json.loads(data[position:position + meta_length])
+        position += meta_length
+        arrays = {}
+        for _ in range(num_arrays):
+            (name_length,) = struct.unpack_from('<I', data, position)
+            position += 4
+            name = data[position:position + name_length].decode()
+            position += name_length
+            typecode, length = ARRAY_HEADER.unpack_from(data, position)
+            position += ARRAY_HEADER.size
+            end = position + length * array(typecode.decode()).itemsize
+            arrays[name] = _from_little_endian(typecode.decode(), data[position:end])
+            position = end
+
+        # drop values appended after the checkpoint
+        series = {}
+        for name, length in meta.pop('series').items():
+            with open(self._series_path(name), 'r+b') as file:
+                file.truncate(length * 8)
+                series[name] = _from_little_endian('d', file.read())
+        self.series_lengths = {name: len(values) for name, values in series.items()}
+        self.last_saved = perf_counter()
+        return Checkpoint(meta, arrays, series)
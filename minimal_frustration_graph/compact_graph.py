@@ -0,0 +1,509 @@
+"""
+This module provides CompactGraph, a class storing the adjacency of a graph in compressed sparse row (CSR) form,
+and LabelMap, a class translating between the vertex labels of the user and the dense positions 0..V-1.
+
+Requirements
+------------
+Python 3.7 or higher.
+
+Notes
+-----
+The neighbours of the vertex at position i are stored in indices[offsets[i]:offsets[i + 1]] as positions in the
+vertices list. Offsets and indices are arrays of machine ints, which keeps the memory of large graphs small.
+Labels are only used when a graph is read and when results are reported, everything in between uses positions.
+
+A compact graph can be saved to a binary file (see save) of a fixed header followed by the label table, the offsets
+and the indices, each starting at a multiple of 8 bytes. load maps the file into memory and casts memoryviews onto
+its sections, so nothing is parsed or copied, indexing still returns Python ints, and processes loading the same file
+share its pages through the page cache of the operating system.
+"""
+
+# Import dependencies
+from array import array
+from typing import List, Dict, Iterable, Optional
+import json as json
+import mmap as mmap
+import os as os
+import struct as struct
+import sys as sys
+
+# Optional dependency for building graphs from edge arrays
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Binary graph files: magic, version, label kind, vertices, stored neighbours, then start and length of the labels
+# and start of the offsets and of the indices, all little endian
+GRAPH_FILE_MAGIC = b'MFGRAPH\0'
+GRAPH_FILE_VERSION = 1
+GRAPH_FILE_HEADER = struct.Struct('<8sIIQQQQQQ')
+# labels stored as an int64 table or as a JSON list
+INT_LABELS = 0
+JSON_LABELS = 1
+
+
+def _aligned(position: int) -> int:
+    """Return the first multiple of 8 at or after position"""
+    return (position + 7) & ~7
+
+
+def _first_occurrences(values) -> tuple:
+    """Return the distinct values of a numpy array in increasing order, the position of the first occurrence of
+    each, and the index of every element in the distinct values.
+    """
+    by_value = np.argsort(values)
+    sorted_values = values[by_value]
+    new_value = np.ones(len(values), dtype=bool)
+    new_value[1:] = sorted_values[1:] != sorted_values[:-1]
+    starts = np.flatnonzero(new_value)
+
+    first = np.minimum.reduceat(by_value, starts) if len(values) else by_value
+    inverse = np.empty(len(values), dtype=np.int64)
+    inverse[by_value] = np.cumsum(new_value) - 1
+    return sorted_values[starts], first, inverse
+
+
+class LabelMap:
+    """Each instance of this class maps vertex labels to dense positions 0..V-1 and back."""
+
+    def __init__(self, labels: Optional[list] = None, index: Optional[dict] = None) -> None:
+        """
+        Parameters
+        ----------
+        labels: Optional[list], default = None
+            Vertex labels, the position of a label in the list is its dense index.
+        index: Optional[dict], default = None
+            Dictionary with vertex label as key and dense index as value. Built from labels when first needed.
+        """
+        if labels is None:
+            labels = []
+        self.labels = labels
+        self._index = index
+
+    @property
+    def index(self) -> dict:
+        """Dictionary with vertex label as key and dense index as value, built on first use"""
+        if self._index is None:
+            self._index = {label: i for i, label in enumerate(self.labels)}
+        return self._index
+
+    def add(self, label) -> int:
+        """Return the dense index of label, giving it the next free index if it is new"""
+        i = self.index.get(label)
+        if i is None:
+            i = self.index[label] = len(self.labels)
+            self.labels.append(label)
+        return i
+
+    def to_index(self, label) -> int:
+        """Return the dense index of label"""
+        return self.index[label]
+
+    def to_label(self, i: int):
+        """Return the label of the vertex at dense index i"""
+        return self.labels[i]
+
+    def to_label_dict(self, values) -> dict:
+        """Return dictionary with vertex label as key and values[i] of its dense index i as value"""
+        return dict(zip(self.labels, values))
+
+    def __len__(self):
+        """Return the number of labels in the map"""
+        return len(self.labels)
+
+    def __contains__(self, label):
+        """Return true if label has a dense index"""
+        return label in self.index
+
+    def __eq__(self, other):
+        """Return true if both maps give the same index to the same labels"""
+        if not isinstance(other, LabelMap):
+            return NotImplemented
+        return len(self.labels) == len(other.labels) and list(self.labels) == list(other.labels)
+
+
+class CompactGraph:
+    """Each instance of this class stores the vertices and the neighbours of an undirected graph in CSR form."""
+
+    def __init__(
+        self,
+        label_map: LabelMap,
+        offsets: array,
+        indices: array) -> None:
+        """
+        Parameters
+        ----------
+        label_map: LabelMap
+            Vertex labels in order of first appearance. The dense index of a label is its position in the CSR arrays.
+        offsets: array('q')
+            Start of the neighbours of each vertex in indices, with len(label_map) + 1 entries.
+            A memoryview of int64 for graphs loaded from a file.
+        indices: array('i')
+            Dense indices of the neighbours of every vertex, stored row after row.
+            A memoryview of int32 for graphs loaded from a file.
+        """
+        self.label_map = label_map
+        self.offsets = offsets
+        self.indices = indices
+        # binary file the graph was loaded from, if any
+        self.path = None
+
+    @classmethod
+    def from_edges(cls, edges: Iterable, num_vertices: Optional[int] = None) -> "CompactGraph":
+        """Return the compact graph of an iterable of edges (tuples of 2 vertex labels), built in one O(V + E) pass.
+        Labels are mapped to dense indices 0..V-1 in order of first appearance, after the labels 0..num_vertices-1
+        (which keep their own index, vertices without edges included) if num_vertices is given.
+        Self loops and repeated edges are dropped, and the neighbours of each vertex keep the order of the edges.
+        """
+        vertices = list(range(num_vertices)) if num_vertices else []
+        vertex_index = {i: i for i in vertices}
+        degree = array('q', [0]) * len(vertices)
+        sources = array('i')
+        targets = array('i')
+
+        # relabel vertices in order of first appearance (inlined LabelMap.add) and count the degree of each vertex
+        for x, y in edges:
+            i = vertex_index.get(x)
+            if i is None:
+                i = vertex_index[x] = len(vertices)
+                vertices.append(x)
+                degree.append(0)
+            j = vertex_index.get(y)
+            if j is None:
+                j = vertex_index[y] = len(vertices)
+                vertices.append(y)
+                degree.append(0)
+
+            # a vertex is not its own neighbour
+            if i != j:
+                sources.append(i)
+                targets.append(j)
+                degree[i] += 1
+                degree[j] += 1
+
+        # prefix sum of the degrees gives the start of each row
+        num_vertices = len(vertices)
+        offsets = array('q', [0]) * (num_vertices + 1)
+        for i in range(num_vertices):
+            offsets[i + 1] = offsets[i] + degree[i]
+
+        # fill the rows in the order of the edges
+        fill = offsets[:-1]
+        indices = array('i', [0]) * offsets[num_vertices]
+        for i, j in zip(sources, targets):
+            indices[fill[i]] = j
+            fill[i] += 1
+            indices[fill[j]] = i
+            fill[j] += 1
+
+        # drop repeated neighbours in place, marking each neighbour with the row it was last seen in
+        last_seen = array('i', [-1]) * num_vertices
+        write = 0
+        start = 0
+        for i in range(num_vertices):
+            end = offsets[i + 1]
+            for k in range(start, end):
+                j = indices[k]
+                if last_seen[j] != i:
+                    last_seen[j] = i
+                    indices[write] = j
+                    write += 1
+            start = end
+            offsets[i + 1] = write
+        del indices[write:]
+
+        return cls(LabelMap(vertices, vertex_index), offsets, indices)
+
+    @classmethod
+    def from_edge_array(cls, edges, num_vertices: Optional[int] = None) -> "CompactGraph":
+        """Return the compact graph of an (E x 2) numpy array of integer vertex labels, built with vectorised
+        operations. The result is equal to from_edges of the same edges.
+        If num_vertices is given, the labels must be 0..num_vertices-1 and are used as dense indices directly.
+        """
+        if np is None:
+            raise ImportError("Building a graph from an edge array requires numpy, which can be installed via PIP.")
+
+        edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        if num_vertices is not None:
+            labels = np.arange(num_vertices)
+            pairs = edges
+        else:
+            # relabel vertices in order of first appearance
+            labels, first, inverse = _first_occurrences(edges.ravel())
+            order = np.argsort(first)
+            dense = np.empty(len(labels), dtype=np.int64)
+            dense[order] = np.arange(len(labels))
+            pairs = dense[inverse].reshape(-1, 2)
+            labels = labels[order]
+            num_vertices = len(labels)
+
+        # both directions of every edge that is not a self loop, in the order of the edges
+        pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+        rows = pairs.ravel()
+        columns = pairs[:, ::-1].ravel()
+
+        # drop repeated neighbours, keeping the first one in the order of the edges, and sort by row keeping
+        # the order of the edges
+        _, kept, _ = _first_occurrences(rows * num_vertices + columns)
+        kept = np.sort(rows[kept] * len(rows) + kept) % max(1, len(rows))
+        rows = rows[kept]
+        columns = columns[kept]
+
+        offsets = np.zeros(num_vertices + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=num_vertices), out=offsets[1:])
+        return cls(LabelMap(labels.tolist()), array('q', offsets.tobytes()),
+                   array('i', columns.astype(np.int32).tobytes()))
+
+    def save(self, path: str) -> None:
+        """Write the graph to a binary file at path that load can map into memory"""
+        labels = self.vertices
+        offsets = array('q', self.offsets)
+        indices = array('i', self.indices)
+        sections = [offsets, indices]
+        if all(type(label) is int and -2 ** 63 <= label < 2 ** 63 for label in labels):
+            label_kind = INT_LABELS
+            label_table = array('q', labels)
+            sections.append(label_table)
+        else:
+            label_kind = JSON_LABELS
+            label_table = json.dumps(list(labels)).encode()
+
+        # the file is little endian on every machine
+        if sys.byteorder != 'little':
+            for section in sections:
+                section.byteswap()
+        label_bytes = bytes(label_table)
+
+        labels_start = _aligned(GRAPH_FILE_HEADER.size)
+        offsets_start = _aligned(labels_start + len(label_bytes))
+        indices_start = _aligned(offsets_start + 8 * len(offsets))
+        header = GRAPH_FILE_HEADER.pack(GRAPH_FILE_MAGIC, GRAPH_FILE_VERSION, label_kind, self.num_vertices,
+                                        len(indices), labels_start, len(label_bytes), offsets_start, indices_start)
+
+        with open(path, 'wb') as file:
+            for start, section in ((0, header), (labels_start, label_bytes), (offsets_start, offsets.tobytes()),
+                                   (indices_start, indices.tobytes())):
+                file.write(bytes(start - file.tell()))
+                file.write(section)
+
+    @classmethod
+    def load(cls, path: str) -> "CompactGraph":
+        """Return the graph of a binary file written by save, mapped into memory without copying"""
+        with open(path, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            if size < GRAPH_FILE_HEADER.size:
+                raise ValueError(f"{path} is not a graph file.")
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, label_kind, num_vertices, num_indices, labels_start, labels_length, offsets_start,
+         indices_start) = GRAPH_FILE_HEADER.unpack_from(buffer)
+        if magic != GRAPH_FILE_MAGIC:
+            raise ValueError(f"{path} is not a graph file.")
+        if version != GRAPH_FILE_VERSION:
+            raise ValueError(f"{path} has graph file version {version}, expected {GRAPH_FILE_VERSION}.")
+        if indices_start + 4 * num_indices > size:
+            raise ValueError(f"{path} is truncated.")
+
+        view = memoryview(buffer)
+        labels = view[labels_start:labels_start + labels_length]
+        offsets = view[offsets_start:offsets_start + 8 * (num_vertices + 1)].cast('q')
+        indices = view[indices_start:indices_start + 4 * num_indices].cast('i')
+        labels = labels.cast('q') if label_kind == INT_LABELS else json.loads(bytes(labels))
+
+        # machines storing ints big endian read a swapped copy instead
+        if sys.byteorder != 'little':
+            offsets, indices = array('q', offsets), array('i', indices)
+            offsets.byteswap()
+            indices.byteswap()
+            if label_kind == INT_LABELS:
+                labels = array('q', labels)
+                labels.byteswap()
+
+        graph = cls(LabelMap(labels), offsets, indices)
+        graph.path = os.fspath(path)
+        return graph
+
+    def __getstate__(self):
+        """Pickle a graph loaded from a file as its path, so other processes map the same file"""
+        if getattr(self, 'path', None) is not None:
+            return {'path': self.path}
+        return self.__dict__
+
+    def __setstate__(self, state):
+        """Restore a pickled graph, mapping its file again if it was loaded from one"""
+        if 'path' in state and len(state) == 1:
+            state = CompactGraph.load(state['path']).__dict__
+        self.__dict__.update(state)
+
+    @property
+    def vertices(self) -> list:
+        """Return the vertex labels in order of their dense index"""
+        return self.label_map.labels
+
+    @property
+    def num_vertices(self) -> int:
+        """Return the number of vertices of the graph"""
+        return len(self.vertices)
+
+    @property
+    def num_edges(self) -> int:
+        """Return the number of (undirected) edges of the graph"""
+        return len(self.indices) // 2
+
+    def degree(self, i: int) -> int:
+        """Return the number of neighbours of the vertex at dense index i"""
+        return self.offsets[i + 1] - self.offsets[i]
+
+    def max_degree(self) -> int:
+        """Return the largest number of neighbours of any vertex"""
+        offsets = self.offsets
+        return max((offsets[i + 1] - offsets[i] for i in range(len(self.vertices))), default=0)
+
+    def neighbours(self, i: int) -> array:
+        """Return the dense indices of the neighbours of the vertex at dense index i"""
+        return self.indices[self.offsets[i]:self.offsets[i + 1]]
+
+    def edge_list(self) -> List[tuple]:
+        """Return list of the edges (tuples of 2 vertex labels), each undirected edge once"""
+        vertices = self.vertices
+        offsets = self.offsets
+        indices = self.indices
+
+        return [(vertex, vertices[j]) for i, vertex in enumerate(vertices)
+                for j in indices[offsets[i]:offsets[i + 1]] if j > i]
+
+    def greedy_coloring(self) -> array:
+        """Return array('i') with the class of every vertex in a greedy colouring of the graph, visiting vertices
+        in order of decreasing degree. Vertices of the same class are never neighbours.
+        (These classes are unrelated to the 0/1 colours that are simulated.)
+        """
+        num_vertices = self.num_vertices
+        offsets = self.offsets
+        indices = self.indices
+        classes = array('i', [-1]) * num_vertices
+        # used[c] == i marks class c as taken by a neighbour of vertex i
+        used = array('i', [-1]) * (self.max_degree() + 1)
+
+        for i in sorted(range(num_vertices), key=lambda i: offsets[i] - offsets[i + 1]):
+            for j in indices[offsets[i]:offsets[i + 1]]:
+                if classes[j] >= 0:
+                    used[classes[j]] = i
+            new_class = 0
+            while used[new_class] == i:
+                new_class += 1
+            classes[i] = new_class
+
+        return classes
+
+    def independent_sets(self) -> List[array]:
+        """Return list with the dense indices (in increasing order) of the vertices of each greedy colouring class"""
+        independent_sets = []
+        for i, vertex_class in enumerate(self.greedy_coloring()):
+            while vertex_class >= len(independent_sets):
+                independent_sets.append(array('i'))
+            independent_sets[vertex_class].append(i)
+        return independent_sets
+
+    def connected_components(self) -> array:
+        """Return array('i') with the component of every vertex, components numbered in order of their first vertex"""
+        offsets = self.offsets
+        indices = self.indices
+        components = array('i', [-1]) * self.num_vertices
+        num_components = 0
+
+        for start in range(self.num_vertices):
+            if components[start] < 0:
+                components[start] = num_components
+                stack = [start]
+                while stack:
+                    i = stack.pop()
+                    for j in indices[offsets[i]:offsets[i + 1]]:
+                        if components[j] < 0:
+                            components[j] = num_components
+                            stack.append(j)
+                num_components += 1
+
+        return components
+
+    def subgraph(self, keep) -> "CompactGraph":
+        """Return the compact graph induced by the vertices with a true value in keep (one value per dense index).
+        Vertices and neighbours keep their order and labels.
+        """
+        offsets = self.offsets
+        indices = self.indices
+
+        if np is not None:
+            keep = np.asarray(keep, dtype=bool)
+            new_index = np.cumsum(keep) - 1
+            columns = np.asarray(indices, dtype=np.int64)
+            rows = np.repeat(np.arange(self.num_vertices), np.diff(np.asarray(offsets, dtype=np.int64)))
+            kept = keep[rows] & keep[columns]
+            new_offsets = np.zeros(int(keep.sum()) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(new_index[rows[kept]], minlength=len(new_offsets) - 1), out=new_offsets[1:])
+            labels = [label for label, kept_vertex in zip(self.vertices, keep.tolist()) if kept_vertex]
+            return CompactGraph(LabelMap(labels), array('q', new_offsets.tobytes()),
+                                array('i', new_index[columns[kept]].astype(np.int32).tobytes()))
+
+        new_index = array('i', [-1]) * self.num_vertices
+        labels = []
+        for i, kept_vertex in enumerate(keep):
+            if kept_vertex:
+                new_index[i] = len(labels)
+                labels.append(self.vertices[i])
+        new_offsets = array('q', [0])
+        new_indices = array('i')
+        for i in range(self.num_vertices):
+            if new_index[i] >= 0:
+                new_indices.extend(new_index[j] for j in indices[offsets[i]:offsets[i + 1]] if new_index[j] >= 0)
+                new_offsets.append(len(new_indices))
+        return CompactGraph(LabelMap(labels), new_offsets, new_indices)
+
+    def largest_component(self, components: Optional[array] = None) -> "CompactGraph":
+        """Return the compact graph of the largest connected component (the first of them if several are largest).
+        components (one per dense index, e.g. from connected_components) is computed if not given.
+        """
+        if components is None:
+            components = self.connected_components()
+        if not len(components):
+            return self.subgraph([])
+
+        sizes = [0] * (max(components) + 1)
+        for component in components:
+            sizes[component] += 1
+        largest = sizes.index(max(sizes))
+        return self.subgraph([component == largest for component in components])
+
+    def neighbour_dict(self) -> Dict[object, List]:
+        """Return dictionary of vertex labels as key and the labels of their neighbours as value"""
+        vertices = self.vertices
+        offsets = self.offsets
+        indices = self.indices
+
+        return {vertex: [vertices[j] for j in indices[offsets[i]:offsets[i + 1]]]
+                for i, vertex in enumerate(vertices)}
+
+    def __eq__(self, other):
+        """Return true if vertices and adjacency of this instance are equal to those of other"""
+        if not isinstance(other, CompactGraph):
+            return NotImplemented
+        return (self.label_map == other.label_map and self.offsets == other.offsets
+                and self.indices == other.indices)
+
+    def __repr__(self):
+        """Return a Python-like representation of this instance"""
+        return f"CompactGraph(vertices={self.num_vertices}, edges={self.num_edges})"
+
+
+def as_compact_graph(graph) -> CompactGraph:
+    """Return graph as a CompactGraph: a CompactGraph as it is, a path of a binary graph file mapped into memory,
+    an (E x 2) numpy array of edges or an iterable of edges.
+    """
+    if isinstance(graph, CompactGraph):
+        return graph
+    if isinstance(graph, (str, os.PathLike)):
+        return CompactGraph.load(graph)
+    if np is not None and isinstance(graph, np.ndarray):
+        return CompactGraph.from_edge_array(graph)
+    return CompactGraph.from_edges(graph)
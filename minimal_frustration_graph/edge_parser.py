@@ -0,0 +1,181 @@
+"""
+This module provides functions reading edge lists ('a, b' or '(a,b)' per line) from large files in byte chunks:
+read_edges returns all edges at once and iter_edge_batches yields the edges of one chunk at a time.
+
+Requirements
+------------
+Python 3.7 or higher.
+Optional: package numpy https://numpy.org/, which makes the edges (k x 2) int64 arrays instead of lists of tuples.
+
+Notes
+-----
+A line is an edge if, with all brackets removed, it is two non-negative integers separated by one comma.
+Empty lines and lines starting with # are skipped, every other line is counted as a bad line in a ParseReport.
+With numpy, a chunk is first checked as a whole with vectorised byte counts: if every line is an edge or empty,
+all numbers are converted in one call. Chunks with comments or bad lines are parsed with a regular expression.
+"""
+
+# Import dependencies
+from typing import Iterator, List, Optional
+import re as re
+
+# Optional dependency for the vectorised parser
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Lines of a chunk (with brackets removed) that are edges, and lines that are empty or comments
+EDGE_LINE = re.compile(rb'^[ \t\r\f\v]*(\d+)[ \t\r\f\v]*,[ \t\r\f\v]*(\d+)[ \t\r\f\v]*$', re.MULTILINE)
+SKIPPED_LINE = re.compile(rb'^[ \t\r\f\v]*(?:#.*)?$', re.MULTILINE)
+
+# Number of bad lines kept as examples in a ParseReport
+MAX_EXAMPLES = 5
+
+
+class ParseReport:
+    """Each instance of this class counts the lines, edges and bad lines of a parsed edge list."""
+
+    def __init__(self) -> None:
+        self.lines = 0
+        self.edges = 0
+        self.bad_lines = 0
+        # (line number, line) of the first bad lines
+        self.examples = []
+
+    def summary(self) -> str:
+        """Return one line describing the bad lines"""
+        if not self.bad_lines:
+            return f"Read {self.edges} edges from {self.lines} lines."
+        line_number, line = self.examples[0]
+        return (f"Invalid input: {self.bad_lines} of {self.lines} lines skipped "
+                f"(first at line {line_number}: {line!r}).")
+
+    def __repr__(self):
+        """Return a Python-like representation of this instance"""
+        return f"ParseReport(lines={self.lines}, edges={self.edges}, bad_lines={self.bad_lines})"
+
+
+def _parse_clean_chunk(text: bytes):
+    """Return (k x 2) int64 array of the edges of text (brackets removed, ending with a newline) if every line
+    is an edge or empty, otherwise None.
+    """
+    # other characters than digits, commas and white space need the line by line parser
+    if text.translate(None, b'0123456789, \t\r\f\v\n'):
+        return None
+
+    data = np.frombuffer(text, dtype=np.uint8)
+    digit = (data >= ord('0')) & (data <= ord('9'))
+    # positions of the first digit of every number, of the commas and of the line ends
+    starts = digit.copy()
+    starts[1:] &= ~digit[:-1]
+    starts = np.flatnonzero(starts)
+    commas = np.flatnonzero(data == ord(','))
+    line_ends = np.flatnonzero(data == ord('\n'))
+
+    # numbers and commas of every line, from the number of them before each line end
+    numbers_per_line = np.diff(np.searchsorted(starts, line_ends), prepend=0)
+    commas_per_line = np.diff(np.searchsorted(commas, line_ends), prepend=0)
+    edge = (numbers_per_line == 2) & (commas_per_line == 1)
+    if not np.all(edge | ((numbers_per_line == 0) & (commas_per_line == 0))):
+        return None
+
+    # the comma of an edge must come after its first number
+    numbers_before_line = np.cumsum(numbers_per_line) - numbers_per_line
+    numbers_before_comma = np.searchsorted(starts, commas) - numbers_before_line[np.searchsorted(line_ends, commas)]
+    if not np.all(numbers_before_comma == 1):
+        return None
+
+    numbers = np.fromstring(text.replace(b',', b' '), dtype=np.int64, sep=' ')
+    return numbers.reshape(-1, 2)
+
+
+def _parse_chunk(chunk: bytes, report: ParseReport):
+    """Return the edges of a chunk of whole lines ending with a newline and add its lines to report"""
+    text = chunk.translate(None, b'()')
+    num_lines = text.count(b'\n')
+    first_line = report.lines + 1
+    report.lines += num_lines
+
+    if np is not None:
+        edges = _parse_clean_chunk(text)
+        if edges is not None:
+            report.edges += len(edges)
+            return edges
+
+    text = text[:-1]
+    pairs = EDGE_LINE.findall(text)
+    bad_lines = num_lines - len(pairs) - len(SKIPPED_LINE.findall(text))
+    report.edges += len(pairs)
+    report.bad_lines += bad_lines
+
+    # look up the first bad lines for the report
+    if bad_lines and len(report.examples) < MAX_EXAMPLES:
+        for line_number, line in enumerate(chunk.split(b'\n'), first_line):
+            stripped = line.translate(None, b'()')
+            if not (EDGE_LINE.fullmatch(stripped) or SKIPPED_LINE.fullmatch(stripped)):
+                report.examples.append((line_number, line.decode(errors='replace').strip()))
+                if len(report.examples) == MAX_EXAMPLES:
+                    break
+
+    if np is not None:
+        return np.array(pairs, dtype=np.int64).reshape(-1, 2)
+    return [(int(x), int(y)) for x, y in pairs]
+
+
+def iter_edge_batches(file_path: str, chunk_size: int = 1 << 23,
+                      report: Optional[ParseReport] = None) -> Iterator:
+    """Read the file at file_path in chunks of about chunk_size bytes and yield the edges of each chunk, as a
+    (k x 2) int64 array with numpy or a list of tuples without. Memory use is bounded by the chunk size.
+    Lines are counted in report if one is given.
+    """
+    if report is None:
+        report = ParseReport()
+
+    with open(file_path, 'rb') as file:
+        remainder = b''
+        while True:
+            data = file.read(chunk_size)
+            if not data:
+                break
+            data = remainder + data
+
+            # parse whole lines only and keep the unfinished last line for the next chunk
+            cut = data.rfind(b'\n') + 1
+            remainder = data[cut:]
+            if cut:
+                yield _parse_chunk(data[:cut], report)
+
+        if remainder:
+            yield _parse_chunk(remainder + b'\n', report)
+
+
+def read_edges(file_path: str, chunk_size: int = 1 << 23) -> tuple:
+    """Return the edges of the file at file_path, as one (E x 2) int64 array with numpy or a list of tuples
+    without, and the ParseReport of the file.
+    """
+    report = ParseReport()
+    batches = list(iter_edge_batches(file_path, chunk_size, report))
+
+    if np is not None:
+        edges = np.concatenate(batches) if batches else np.empty((0, 2), dtype=np.int64)
+    else:
+        edges = [edge for batch in batches for edge in batch]
+    return edges, report
+
+
+def parse_edge_lines(lines: List[str]) -> tuple:
+    """Return the edges of a list of lines as a list of tuples, and the ParseReport of the lines"""
+    report = ParseReport()
+    if not lines:
+        return [], report
+
+    edges = _parse_chunk('\n'.join(lines).encode() + b'\n', report)
+    return edges_to_tuples(edges), report
+
+
+def edges_to_tuples(edges) -> List[tuple]:
+    """Return list of tuples of 2 ints of an (E x 2) array or a list of tuples of edges"""
+    if np is not None and isinstance(edges, np.ndarray):
+        return list(map(tuple, edges.tolist()))
+    return list(edges)
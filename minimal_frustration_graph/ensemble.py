@@ -0,0 +1,134 @@
+"""
+This module provides run_ensemble and aggregate_ensemble, functions running a grid of simulations
+(graphs x color patterns x update procedures x seeds) on a pool of worker processes.
+
+Requirements
+------------
+Python 3.7 or higher.
+
+Notes
+-----
+Every worker compiles each graph once when it starts, so a job only sends its configuration and receives a small
+result dictionary. Jobs are sent in chunks to keep the overhead per job low when runs are short.
+"""
+
+# Import dependencies
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import product
+from typing import Dict, Iterable, Iterator, List, Optional
+import os
+from compact_graph import CompactGraph, as_compact_graph
+from graph import GraphCreater
+
+# Compiled graphs of a worker process, by graph name
+_worker_graphs = {}
+
+
+def _init_worker(graphs: Dict[str, list]) -> None:
+    """Compile the edges of every graph once in a new worker process"""
+    _worker_graphs.clear()
+    for name, edges in graphs.items():
+        _worker_graphs[name] = as_compact_graph(edges)
+
+
+def run_job(adjacency: CompactGraph, graph_name: str, color_pattern: str, update_procedure: str, seed: int,
+            iterations: int, stop_at_convergence: bool = True) -> dict:
+    """Run one simulation and return dictionary with its configuration and results"""
+    graph = GraphCreater(adjacency, color_pattern, seed=seed)
+    convergence = graph.run_simulation(update_procedure, iterations, stop_at_convergence=stop_at_convergence)
+
+    history = graph.total_frustration
+    best_frustration = history.min
+
+    return {
+        'graph': graph_name,
+        'color_pattern': color_pattern,
+        'update_procedure': update_procedure,
+        'seed': seed,
+        'final_frustration': graph.global_frustration,
+        'best_frustration': best_frustration,
+        'best_step': history.argmin,
+        'converged': convergence['converged'],
+        'sweeps': convergence['sweeps'],
+        'flips': convergence['flips'],
+    }
+
+
+def _run_jobs(jobs: List[tuple], iterations: int, stop_at_convergence: bool) -> List[dict]:
+    """Run a chunk of jobs in a worker process"""
+    return [run_job(_worker_graphs[graph_name], graph_name, color_pattern, update_procedure, seed,
+                    iterations, stop_at_convergence)
+            for graph_name, color_pattern, update_procedure, seed in jobs]
+
+
+def run_ensemble(
+    graphs: Dict[str, list],
+    color_patterns: Iterable[str],
+    update_procedures: Iterable[str],
+    seeds: Iterable[int],
+    iterations: int,
+    max_workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    stop_at_convergence: bool = True) -> Iterator[dict]:
+    """Run every combination of graph, color pattern, update procedure and seed on a pool of processes.
+    Yield the result dictionary of each run (see run_job) as soon as its chunk finishes.
+
+    Parameters
+    ----------
+    graphs: Dict[str, list]
+        Dictionary with graph name as key and list of edges, CompactGraph or path of a binary graph file as value.
+        Every worker maps a graph file itself, so the workers share its pages.
+    color_patterns: Iterable[str]
+        Color patterns such as 'All 0', 'All 1' and 'All random'.
+    update_procedures: Iterable[str]
+        Update procedures such as 'Ordered', 'MaxViolation' and 'MonteCarlo'.
+    seeds: Iterable[int]
+        Seeds of the random numbers of the graphs, one run per seed.
+    iterations: int
+        Iterations of each run.
+    max_workers: Optional[int], default = None
+        Number of worker processes, all cores if None.
+    chunk_size: Optional[int], default = None
+        Jobs sent to a worker at once. By default about four chunks per worker.
+    stop_at_convergence: bool, default = True
+        Stop each run at its fixed point, see GraphSimulator.run_simulation.
+    """
+    jobs = list(product(graphs, color_patterns, update_procedures, seeds))
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(1, len(jobs) // (4 * max_workers))
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(graphs,)) as executor:
+        futures = [executor.submit(_run_jobs, jobs[start:start + chunk_size], iterations, stop_at_convergence)
+                   for start in range(0, len(jobs), chunk_size)]
+        for future in as_completed(futures):
+            for result in future.result():
+                yield result
+
+
+def aggregate_ensemble(results: Iterable[dict]) -> Dict[tuple, dict]:
+    """Return dictionary with (graph, color pattern, update procedure) as key and summary of its runs as value:
+    number of runs, mean/min/max final frustration, lowest best frustration, mean convergence step of the converged
+    runs (None if none converged) and fraction of converged runs.
+    """
+    groups = {}
+    for result in results:
+        key = (result['graph'], result['color_pattern'], result['update_procedure'])
+        groups.setdefault(key, []).append(result)
+
+    summary = {}
+    for key, runs in groups.items():
+        final_frustration = [run['final_frustration'] for run in runs]
+        convergence_steps = [run['sweeps'] for run in runs if run['converged']]
+        summary[key] = {
+            'runs': len(runs),
+            'mean_final_frustration': sum(final_frustration) / len(runs),
+            'min_final_frustration': min(final_frustration),
+            'max_final_frustration': max(final_frustration),
+            'best_frustration': min(run['best_frustration'] for run in runs),
+            'mean_convergence_step': (sum(convergence_steps) / len(convergence_steps)
+                                      if convergence_steps else None),
+            'converged_fraction': sum(run['converged'] for run in runs) / len(runs),
+        }
+    return summary
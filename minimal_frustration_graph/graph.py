@@ -3,8 +3,10 @@ This module provides Graph, a class for creating a graph of edges and sites form
 
 Requirements
 ------------
-Package matplotlib https://matplotlib.org/ which can be installed via PIP.
+Package matplotlib https://matplotlib.org/ which can be installed via PIP. Only needed for plots and
+VisualObserver, graphs can be simulated headless without it.
 Python 3.7 or higher.
+Optional: package numpy https://numpy.org/ (and scipy https://scipy.org/) for the vectorised backend.
 
 Notes
 -----
@@ -12,110 +14,625 @@ Module is created as part of the group project for the final exam of DS830 Intro
 """
 
 # Import dependencies
-import visualiser_rndgraph as vrg
-import matplotlib.pyplot as plt
-from typing import List, Optional, Dict
-import random as random
+from compact_graph import CompactGraph, as_compact_graph
+from bucket_queue import BucketQueue, check_tie_break
+from rng import RandomStream, as_stream
+from checkpoint import Checkpoint, Checkpointer
+from history import FrustrationHistory
+from observables import Observables
+from edge_parser import parse_edge_lines, read_edges, edges_to_tuples
+from graph_cache import CachedGraph, GraphCache, default_cache
+from random_graphs import gnp_edges
+from union_find import edge_components
+from typing import List, Optional
+from collections.abc import MutableMapping
+from array import array
 import math as math
+import os as os
 from time import sleep
+from heapq import heapify, heappush, heappop
+
+# Optional dependencies of the vectorised backend
+try:
+    import numpy as np
+except ImportError:
+    np = None
+try:
+    import scipy.sparse as sparse
+except ImportError:
+    sparse = None
+
+
+class NumpyFrustrationKernel:
+    """Compute the local action of every vertex and the global metric of a graph in one vectorised call.
+    With spins s = 1 - 2c and adjacency matrix A, the local actions are s * (A s) and the global metric is 1/2 s^T A s.
+    """
+
+    def __init__(
+        self,
+        adjacency: CompactGraph,
+        colors: Optional[array] = None,
+        local_actions: Optional[array] = None) -> None:
+        """
+        Parameters
+        ----------
+        adjacency: CompactGraph
+            Compact adjacency of the graph.
+        colors: Optional[array('b')], default = None
+            Color of each vertex. The kernel works on an int8 view of this array without copying it.
+        local_actions: Optional[array('q')], default = None
+            Local action of each vertex. The kernel writes into an int64 view of this array.
+            Colors and local actions can be left out when only neighbour_sums is needed.
+        """
+        if np is None:
+            raise ImportError("The numpy backend requires numpy, which can be installed via PIP.")
+
+        num_vertices = adjacency.num_vertices
+        self.offsets = np.frombuffer(adjacency.offsets, dtype=np.int64)
+        self.indices = np.frombuffer(adjacency.indices, dtype=np.int32)
+        self.colors = None if colors is None else np.frombuffer(colors, dtype=np.int8)
+        self.local_actions = None if local_actions is None else np.frombuffer(local_actions, dtype=np.int64)
+        self.independent_sets = None
+
+        # sparse adjacency matrix, or the row of every stored neighbour if scipy is not available
+        if sparse is not None:
+            data = np.ones(len(self.indices), dtype=np.int64)
+            self.matrix = sparse.csr_matrix((data, self.indices, self.offsets), shape=(num_vertices, num_vertices))
+            self.rows = None
+        else:
+            self.matrix = None
+            self.rows = np.repeat(np.arange(num_vertices), np.diff(self.offsets))
+
+    def spins(self):
+        """Return the spin (+1/-1) of every vertex as an int64 array"""
+        return 1 - 2 * self.colors.astype(np.int64)
+
+    def neighbour_sums(self, spins):
+        """Return the sum of the spins of the neighbours of every vertex.
+        spins has one row per vertex and may have one column per replica.
+        """
+        if self.matrix is not None:
+            return self.matrix @ spins
+        if spins.ndim == 2:
+            return np.stack([self.neighbour_sums(column) for column in spins.T], axis=1)
+        sums = np.bincount(self.rows, weights=spins[self.indices], minlength=len(spins))
+        return sums.astype(np.int64)
+
+    def compute_local_actions(self):
+        """Return the local action of every vertex computed from the current colors"""
+        spins = self.spins()
+        return spins * self.neighbour_sums(spins)
+
+    def update_local_actions(self) -> float:
+        """Recompute the local action of every vertex in place and return the global metric"""
+        self.local_actions[:] = self.compute_local_actions()
+        return 0.5 * float(self.local_actions.sum())
+
+    def global_metric(self) -> float:
+        """Return the global metric computed from the current colors"""
+        return 0.5 * float(self.compute_local_actions().sum())
+
+    def prepare_independent_sets(self, independent_sets: list) -> None:
+        """Store the vertices of each independent set with the rows of the adjacency they need"""
+        self.independent_sets = []
+        for vertices in independent_sets:
+            vertices = np.frombuffer(vertices, dtype=np.int32).astype(np.intp)
+            if self.matrix is not None:
+                self.independent_sets.append((vertices, self.matrix[vertices], None, None))
+            else:
+                # position in the set and column of every stored neighbour of the set
+                degrees = self.offsets[vertices + 1] - self.offsets[vertices]
+                rows = np.repeat(np.arange(len(vertices)), degrees)
+                starts = np.repeat(self.offsets[vertices] - np.cumsum(degrees) + degrees, degrees)
+                columns = self.indices[starts + np.arange(len(rows))]
+                self.independent_sets.append((vertices, None, rows, columns))
+
+    def update_independent_sets(self) -> tuple:
+        """Visit the independent sets one after the other and swap the colour of all sites of the set with positive
+        local action at once. Sites of a set are not neighbours, so this gives the same colors as visiting them one
+        by one. Return the number of swaps.
+        """
+        spins = self.spins()
+        colors = self.colors
+        swaps = 0
+
+        for vertices, matrix, rows, columns in self.independent_sets:
+            if matrix is not None:
+                sums = matrix @ spins
+            else:
+                sums = np.bincount(rows, weights=spins[columns], minlength=len(vertices)).astype(np.int64)
+            swapped = vertices[spins[vertices] * sums > 0]
+
+            # swap colours of the whole set
+            colors[swapped] ^= 1
+            spins[swapped] *= -1
+            swaps += len(swapped)
+
+        return swaps
+
+
+def acceptance_table(temperature: float, max_degree: int, rule: str = 'metropolis') -> List[float]:
+    """Return list with the probability of swapping the colour of a site with local action a at index a + max_degree.
+    A swap lowers the global metric by 2a. 'metropolis' accepts it with probability min(1, exp(2a / temperature)),
+    'heatbath' with 1 / (1 + exp(-2a / temperature)). At temperature 0 only sites with positive local action swap.
+    """
+    if rule not in ('metropolis', 'heatbath'):
+        raise ValueError(f"Unknown acceptance rule '{rule}'. Use 'metropolis' or 'heatbath'.")
+    if temperature < 0:
+        raise ValueError("Temperature must not be negative.")
+
+    table = []
+    for local_action in range(-max_degree, max_degree + 1):
+        if temperature == 0:
+            table.append(1.0 if local_action > 0 else 0.0)
+        elif rule == 'metropolis':
+            table.append(1.0 if local_action >= 0 else math.exp(2 * local_action / temperature))
+        else:
+            # written so that the exponential never overflows
+            x = math.exp(-2 * abs(local_action) / temperature)
+            table.append(1 / (1 + x) if local_action >= 0 else x / (1 + x))
+    return table
+
+
+class VisualObserver:
+    """Observer drawing the coloring of a graph in a Visualiser window.
+    The window and its layout are only created when the observer is attached to a graph.
+    """
+
+    def __init__(self, delay: float = 0.6, vis_labels: bool = True, node_size: int = 200) -> None:
+        """
+        Parameters
+        ----------
+        delay: float, default = 0.6
+            Seconds to pause after each redraw, so the evolution of the coloring can be followed.
+        vis_labels: bool, default = True
+            Draw the vertex labels.
+        node_size: int, default = 200
+            Size of the drawn vertices.
+        """
+        self.delay = delay
+        self.vis_labels = vis_labels
+        self.node_size = node_size
+        self.visualiser = None
+
+    def attach(self, graph) -> None:
+        """Open the window with the initial coloring of graph"""
+        import visualiser_rndgraph as vrg
+
+        self.visualiser = vrg.Visualiser(graph.edges, val_map=graph.val_map, vis_labels=self.vis_labels,
+                                         node_size=self.node_size)
+        # add delay to show initial graph
+        sleep(self.delay)
+
+    def __call__(self, graph, step: int) -> None:
+        """Redraw the coloring of graph after step"""
+        # update coloring in visual representation of the graph instance
+        self.visualiser.update(val_map=graph.val_map)
+        sleep(self.delay)
+
+
+class ColorMap(MutableMapping):
+    """Dictionary-like view of the colors of a graph by vertex label. Setting the color of a vertex swaps its colour
+    in the graph and updates the frustrations, as a flip of an update procedure does.
+    """
+
+    def __init__(self, graph: "GraphSimulator") -> None:
+        self._graph = graph
+
+    def __getitem__(self, vertex):
+        return self._graph.colors[self._graph.label_map.index[vertex]]
+
+    def __setitem__(self, vertex, color) -> None:
+        if color not in (0, 1):
+            raise ValueError(f"The color of a vertex is 0 or 1, not {color}.")
+        graph = self._graph
+        i = graph.label_map.index[vertex]
+        if graph.colors[i] != color:
+            graph._flip(i)
+
+    def __delitem__(self, vertex):
+        raise TypeError("Vertices cannot be removed from the colors of a graph.")
+
+    def __iter__(self):
+        return iter(self._graph.label_map.labels)
+
+    def __len__(self):
+        return len(self._graph.colors)
+
+    def __repr__(self):
+        return repr(dict(self))
 
 
 class GraphSimulator:
     """Simulate update patterns on a graph"""
 
+    def flip_vertex(self, vertex) -> None:
+        """Swap the colour of vertex and update the frustration of the vertex and its neighbours only.
+        The frustration of every other vertex is unaffected by the swap, so a flip costs O(degree of vertex).
+        """
+        self._flip(self.label_map.index[vertex])
+
+    def _flip(self, i: int) -> None:
+        """Swap the colour of the vertex at dense index i and update the local action of it and its neighbours"""
+        colors = self.colors
+        local_actions = self.local_actions
+        offsets = self.adjacency.offsets
+
+        old_color = colors[i]
+        colors[i] = 1 - old_color               # swap current color
+        self.flip_count += 1
+        self.color_count += 1 - 2 * old_color
+
+        # every term of the local metric of the vertex changes sign, which lowers the global metric by 2 * local action
+        self.global_frustration -= 2 * local_actions[i]
+        local_actions[i] = -local_actions[i]
+        neighbours = self.adjacency.indices[offsets[i]:offsets[i + 1]]
+
+        # the term shared with the vertex changes sign for each neighbour
+        for j in neighbours:
+            if colors[j] == old_color:
+                local_actions[j] -= 2
+            else:
+                local_actions[j] += 2
+
+        # keep the MaxViolation queue in step with the changed local actions
+        violation_queue = self.violation_queue
+        if violation_queue is not None:
+            violation_queue.update(i, local_actions[i])
+            for j in neighbours:
+                violation_queue.update(j, local_actions[j])
+
     def update_ordered(self) -> None:
         """Visit each site of the graph and change (swap) the colour if the local action of the site is positive"""
-        vertices_list = self.vertices_list
-        vertices_frustration = self.vertices_frustration
-        val_map = self.val_map
-
-        # iterate over vertices in vertices_dictionary
-        for vertex in vertices_list:
-            # set local action for each vertex
-            local_action = vertices_frustration[vertex]
-            if local_action > 0:
-                current_color = val_map[vertex]                     # set current color
-                new_color = 1.0 if current_color != 1.0 else 0.0    # swap current color
-                val_map[vertex] = new_color
-                self.update_vertex_frustration()                    # update vertices frustration
+        self._ordered_sweep(self.positive_vertices())
 
-    def update_max_violation(self) -> None:
-        """Identify the site with the largest value of local action and swap its colour."""
+    def positive_vertices(self) -> set:
+        """Return the dense indices of the sites with positive local action"""
+        local_actions = self.local_actions
+        return {i for i in range(len(local_actions)) if local_actions[i] > 0}
 
-        vertices_list = self.vertices_list
-        vertices_frustration = self.vertices_frustration
-        val_map = self.val_map
-
-        # store vertix with largest local action
-        largest_action = None
-        largest_vertex = None
+    def _ordered_sweep(self, worklist: set) -> set:
+        """Visit the sites in worklist in order of dense index and swap the colour of those with positive local action.
+        worklist must contain every site with positive local action. Only neighbours of swapped sites can turn
+        positive, so they are added to this sweep if they come later, or returned for the next sweep otherwise.
+        """
+        local_actions = self.local_actions
+        offsets = self.adjacency.offsets
+        indices = self.adjacency.indices
+
+        heap = list(worklist)
+        heapify(heap)
+        queued = set(worklist)
+        next_worklist = set()
+
+        while heap:
+            i = heappop(heap)
+            queued.discard(i)
+            if local_actions[i] > 0:
+                self._flip(i)                           # swap color and update frustrations
+
+                # re-enqueue neighbours that turned positive
+                for j in indices[offsets[i]:offsets[i + 1]]:
+                    if local_actions[j] > 0:
+                        if j < i:
+                            next_worklist.add(j)
+                        elif j not in queued:
+                            queued.add(j)
+                            heappush(heap, j)
+
+        return next_worklist
 
-        # iterate over dictionary
-        for vertex in vertices_list:
-            # set current local action
-            current_action = vertices_frustration[vertex]
+    def update_max_violation(self) -> None:
+        """Identify the site with the largest value of local action and swap its colour.
+        The site is taken from a bucket queue of local actions, which is built on the first call and then kept
+        up to date by every flip. Ties are broken according to self.tie_break.
+        """
 
-            # check if local action of current vertex > largest
-            if largest_action is None or current_action > largest_action:
-                largest_action = current_action                             # set new largest action value
-                largest_vertex = vertex                                     # track vertex with largest action value
+        # vertex with largest local action
+        largest_vertex = self._violation_queue().peek_max()
+        if largest_vertex is None:
+            return
 
-        # swap the color of vertex with largest local action
-        if val_map[largest_vertex] == 1.0:
-            val_map[largest_vertex] = 0.0
-        else:
-            val_map[largest_vertex] = 1.0
+        # swap the color of vertex with largest local action and update frustrations
+        self._flip(largest_vertex)
 
-        # calculate new frustration for each vertex
-        self.update_vertex_frustration()
+    def update_checkerboard(self) -> None:
+        """Parallel version of update_ordered: the graph is split once into independent sets by greedy colouring,
+        and all sites of a set with positive local action swap colour in one vectorised step. Requires numpy.
+        The python backend keeps a kernel of its own for these sweeps, its other updates stay in Python.
+        """
+        kernel = self.kernel
+        if kernel is None:
+            if self.checkerboard_kernel is None:
+                self.checkerboard_kernel = NumpyFrustrationKernel(self.adjacency, self.colors, self.local_actions)
+            kernel = self.checkerboard_kernel
+        if kernel.independent_sets is None:
+            kernel.prepare_independent_sets(self.adjacency.independent_sets())
+
+        self.flip_count += kernel.update_independent_sets()
+
+        # recompute all local actions and the global metric in one vectorised call
+        self.color_count = self.colors.count(1)
+        self.global_frustration = kernel.update_local_actions()
+        self.violation_queue = None
+
+    def acceptance_probabilities(self, temperature: float, rule: str) -> list:
+        """Return the acceptance table of temperature and rule for this graph, reusing it while they are unchanged"""
+        key = (temperature, rule)
+        if self._acceptance is None or self._acceptance[0] != key:
+            self._acceptance = (key, acceptance_table(temperature, self.adjacency.max_degree(), rule))
+        return self._acceptance[1]
+
+    def update_monte_carlo(self, temperature: Optional[float] = None, rule: Optional[str] = None) -> None:
+        """Visit each site of the graph and swap its colour with the acceptance probability of its local action
+        at temperature (see acceptance_table). Temperature and rule default to those of the graph.
+        """
+        if temperature is None:
+            temperature = self.temperature
+        if rule is None:
+            rule = self.acceptance
+        local_actions = self.local_actions
+        num_vertices = len(local_actions)
+        table = self.acceptance_probabilities(temperature, rule)
+        # the table has one entry for every local action from -max_degree to max_degree
+        max_degree = len(table) // 2
+
+        # at temperature 0 every probability is 0 or 1 and no random numbers are needed,
+        # otherwise the random numbers of the whole sweep are drawn at once
+        if temperature > 0:
+            random_numbers = self.rng.random_block(num_vertices)
+
+        # iterate over vertices in order of their dense index
+        for i in range(num_vertices):
+            probability = table[local_actions[i] + max_degree]
+            if probability >= 1.0 or (probability > 0.0 and random_numbers[i] < probability):
+                self._flip(i)  # swap colour and update frustrations
+
+    def _violation_queue(self) -> BucketQueue:
+        """Return the queue of vertices by local action, building it if needed"""
+        if self.violation_queue is None or self.violation_queue.tie_break != self.tie_break:
+            self.violation_queue = BucketQueue(self.local_actions, self.adjacency.max_degree(), self.tie_break,
+                                               self.rng)
+        return self.violation_queue
+
+    def is_converged(self, update_procedure: str, worklist: Optional[set] = None) -> bool:
+        """Return true if no site has positive local action, so update_procedure leaves the coloring unchanged.
+        For Ordered updates the worklist of candidate sites is checked instead of all sites.
+        """
+        procedure = update_procedure.lower()
+        if procedure == "ordered" and worklist is not None:
+            return not worklist
+        if procedure == "maxviolation":
+            largest_action = self._violation_queue().max_key_value()
+            return largest_action is None or largest_action <= 0
+        if procedure in ("montecarlo", "metropolis", "heatbath") and self.temperature > 0:
+            # thermal updates keep swapping colours at positive temperature
+            return False
+        if self.kernel is not None:
+            return not (self.kernel.local_actions > 0).any()
+        return not any(local_action > 0 for local_action in self.local_actions)
 
-    def update_monte_carlo(self) -> None:
-        """Visit each site of the graph and swap colour if the exponential of the local action > a random float between 0,1."""
-
-        vertices_list = self.vertices_list
-        vertices_frustration = self.vertices_frustration
-        val_map = self.val_map
-
-        # iterate over vertices in vertices_dictionary
-        for vertex in vertices_list:
-            # set local action for each vertex
-            local_action = vertices_frustration[vertex]
-            if local_action > 0:
-                current_color = val_map[vertex]  # set current color
-                random_number = random.uniform(0, 1)  # generate random float between 0 and 1
-                exp_local_action = math.exp(local_action)
-
-                if exp_local_action > random_number: #compare exponent to random number
-                    new_color = 1.0 if current_color != 1.0 else 0.0 # swap current colour
-                    val_map[vertex] = new_color
-                    self.update_vertex_frustration()  # update vertices frustration
-
-    def run_simulation(self, update_procedure, iterations):
-        """Simulate update of graph accourding to update_procedure for number of iterations"""
-
-        for iteration in range(iterations):
-            # small delay 
-            sleep(0.6)
-            if update_procedure.lower() == "ordered":
-                self.update_ordered()
-            elif update_procedure.lower() == "maxviolation":
+    def run_simulation(
+        self,
+        update_procedure,
+        iterations,
+        check_interval: Optional[int] = None,
+        stop_at_convergence: bool = True,
+        checkpoint: Optional[str] = None,
+        checkpoint_interval: float = 5.0,
+        resume: bool = False) -> dict:
+        """Simulate update of graph accourding to update_procedure for number of iterations.
+        If check_interval is set, the running global frustration is checked against a full recomputation
+        every check_interval iterations.
+        If stop_at_convergence is true, the simulation stops as soon as no site has positive local action.
+        'MonteCarlo' (or 'Metropolis') and 'HeatBath' run at the temperature of the graph.
+        If checkpoint is a path, the state of the run is saved there every checkpoint_interval seconds and at the end.
+        If resume is true, the run continues from that checkpoint instead and draws the same random numbers as the
+        original run would have (see resume_simulation).
+        Return (and store in self.convergence) dictionary with keys 'converged', 'sweeps', 'flips' and the 'seed'
+        and 'spawn_key' of the random numbers of the graph, and 'observables' (see Observables.report) if an
+        Observables is attached.
+        """
+        procedure = update_procedure.lower()
+        flips_before = self.flip_count
+        converged = False
+        sweeps = 0
+        first_iteration = 0
+
+        # Ordered updates only visit the sites that can swap colour
+        worklist = self.positive_vertices() if procedure == "ordered" else None
+
+        checkpointer = Checkpointer(checkpoint, checkpoint_interval) if checkpoint else None
+        if resume:
+            if checkpointer is None:
+                raise ValueError("Resuming a simulation needs the path of its checkpoint.")
+            saved = checkpointer.load()
+            run = saved.meta['run']
+            if run['update_procedure'].lower() != procedure:
+                raise ValueError(f"The checkpoint belongs to a {run['update_procedure']} run, not {update_procedure}.")
+            self.restore_checkpoint(saved)
+            first_iteration, sweeps, flips_before = run['iteration'], run['sweeps'], run['flips_before']
+            if procedure == "ordered":
+                worklist = set(saved.arrays['worklist'])
+
+        def save_checkpoint(iteration):
+            # the run as it is after iteration iterations
+            meta, arrays, series = self.checkpoint_state()
+            meta['run'] = {'update_procedure': update_procedure, 'iterations': iterations, 'iteration': iteration,
+                           'sweeps': sweeps, 'flips_before': flips_before, 'check_interval': check_interval,
+                           'stop_at_convergence': stop_at_convergence}
+            if worklist is not None:
+                arrays['worklist'] = array('i', sorted(worklist))
+            checkpointer.save(meta, arrays, series)
+
+        # iterations done so far
+        done = first_iteration
+        for iteration in range(first_iteration, iterations):
+            if stop_at_convergence and self.is_converged(procedure, worklist):
+                converged = True
+                break
+
+            if procedure == "ordered":
+                worklist = self._ordered_sweep(worklist)
+            elif procedure == "maxviolation":
                 self.update_max_violation()
+            elif procedure == "checkerboard":
+                self.update_checkerboard()
+            elif procedure == "heatbath":
+                self.update_monte_carlo(rule='heatbath')
             else:
                 self.update_monte_carlo()
-            # update coloring in visual representation of the graph instance
-            self.vis_graph.update(val_map=self.val_map)
+            sweeps += 1
+            # add running global metric to total_frustration
+            self.total_frustration.append(self.global_frustration)
+
+            # inform observers (e.g. the visual representation of the graph instance)
+            self.notify_observers(iteration + 1)
+
+            # debug check of the running global metric
+            if check_interval and (iteration + 1) % check_interval == 0:
+                self.check_global_frustration()
+
+            done = iteration + 1
+            if checkpointer is not None and checkpointer.due():
+                save_checkpoint(done)
+
+        # the last iteration may have reached the fixed point
+        if stop_at_convergence and not converged:
+            converged = self.is_converged(procedure, worklist)
+
+        if checkpointer is not None:
+            save_checkpoint(done)
+
+        self.convergence = {'converged': converged, 'sweeps': sweeps, 'flips': self.flip_count - flips_before,
+                            'seed': self.rng.seed, 'spawn_key': self.rng.spawn_key}
+        if self.observables is not None:
+            self.convergence['observables'] = self.observables.report()
+        return self.convergence
+
+    def checkpoint_state(self) -> tuple:
+        """Return (meta, arrays, series) of the state of the graph for a Checkpointer: the settings of the graph
+        and the state of its random numbers and of its Observables, its colors, and the history of its global
+        frustration.
+        A history with a capacity is saved as its state and the values it keeps in memory, its older values stay in its
+        spill file; a history without one is a series appended to with every checkpoint.
+        """
+        meta = {
+            'color_pattern': self.color_pattern,
+            'tie_break': self.tie_break,
+            'backend': self.backend,
+            'temperature': self.temperature,
+            'acceptance': self.acceptance,
+            'graph_path': self.adjacency.path,
+            'flip_count': self.flip_count,
+            'global_frustration': self.global_frustration,
+            'rng': self.rng.getstate(),
+        }
+        history = self.total_frustration
+        meta['history'] = history.getstate()
+        for observer, every in self.observers:
+            if isinstance(observer, Observables):
+                meta['observables'] = dict(observer.getstate(), every=every)
+                break
+        arrays = {'colors': self.colors}
+        if history.capacity:
+            arrays['total_frustration'] = array('d', history[history.first_in_memory:])
+            return meta, arrays, {}
+        return meta, arrays, {'total_frustration': history}
+
+    def restore_checkpoint(self, checkpoint: Checkpoint) -> None:
+        """Set colors, random numbers, history and observables of the graph to those of a checkpoint of the same graph.
+        An Observables is attached if the checkpointed graph had one and this graph has none.
+        """
+        meta = checkpoint.meta
+        colors = checkpoint.arrays['colors']
+        if len(colors) != len(self.colors):
+            raise ValueError(f"The checkpoint has {len(colors)} vertices, the graph {len(self.colors)}.")
+
+        self.colors[:] = colors
+        self.update_vertex_frustration()
+        if self.global_frustration != meta['global_frustration']:
+            raise ValueError("The checkpoint belongs to another graph: its global frustration differs.")
+        self.rng.setstate(meta['rng'])
+        self.temperature = meta['temperature']
+        self.acceptance = meta['acceptance']
+        self._acceptance = None
+        self.flip_count = meta['flip_count']
+
+        if 'observables' in meta:
+            # the statistics continue over the steps before the checkpoint
+            observables = self.observables
+            if observables is None:
+                observables = Observables()
+                self.add_observer(observables, meta['observables']['every'])
+            observables.setstate(meta['observables'])
+
+        state = meta['history']
+        if state['capacity'] != self.total_frustration.capacity:
+            # the resumed run keeps the memory bound of the run it continues
+            self.total_frustration.close()
+            self.total_frustration = FrustrationHistory(capacity=state['capacity'])
+        if state['capacity']:
+            self.total_frustration.setstate(state, checkpoint.arrays['total_frustration'])
+        else:
+            self.total_frustration.setstate(state, checkpoint.series['total_frustration'])
 
-            # compute new global metric and add to total_frustration
-            self.total_frustration.append(self.global_metric())
+    def add_observer(self, observer, every: int = 1) -> None:
+        """Call observer(graph, step) after every `every` iterations of run_simulation.
+        If the observer has an attach method, it is called with the graph first.
+        """
+        if every < 1:
+            raise ValueError("Observers must be called at least every 1 iterations.")
+        if hasattr(observer, 'attach'):
+            observer.attach(self)
+        self.observers.append((observer, every))
+
+    def remove_observer(self, observer) -> None:
+        """Stop calling observer"""
+        self.observers = [(other, every) for other, every in self.observers if other is not observer]
+
+    def notify_observers(self, step: int) -> None:
+        """Call every observer that is due at step"""
+        for observer, every in self.observers:
+            if step % every == 0:
+                observer(self, step)
+
+    @property
+    def magnetisation(self) -> float:
+        """Mean spin 1 - 2c of the vertices: 1 if all have colour 0, -1 if all have colour 1"""
+        return 1.0 - 2.0 * self.color_count / len(self.colors) if len(self.colors) else 0.0
+
+    @property
+    def observables(self):
+        """First attached Observables, or None if no statistics are kept"""
+        for observer, every in self.observers:
+            if isinstance(observer, Observables):
+                return observer
+        return None
+
+    @property
+    def vis_graph(self):
+        """Visualiser of the first attached VisualObserver, or None if the graph is headless"""
+        for observer, every in self.observers:
+            if isinstance(observer, VisualObserver):
+                return observer.visualiser
+        return None
 
     def report_frustration_history(self, steps: int) -> None:
-        """ Display plot of the evolution of total frustration over a specified number of steps"""
+        """ Display plot of the evolution of total frustration over a specified number of steps.
+        Runs that stopped at convergence are plotted up to their last step.
+        Long runs are plotted from the min/max summary of the history, so the plot has at most a few thousand points.
+        """
+        import matplotlib.pyplot as plt
 
-        step_list = list(range(0, steps + 1))
-        frustration = self.total_frustration
+        history = self.total_frustration
+        step_list, lowest, highest = history.min_max(steps + 1)
 
         fig, ax = plt.subplots()  # Create a figure containing a single axes.
-        ax.plot(step_list, frustration)  # Plot some data on the axes
+        ax.plot(step_list, lowest)  # Plot some data on the axes
+        if history.bucket_width > 1:
+            # range of the frustration within every bucket of steps
+            ax.fill_between(step_list, lowest, highest, step='post', alpha=0.3)
 
         # Set labels
         ax.set_ylabel("Frustration of the graph")
@@ -135,14 +652,24 @@ class GraphCreater(GraphSimulator):
     def __init__(
         self,
         edges: list,
-        color_pattern: int) -> None:
+        color_pattern: int,
+        tie_break: str = 'first',
+        backend: str = 'python',
+        visualise: bool = False,
+        temperature: float = 0.0,
+        acceptance: str = 'metropolis',
+        seed=None,
+        history: Optional[FrustrationHistory] = None) -> None:
         super().__init__
 
         """
         Parameters
         ----------
-        edges: List[(int,int)]
-            List containing the edges (Tuples of 2 vertices) forming the 2D surface for the graph.
+        edges: List[(int,int)] or CompactGraph
+            List containing the edges (Tuples of 2 vertices) forming the 2D surface for the graph,
+            an (E x 2) numpy array of edges (see edge_parser.read_edges), the path of a binary graph file
+            (see CompactGraph.save) which is mapped into memory, or an already compiled CompactGraph which is used
+            as it is.
         color_pattern:
             Color of the vertices
         vertices_dict: Optional[dict], default = {}
@@ -151,49 +678,83 @@ class GraphCreater(GraphSimulator):
             The graphs total frustration over numbers of iterations/simulation
         is_connected: Optional[Boolean], default = False
             Is true if all graph vertices has at least one neighbour
+        tie_break: str, default = 'first'
+            Choice between sites with equal largest local action in MaxViolation updates: 'first' or 'random'
+        backend: str, default = 'python'
+            'numpy' computes the frustration of all vertices with NumPy whenever it is recomputed in full
+        visualise: bool, default = False
+            Attach a VisualObserver drawing the graph after every iteration. Without it the graph is headless:
+            no window, layout or delays.
+        temperature: float, default = 0.0
+            Temperature of MonteCarlo updates. At 0 only sites with positive local action swap colour.
+        acceptance: str, default = 'metropolis'
+            Acceptance rule of MonteCarlo updates: 'metropolis' or 'heatbath'
+        seed: default = None
+            Seed (or RandomStream) of the random numbers of the graph: random colors, MonteCarlo updates and
+            random tie breaks. A random seed is drawn and stored in self.rng.seed if None.
+        history: Optional[FrustrationHistory], default = None
+            Record of the global frustration after every iteration, stored in self.total_frustration. By default
+            all values are kept in memory, a history with a capacity and a spill file bounds the memory of long runs.
         """
 
-        self.edges = edges
+        # checked here, not only when the first MaxViolation update builds its queue
+        check_tie_break(tie_break)
+
         self.color_pattern = color_pattern
+        self.adjacency = as_compact_graph(edges)
+        # other inputs than lists of edges list their edges from the adjacency when asked
+        self._edges = edges if isinstance(edges, list) else None
+        self.label_map = self.adjacency.label_map
+        self.rng = as_stream(seed)
         self.vertices_list = self.create_vertices_list()
-        self.val_map = self.create_val_map()
-        self.vertices_neighbours = self.create_neighbour_dict()
-        self.vertices_frustration = {}
-        self.total_frustration = []
+        self.colors = self.create_colors()
+        self.local_actions = array('q', [0]) * len(self.vertices_list)
+        self.global_frustration = 0.0
+        self.tie_break = tie_break
+        self.violation_queue = None
+        self.flip_count = 0
+        self.convergence = None
+        self.temperature = temperature
+        self.acceptance = acceptance
+        self._acceptance = None
+        self.backend = backend
+        self.kernel = None
+        # kernel of the Checkerboard sweeps of the python backend
+        self.checkerboard_kernel = None
+        if backend == 'numpy':
+            self.kernel = NumpyFrustrationKernel(self.adjacency, self.colors, self.local_actions)
+        elif backend != 'python':
+            raise ValueError(f"Unknown backend '{backend}'. Use 'python' or 'numpy'.")
+        self._vertices_neighbours = None
+        self.total_frustration = history if history is not None else FrustrationHistory()
         self.is_connected = False
-        self.vis_graph = vrg.Visualiser(self.edges, val_map=self.val_map, vis_labels=True, node_size=200)
-
-        # add delay to shoq initial graph
-        sleep(0.6)
+        self.observers = []
 
         # calculate initial vertex frustration / local metric
         self.update_vertex_frustration()
         # calculate initial total frustration at instance construction
-        self.total_frustration.append(self.global_metric())
+        self.total_frustration.append(self.global_frustration)
 
-    # class methods
+        if visualise:
+            self.add_observer(VisualObserver())
 
-    def create_vertices_list(self) -> list:
-        """Return a list of vertices from tuple of edges"""
+    # class methods
 
-        edges = self.edges
+    @property
+    def edges(self) -> list:
+        """List of the edges of the graph, taken from the compact adjacency if the graph was compiled"""
+        if self._edges is None:
+            self._edges = self.adjacency.edge_list()
+        return self._edges
 
-        # Create vertices list
-        graph_vertices = []
+    def create_vertices_list(self) -> list:
+        """Return a list of vertices from tuple of edges, in order of first appearance"""
 
-        # Iterate over edges_list and append vertex
-        for edge_tuple in edges:
-            x, y = edge_tuple  # Unpack the tuple into x and y
-            # check if vertices already in graph_dict
-            if x not in graph_vertices:
-                graph_vertices.append(x)
-            if y not in graph_vertices:
-                graph_vertices.append(y)
+        # the compact adjacency collects the vertices while it is built
+        return self.adjacency.vertices
 
-        return graph_vertices
-
-    def create_val_map(self) -> dict:
-        """Return dictionary with color mapped to vertex"""
+    def create_colors(self) -> array:
+        """Return array with the color of each vertex at its dense index"""
 
         color_pattern = 0
         # set color pattern
@@ -204,47 +765,52 @@ class GraphCreater(GraphSimulator):
         else:
             color_pattern = 2
         
-        color_dict = {}
-        vertices_list = self.vertices_list
+        num_vertices = len(self.vertices_list)
 
         # Add color pattern to vertex
-        for vertex in vertices_list:
-            # add color pattern to vertex
-            if color_pattern == 0 or color_pattern == 1:
-                color_dict[vertex] = color_pattern
-            else:  # if color pattern not 0 or 1, randomly assign color value
-                color = random.randint(0, 1)
-                color_dict[vertex] = color
+        if color_pattern == 0 or color_pattern == 1:
+            colors = array('b', [color_pattern]) * num_vertices
+        else:  # if color pattern not 0 or 1, randomly assign color value
+            colors = array('b', self.rng.bits(num_vertices))
 
-        return color_dict
+        return colors
 
-    def create_neighbour_dict(self):
-        """Return dictionary of vertices as key and neighbours (if any) as value"""
+    def create_val_map(self) -> dict:
+        """Return dictionary with color mapped to vertex"""
+
+        return self.label_map.to_label_dict(self.create_colors())
 
-        vertices_list = self.vertices_list
-        edges = self.edges
-        vertices_neighbours = {}
+    @property
+    def val_map(self) -> ColorMap:
+        """Dictionary-like view with vertices as key and color as value. Writes go through to the color array."""
+        return ColorMap(self)
 
-        # add neighbours to dictionary
-        # Iterate over dictionary
-        for vertex in vertices_list:
-            # Store list of neighbours
-            neighbours_list = []
+    @val_map.setter
+    def val_map(self, color_dict: dict) -> None:
+        """Set the color of every vertex in color_dict and recompute the frustration of the graph"""
+        index = self.label_map.index
+        for vertex, color in color_dict.items():
+            self.colors[index[vertex]] = int(color)
+        self.update_vertex_frustration()
 
-            # Iterate over edges
-            for edge_tuple in edges:
-                x, y = edge_tuple  # split tuple into two values
+    @property
+    def vertices_frustration(self) -> dict:
+        """Dictionary with vertices as key and frustration (local action) as value, translated from the local actions"""
+        return self.label_map.to_label_dict(float(local_action) for local_action in self.local_actions)
 
-                # If neighbour not already added, append to neighbours list
-                if x not in neighbours_list and x != vertex and y == vertex:
-                    neighbours_list.append(x)
-                if y not in neighbours_list and x == vertex and y != vertex:
-                    neighbours_list.append(y)
+    def create_neighbour_dict(self):
+        """Return dictionary of vertices as key and neighbours (if any) as value"""
 
-                # add neighbour list to dictionary
-                vertices_neighbours[vertex] = neighbours_list
+        return self.adjacency.neighbour_dict()
 
-        return vertices_neighbours
+    @property
+    def vertices_neighbours(self) -> dict:
+        """Dictionary of vertices as key and neighbours as value.
+        Only kept for compatibility, the simulation reads the compact adjacency. Built on first access.
+        """
+        if self._vertices_neighbours is None:
+            self._vertices_neighbours = self.create_neighbour_dict()
+        return self._vertices_neighbours
 
     def local_metric(self, c_i: int, n_j: int) -> float:
         """Return  the frustration of a site"""
@@ -260,15 +826,8 @@ class GraphCreater(GraphSimulator):
         """Return the sum of the local_metric over every single vertex of the graph.
         The global metric is the measure of the frustration of the graph simulated by the program.
         """
-        vertices_frustration = self.vertices_frustration
-
-        # Store total frustration
-        total_frustration = 0.0
-
-        # iterate over dictionary of vertices
-        for vertex in vertices_frustration:
-            # add all vertex frustrations to total
-            total_frustration += vertices_frustration[vertex]
+        # Store total frustration of all vertices
+        total_frustration = float(sum(self.local_actions))
 
         # Multiply total_frustration by 1/2 as per the provided formula.
         total_frustration *= 0.5
@@ -278,34 +837,72 @@ class GraphCreater(GraphSimulator):
     def update_vertex_frustration(self):
         """Updates frustration for each vertex"""
 
-        vertices_list = self.vertices_list
-        vertices_neighbours = self.vertices_neighbours
-        vertices_color = self.val_map
+        # number of vertices with colour 1, kept up to date by every flip from here on
+        self.color_count = self.colors.count(1)
+
+        if self.kernel is not None:
+            # vectorised recompute, the local actions are written in place
+            self.global_frustration = self.kernel.update_local_actions()
+            self.violation_queue = None
+            return
+
+        offsets = self.adjacency.offsets
+        indices = self.adjacency.indices
+        colors = self.colors
+        local_actions = self.local_actions
+
+        for i in range(len(colors)):
+            c_i = colors[i]
+            n_J = [colors[j] for j in indices[offsets[i]:offsets[i + 1]]]
+            local_actions[i] = int(self.local_metric(c_i, n_J))
 
-        for vertex in vertices_list:
-            c_i = vertices_color[vertex]
-            n_J = [vertices_color[neighbour] for neighbour in vertices_neighbours[vertex]]
-            frustration = self.local_metric(c_i, n_J)
-            self.vertices_frustration[vertex] = frustration
+        # restart the running global metric from the new frustrations, the MaxViolation queue is rebuilt when needed
+        self.global_frustration = self.global_metric()
+        self.violation_queue = None
+
+    def check_global_frustration(self) -> None:
+        """Recompute the global metric from the colors and raise RuntimeError if the running total differs"""
+
+        if self.kernel is not None:
+            total_frustration = self.kernel.global_metric()
+        else:
+            offsets = self.adjacency.offsets
+            indices = self.adjacency.indices
+            colors = self.colors
+
+            total_frustration = 0.0
+            for i in range(len(colors)):
+                n_J = [colors[j] for j in indices[offsets[i]:offsets[i + 1]]]
+                total_frustration += self.local_metric(colors[i], n_J)
+            total_frustration *= 0.5
+
+        if total_frustration != self.global_frustration:
+            raise RuntimeError(f"Running global frustration {self.global_frustration} differs from "
+                               f"recomputed global frustration {total_frustration}")
 
     def update_graph_connection(self):
         # Return True if graph is connected, otherwise return False
-        visited = set()
+        offsets = self.adjacency.offsets
+        indices = self.adjacency.indices
+        visited = bytearray(len(self.vertices_list))
+        num_visited = 0
         self.is_connected = False
 
-        for start_vertex in self.vertices_list:
-            if start_vertex not in visited:
+        for start_vertex in range(len(self.vertices_list)):
+            if not visited[start_vertex]:
                 stack = [start_vertex]
 
                 while stack:
                     vertex = stack.pop()
-                    if vertex not in visited:
-                        visited.add(vertex)
+                    if not visited[vertex]:
+                        visited[vertex] = 1
+                        num_visited += 1
                         stack.extend(
-                            neighbour for neighbour in self.vertices_neighbours[vertex] if neighbour not in visited)
+                            neighbour for neighbour in indices[offsets[vertex]:offsets[vertex + 1]]
+                            if not visited[neighbour])
 
                 # If all vertices are visited, the graph is connected
-                self.is_connected = (len(visited) == len(self.vertices_list))
+                self.is_connected = (num_visited == len(self.vertices_list))
                 if self.is_connected:
                     return True
                 else:
@@ -324,89 +921,113 @@ class GraphCreater(GraphSimulator):
     def __str__(self):
         """Return a textual representation of the attributes of the graph"""
 
-        return f"vertices: {self.vertices_list}. Vertex colors: {self.val_map}. Vertex neighbours: {self.vertices_neighbours}.\
-            vertex frustration: {self.vertices_frustration}. Total graph frustration: {self.total_frustration}"
+        return f"vertices: {list(self.vertices_list)}. Vertex colors: {self.val_map}. Vertex neighbours: {self.vertices_neighbours}.\
+            vertex frustration: {self.vertices_frustration}. Total graph frustration: {self.total_frustration.tolist()}"
     
     def __repr__(self):
         """Return a Python-like representation of this this instance"""
         return f"GraphCreater({self.edges}, {self.color_pattern})"
 
 # function for generating af g
-def generate_random_graph(n, p=0.6):
-    """Return a list of edges in tuples by generating a random graph from n vertices with p 0.6"""
-
-    # Randomly assign connection between vertices
-    graph = [[0 for _ in range(n)] for _ in range(n)]
-
-    for i in range(n):
-        for j in range(i + 1, n):
-            if random.random() < p:
-                graph[i][j] = graph[j][i] = 1
-
-    # Create list of edges
-    edges = []
-
-    for i in range(len(graph)):
-        for j in range(i + 1, len(graph[i])):
-            if graph[i][j] == 1:
-                edges.append((i, j))
-
-    return edges
+def generate_random_graph(n, p=0.6, seed=None):
+    """Return a list of edges in tuples by generating a random graph from n vertices with p 0.6.
+    seed (or a RandomStream) makes the graph reproducible. The edges are drawn in time proportional to their number,
+    see random_graphs.gnp_edges.
+    """
+    return edges_to_tuples(gnp_edges(n, p, seed))
+
+def resume_simulation(checkpoint_path: str, edges=None, checkpoint_interval: float = 5.0) -> "GraphCreater":
+    """Continue the run_simulation saved in the checkpoint at checkpoint_path and return its graph.
+    edges must describe the same graph as the original run, they can be left out if it was read from a binary graph
+    file. The colors, history and random numbers of the resumed run are the same as if it had never stopped.
+    """
+    meta = Checkpointer(checkpoint_path).load().meta
+    if edges is None:
+        edges = meta['graph_path']
+        if edges is None:
+            raise ValueError("Give the edges of the graph, the checkpoint does not name a graph file.")
+
+    graph = GraphCreater(edges, meta['color_pattern'], tie_break=meta['tie_break'], backend=meta['backend'],
+                         temperature=meta['temperature'], acceptance=meta['acceptance'],
+                         seed=RandomStream(meta['rng']['seed'], meta['rng']['spawn_key'], meta['rng']['block_size']))
+    run = meta['run']
+    graph.run_simulation(run['update_procedure'], run['iterations'], run['check_interval'], run['stop_at_convergence'],
+                         checkpoint=checkpoint_path, checkpoint_interval=checkpoint_interval, resume=True)
+    return graph
 
 def add_edges_from_lines(lines: str) -> list[tuple]:
-    """Read lines, check if line represent an edge of a graph. Return list of edges"""
-
-    # Store edges in a list
-    edges_list = []
-
-    # Iterate through the lines and add edges to the graph
-    for line in lines:
-        # Ignore lines starting with #
-        if line.startswith('#'):
-            continue
-
-        # Split the line by comma
-        nodes = line.split(',')
-
-        # Remove '()' from nodes
-        for i in range(len(nodes)):
-            nodes[i] = nodes[i].replace('(', '')
-            nodes[i] = nodes[i].replace(')', '')
-
-        # Check if both values are valid integers
-        if len(nodes) == 2 and nodes[0].strip().isdigit() and nodes[1].strip().isdigit():
-            # Convert nodes to integers and add the edge to the graph
-            u, v = map(int, nodes)
-            # Add the edge as a tuple to the edges_list
-            edges_list.append((u, v))
-        else:
-            print("Invalid input.")
+    """Read lines, check if line represent an edge of a graph. Return list of edges.
+    Invalid lines are skipped and reported once in a summary.
+    """
+    edges_list, report = parse_edge_lines(lines)
+    if report.bad_lines:
+        print(report.summary())
 
     return edges_list
 
 # functions for creating list of edges from a file
 
-def create_graph_from_file(file_path: str) -> list[tuple]:
-    """Read a file, checks if its valid and return a list of edges for a graph"""
-    # Open the text file in read mode
+def load_graph_file(file_path: str, cache: Optional[GraphCache] = None) -> CachedGraph:
+    """Return the cached entry of an edge file: its edges, compiled adjacency, connectivity and components.
+    The file is only read and compiled if its content is not in the cache yet.
+    """
+    if cache is None:
+        cache = default_cache()
+    return cache.load(file_path)
+
+
+def cached_graph_file(file_path: str) -> Optional[CachedGraph]:
+    """Return the entry of an edge file in the default cache, or None if the cache cannot be used: its directory
+    cannot be created or written, or the entry is damaged, in which case it is deleted.
+    Raise FileNotFoundError if the file itself does not exist.
+    """
     try:
-        with open(file_path, 'r') as file:
-            # Read lines from the file and remove whitespaces
-            lines = [line.strip() for line in file.readlines() if line.strip()]
+        return load_graph_file(file_path)
+    except FileNotFoundError:
+        if not os.path.exists(file_path):
+            raise
+    except (OSError, ValueError, KeyError):
+        pass
+    # a damaged entry is compiled again on the next read
+    try:
+        default_cache().discard(file_path)
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+
+def _read_edge_file(file_path: str, use_cache: bool) -> tuple:
+    """Return the edges of a file and the ParseReport of the file, through the cache if use_cache is true.
+    The file is read directly if the cache cannot be used.
+    """
+    if use_cache:
+        entry = cached_graph_file(file_path)
+        if entry is not None:
+            return entry.edges, entry.report
+    return read_edges(file_path)
+
+
+def create_graph_from_file(file_path: str, use_cache: bool = True) -> list[tuple]:
+    """Read a file, checks if its valid and return a list of edges for a graph.
+    Files are compiled once and then read from the graph cache (see graph_cache) unless use_cache is false.
+    Use edge_parser.read_edges or edge_parser.iter_edge_batches to get the edges as numpy arrays.
+    """
+    # Read the file in large chunks
+    try:
+        graph_edges, report = _read_edge_file(file_path, use_cache)
     # Handle errors
     except FileNotFoundError:
         print("Error: The file could not be found.")
+        return []
     except IOError:
         print("There was an error reading from the file.")
-
-    # add edges from file to edges_list
-    try:
-        graph_edges = add_edges_from_lines(lines)
-    except UnboundLocalError as e:
-        print(e)
         return []
 
-    return graph_edges
+    # report invalid lines once
+    if report.bad_lines:
+        print(report.summary())
+
+    return edges_to_tuples(graph_edges)
 
 """ graph_color_test1 = GraphCreater([(1,2), (1, 3), (2, 3)], 0)
 graph_color_test2 = GraphCreater([(1,2), (1, 3), (2, 3)], 0)
@@ -0,0 +1,349 @@
+"""
+This module provides GraphCache, a cache on disk of edge files that have been read and compiled, and CachedGraph,
+one entry of the cache.
+
+Requirements
+------------
+Python 3.7 or higher.
+Optional: package numpy https://numpy.org/, which makes the cached edges an (E x 2) int64 array.
+
+Notes
+-----
+An entry is keyed by the SHA-256 hash of the content of an edge file. The path, modification time and size of every
+file seen are remembered with its key, so a file that has not changed is looked up without being read again.
+An entry stores the compiled adjacency as a binary graph file (see CompactGraph.save), the edges in the order of
+the file, the component of every vertex and a small JSON summary (line counts, sizes of the components).
+The components are found with a ComponentTracker while the file is read, not by searching the compiled graph.
+All of it is mapped into memory when the entry is used. When the entries take up more than max_bytes,
+the least recently used ones are deleted.
+The index is changed while holding a lock file next to it: it is read again, changed and written back, so processes
+sharing a cache do not overwrite each other's changes. Files are hashed and compiled before the lock is taken.
+"""
+
+# Import dependencies
+from array import array
+from contextlib import contextmanager
+from typing import Callable, Optional
+import hashlib as hashlib
+import json as json
+import mmap as mmap
+import os as os
+import shutil as shutil
+import sys as sys
+import time as time
+from compact_graph import CompactGraph
+from edge_parser import ParseReport, iter_edge_batches
+from union_find import ComponentReport, ComponentTracker
+
+# Optional dependency for the cached edges
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Changing the layout of the entries changes every key, so old entries are never read
+CACHE_VERSION = 2
+DEFAULT_MAX_BYTES = 1 << 30
+INDEX_FILE = 'index.json'
+LOCK_FILE = 'index.lock'
+# Seconds after which a lock is taken to be left by a process that died
+LOCK_TIMEOUT = 30.0
+
+
+def _map_ints(path: str, typecode: str):
+    """Return a memoryview of the ints of the file at path, mapped into memory"""
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return memoryview(array(typecode))
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    values = memoryview(buffer).cast(typecode)
+    if sys.byteorder != 'little':
+        values = array(typecode, values)
+        values.byteswap()
+    return values
+
+
+def _write_ints(path: str, values: array) -> None:
+    """Write an array of ints to path as little endian"""
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    with open(path, 'wb') as file:
+        file.write(values.tobytes())
+
+
+def _write_json(path: str, data: dict) -> None:
+    """Write data as JSON to path, replacing the file in one step"""
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, 'w') as file:
+        json.dump(data, file)
+    os.replace(temporary_path, path)
+
+
+class CachedGraph:
+    """Each instance of this class is an edge file read from the cache: its edges, compiled adjacency and components."""
+
+    def __init__(self, key: str, directory: str) -> None:
+        """
+        Parameters
+        ----------
+        key: str
+            Key of the entry, the hash of the content of the edge file.
+        directory: str
+            Directory of the entry.
+        """
+        with open(os.path.join(directory, 'meta.json')) as file:
+            meta = json.load(file)
+
+        self.key = key
+        self.adjacency = CompactGraph.load(os.path.join(directory, 'graph.mfg'))
+        self.components = _map_ints(os.path.join(directory, 'components.bin'), 'i')
+        self.component_report = ComponentReport(meta['component_sizes'])
+        self.is_connected = self.component_report.is_connected
+        self.num_components = self.component_report.num_components
+        self.largest_component_size = self.component_report.largest_size
+
+        self.report = ParseReport()
+        self.report.lines = meta['lines']
+        self.report.edges = meta['edges']
+        self.report.bad_lines = meta['bad_lines']
+        self.report.examples = [tuple(example) for example in meta['examples']]
+
+        # edges in the order of the file
+        edges = _map_ints(os.path.join(directory, 'edges.bin'), 'q')
+        if np is not None:
+            self.edges = np.frombuffer(edges, dtype=np.int64).reshape(-1, 2)
+        else:
+            self.edges = list(zip(edges[0::2], edges[1::2]))
+
+    def largest_component(self) -> CompactGraph:
+        """Return the compact graph of the largest connected component"""
+        return self.adjacency.largest_component(self.components)
+
+    def __repr__(self):
+        """Return a Python-like representation of this instance"""
+        return f"CachedGraph(key={self.key}, adjacency={self.adjacency!r}, connected={self.is_connected})"
+
+
+class GraphCache:
+    """Each instance of this class stores compiled edge files in a directory, keyed by the hash of their content."""
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        """
+        Parameters
+        ----------
+        directory: Optional[str], default = None
+            Directory of the cache. By default $MFG_CACHE_DIR, or ~/.cache/minimal_frustration_graph.
+        max_bytes: int, default = 1 GiB
+            Largest size of all entries together before the least recently used ones are deleted.
+        """
+        if directory is None:
+            directory = os.environ.get('MFG_CACHE_DIR') or os.path.join(
+                os.path.expanduser('~'), '.cache', 'minimal_frustration_graph')
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _read_index(self) -> dict:
+        """Return the index of the cache: the key of every file seen and the size and last use of every entry"""
+        try:
+            with open(os.path.join(self.directory, INDEX_FILE)) as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return {'files': {}, 'entries': {}}
+
+    def _write_index(self, index: dict) -> None:
+        """Store the index of the cache"""
+        _write_json(os.path.join(self.directory, INDEX_FILE), index)
+
+    @contextmanager
+    def _index_lock(self):
+        """Hold the lock file of the index, waiting at most LOCK_TIMEOUT seconds for another process"""
+        path = os.path.join(self.directory, LOCK_FILE)
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while True:
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.stat(path).st_mtime > LOCK_TIMEOUT:
+                        os.remove(path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"The graph cache index is locked by {path}.")
+                time.sleep(0.01)
+        try:
+            yield
+        finally:
+            os.remove(path)
+
+    def _update_index(self, update: Callable[[dict], object]):
+        """Read the index under its lock, change it with update(index), write it back and return what update returns"""
+        with self._index_lock():
+            index = self._read_index()
+            result = update(index)
+            self._write_index(index)
+        return result
+
+    def _entry_directory(self, key: str) -> str:
+        """Return the directory of the entry with key"""
+        return os.path.join(self.directory, key)
+
+    def file_key(self, file_path: str, index: Optional[dict] = None) -> str:
+        """Return the key of the content of the file at file_path. The file is only hashed if its path,
+        modification time or size differ from when it was last seen.
+        """
+        if index is None:
+            index = self._read_index()
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        seen = index['files'].get(path)
+        if seen is not None and seen['mtime_ns'] == stat.st_mtime_ns and seen['size'] == stat.st_size:
+            return seen['key']
+
+        digest = hashlib.sha256(f"graph cache {CACHE_VERSION}\n".encode())
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 23), b''):
+                digest.update(chunk)
+        key = digest.hexdigest()[:32]
+        index['files'][path] = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'key': key}
+        return key
+
+    def _seen_file(self, file_path: str) -> tuple:
+        """Return the key of the file at file_path and what the index remembers of the file"""
+        index = self._read_index()
+        key = self.file_key(file_path, index)
+        return key, index['files'][os.path.abspath(file_path)]
+
+    def get(self, file_path: str) -> Optional[CachedGraph]:
+        """Return the entry of the file at file_path, or None if it is not in the cache"""
+        key, seen = self._seen_file(file_path)
+
+        def use(index):
+            index['files'][os.path.abspath(file_path)] = seen
+            entry = index['entries'].get(key)
+            if entry is None or not os.path.isdir(self._entry_directory(key)):
+                return False
+            entry['last_used'] = time.time()
+            return True
+
+        if not self._update_index(use):
+            return None
+        return CachedGraph(key, self._entry_directory(key))
+
+    def load(self, file_path: str) -> CachedGraph:
+        """Return the entry of the file at file_path, reading and compiling the file first if it is not cached"""
+        entry = self.get(file_path)
+        if entry is not None:
+            return entry
+
+        key, seen = self._seen_file(file_path)
+        # join the components batch by batch while the file is read
+        report = ParseReport()
+        tracker = ComponentTracker()
+        batches = []
+        for batch in iter_edge_batches(file_path, report=report):
+            tracker.add_edges(batch)
+            batches.append(batch)
+
+        if np is not None:
+            edges = np.concatenate(batches) if batches else np.empty((0, 2), dtype=np.int64)
+            edges = np.ascontiguousarray(edges, dtype=np.int64)
+            adjacency = CompactGraph.from_edge_array(edges)
+            edge_values = array('q', edges.tobytes())
+        else:
+            edges = [edge for batch in batches for edge in batch]
+            adjacency = CompactGraph.from_edges(edges)
+            edge_values = array('q', [label for edge in edges for label in edge])
+        # vertices of the tracker and of the adjacency are both in order of first appearance
+        components = tracker.components()
+
+        # write the entry next to its final place and move it there in one step
+        temporary_directory = self._entry_directory(f"{key}.{os.getpid()}.tmp")
+        os.makedirs(temporary_directory, exist_ok=True)
+        adjacency.save(os.path.join(temporary_directory, 'graph.mfg'))
+        _write_ints(os.path.join(temporary_directory, 'edges.bin'), edge_values)
+        _write_ints(os.path.join(temporary_directory, 'components.bin'), components)
+        _write_json(os.path.join(temporary_directory, 'meta.json'), {
+            'source': os.path.abspath(file_path),
+            'lines': report.lines,
+            'edges': report.edges,
+            'bad_lines': report.bad_lines,
+            'examples': report.examples,
+            'component_sizes': tracker.report().sizes,
+        })
+        try:
+            os.rename(temporary_directory, self._entry_directory(key))
+        except OSError:
+            # another process stored the same entry first
+            shutil.rmtree(temporary_directory, ignore_errors=True)
+
+        size = sum(entry.stat().st_size for entry in os.scandir(self._entry_directory(key)))
+
+        def add(index):
+            index['files'][os.path.abspath(file_path)] = seen
+            index['entries'][key] = {'bytes': size, 'last_used': time.time()}
+            self.evict(index, keep=key)
+
+        self._update_index(add)
+        return CachedGraph(key, self._entry_directory(key))
+
+    def discard(self, file_path: str) -> None:
+        """Delete the entry of the file at file_path, such as an entry that cannot be read"""
+        key, seen = self._seen_file(file_path)
+
+        def delete(index):
+            index['entries'].pop(key, None)
+            index['files'] = {path: seen for path, seen in index['files'].items() if seen['key'] != key}
+
+        self._update_index(delete)
+        shutil.rmtree(self._entry_directory(key), ignore_errors=True)
+
+    def evict(self, index: Optional[dict] = None, keep: Optional[str] = None) -> None:
+        """Delete the least recently used entries (except keep) until the entries fit in max_bytes.
+        Without an index the index of the cache is changed under its lock.
+        """
+        if index is None:
+            self._update_index(lambda index: self.evict(index, keep))
+            return
+        entries = index['entries']
+        total = sum(entry['bytes'] for entry in entries.values())
+
+        for key in sorted(entries, key=lambda key: entries[key]['last_used']):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= entries.pop(key)['bytes']
+            shutil.rmtree(self._entry_directory(key), ignore_errors=True)
+
+        # forget the files of deleted entries
+        index['files'] = {path: seen for path, seen in index['files'].items() if seen['key'] in entries}
+
+    def size(self) -> int:
+        """Return the number of bytes of all entries"""
+        return sum(entry['bytes'] for entry in self._read_index()['entries'].values())
+
+    def clear(self) -> None:
+        """Delete every entry of the cache"""
+        def delete(index):
+            for key in index['entries']:
+                shutil.rmtree(self._entry_directory(key), ignore_errors=True)
+            index['files'], index['entries'] = {}, {}
+
+        self._update_index(delete)
+
+
+# Cache used by create_graph_from_file, created on first use
+_default_cache = None
+
+
+def default_cache() -> GraphCache:
+    """Return the cache shared by create_graph_from_file and load_graph_file"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = GraphCache()
+    return _default_cache
@@ -1,5 +1,35 @@
 import unittest
-from graph import GraphCreater, GraphSimulator, create_graph_from_file
+import math
+import os
+import pickle
+import json
+from array import array
+from graph import GraphCreater, GraphSimulator, create_graph_from_file, generate_random_graph, acceptance_table, \
+    resume_simulation, np
+from compact_graph import CompactGraph, LabelMap
+from bucket_queue import BucketQueue
+from multispin_engine import MultiSpinEngine
+from rng import RandomStream
+from edge_parser import ParseReport, read_edges, iter_edge_batches, edges_to_tuples
+from checkpoint import Checkpointer
+from history import FrustrationHistory
+from benchmarks import run_benchmarks, fit_exponent, compare_benchmarks
+from observables import Observables, RunningMoments, Autocorrelation
+from union_find import UnionFind, ComponentTracker, edge_components, file_components
+from random_graphs import gnp_edges, gnm_edges, random_compact_graph
+import graph_cache
+import shutil
+import tempfile
+
+
+def setUpModule():
+    # keep the graph cache of the tests out of the home directory
+    graph_cache._default_cache = graph_cache.GraphCache(tempfile.mkdtemp())
+
+
+def tearDownModule():
+    shutil.rmtree(graph_cache._default_cache.directory, ignore_errors=True)
+    graph_cache._default_cache = None
 
 # tests the function that creates graph from an external file
 class TestCreateGraphFromFile(unittest.TestCase):
@@ -31,6 +61,728 @@ class TestCreateGraphFromFile(unittest.TestCase):
 if __name__ == '__main__':
     unittest.main()
 
+# tests the chunked edge list parser
+class TestEdgeParser(unittest.TestCase):
+
+    def setUp(self):
+        self.file_path = 'mock_edges.txt'
+        with open(self.file_path, 'w') as file:
+            file.write("# comment\n(1,2)\n  3 ,4 \n\nx, y\n1 2,3\n(5, 6)\n6,7,8\n7, 1")
+
+    def tearDown(self):
+        os.remove(self.file_path)
+
+    def test_read_edges(self):
+        edges, report = read_edges(self.file_path)
+        self.assertEqual(edges_to_tuples(edges), [(1, 2), (3, 4), (5, 6), (7, 1)], 'Not equal')
+        self.assertEqual((report.lines, report.edges, report.bad_lines), (9, 4, 3), 'Not equal')
+        self.assertEqual([line_number for line_number, _ in report.examples], [5, 6, 8], 'Not equal')
+
+    def test_batches(self):
+        # small chunks split the file between lines and give the same edges
+        report = ParseReport()
+        batches = list(iter_edge_batches(self.file_path, chunk_size=8, report=report))
+        self.assertGreater(len(batches), 1, 'Not equal')
+        self.assertEqual([edge for batch in batches for edge in edges_to_tuples(batch)],
+                         [(1, 2), (3, 4), (5, 6), (7, 1)], 'Not equal')
+        self.assertEqual(report.bad_lines, 3, 'Not equal')
+
+    def test_clean_file(self):
+        with open(self.file_path, 'w') as file:
+            file.write("".join(f"({i}, {i * 7 % 11})\n" for i in range(1000)))
+        edges, report = read_edges(self.file_path, chunk_size=100)
+        self.assertEqual(edges_to_tuples(edges), [(i, i * 7 % 11) for i in range(1000)], 'Not equal')
+        self.assertEqual(report.bad_lines, 0, 'Not equal')
+
+    @unittest.skipIf(np is None, 'numpy is not installed')
+    def test_edge_array_graph(self):
+        edges = [(5, 1), (1, 5), (2, 2), (3, 1), (5, 3), (7, 5)]
+        self.assertEqual(CompactGraph.from_edge_array(np.array(edges)), CompactGraph.from_edges(edges), 'Not equal')
+        graph = GraphCreater(np.array(edges), 'All 0')
+        self.assertEqual(graph.vertices_frustration, GraphCreater(edges, 'All 0').vertices_frustration, 'Not equal')
+
+# tests the cache of compiled edge files
+class TestGraphCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.file_path = os.path.join(self.directory, 'edges.txt')
+        self.write("1, 2\n2, 3\n(4,5)\nbad\n")
+        self.cache = graph_cache.GraphCache(os.path.join(self.directory, 'cache'))
+
+    def write(self, text):
+        with open(self.file_path, 'w') as file:
+            file.write(text)
+
+    def test_load(self):
+        entry = self.cache.load(self.file_path)
+        self.assertEqual(edges_to_tuples(entry.edges), [(1, 2), (2, 3), (4, 5)], 'Not equal')
+        self.assertEqual(entry.adjacency, CompactGraph.from_edges([(1, 2), (2, 3), (4, 5)]), 'Not equal')
+        self.assertEqual(list(entry.components), [0, 0, 0, 1, 1], 'Not equal')
+        self.assertEqual((entry.is_connected, entry.num_components), (False, 2), 'Not equal')
+        self.assertEqual(entry.component_report.sizes, [3, 2], 'Not equal')
+        self.assertEqual(entry.largest_component(), CompactGraph.from_edges([(1, 2), (2, 3)]), 'Not equal')
+        self.assertEqual(entry.report.bad_lines, 1, 'Not equal')
+
+        # the same content is found again, a changed file gets a new entry
+        self.assertEqual(self.cache.get(self.file_path).key, entry.key, 'Not equal')
+        self.write("1, 2\n2, 3\n")
+        self.assertIsNone(self.cache.get(self.file_path), 'Not equal')
+        self.assertTrue(self.cache.load(self.file_path).is_connected, 'Not equal')
+
+    def test_eviction(self):
+        first = self.cache.load(self.file_path)
+        self.write("1, 2\n2, 3\n")
+        second = self.cache.load(self.file_path)
+
+        # only the most recently used entry fits
+        self.cache.max_bytes = self.cache.size() - 1
+        self.cache.evict(keep=second.key)
+        self.assertFalse(os.path.isdir(os.path.join(self.cache.directory, first.key)), 'Not equal')
+        self.assertTrue(os.path.isdir(os.path.join(self.cache.directory, second.key)), 'Not equal')
+
+    def test_create_graph_from_file(self):
+        # repeated reads go through the cache and give the same edges
+        expected = create_graph_from_file(self.file_path, use_cache=False)
+        self.assertEqual(create_graph_from_file(self.file_path), expected, 'Not equal')
+        self.assertEqual(create_graph_from_file(self.file_path), expected, 'Not equal')
+
+    def test_unusable_cache(self):
+        # a cache directory below a regular file cannot be created, the file is read directly
+        default = graph_cache._default_cache
+        graph_cache._default_cache = None
+        self.addCleanup(setattr, graph_cache, '_default_cache', default)
+        os.environ['MFG_CACHE_DIR'] = os.path.join(self.file_path, 'cache')
+        self.addCleanup(os.environ.pop, 'MFG_CACHE_DIR')
+        self.assertEqual(create_graph_from_file(self.file_path), [(1, 2), (2, 3), (4, 5)], 'Not equal')
+
+    def test_damaged_entry(self):
+        # a damaged entry is deleted and the file is read directly, then compiled again
+        expected = create_graph_from_file(self.file_path, use_cache=False)
+        for name, content in (('meta.json', b'{'), ('graph.mfg', b'MFG')):
+            entry = graph_cache.default_cache().load(self.file_path)
+            with open(os.path.join(graph_cache.default_cache().directory, entry.key, name), 'wb') as file:
+                file.write(content)
+            self.assertEqual(create_graph_from_file(self.file_path), expected, 'Not equal')
+            self.assertEqual(create_graph_from_file(self.file_path), expected, 'Not equal')
+
+    def test_shared_index(self):
+        # changes of caches sharing a directory are merged into the index, and a stale lock is broken
+        other = graph_cache.GraphCache(self.cache.directory)
+        lock_path = os.path.join(self.cache.directory, graph_cache.LOCK_FILE)
+        open(lock_path, 'w').close()
+        os.utime(lock_path, (0, 0))
+        first = self.cache.load(self.file_path)
+        second_path = os.path.join(self.directory, 'more.txt')
+        with open(second_path, 'w') as file:
+            file.write("7, 8\n")
+        second = other.load(second_path)
+        self.assertEqual(set(self.cache._read_index()['entries']), {first.key, second.key}, 'Not equal')
+        self.assertFalse(os.path.exists(lock_path), 'Not equal')
+
+# tests the compressed sparse row adjacency
+class TestCompactGraph(unittest.TestCase):
+
+    def test_from_edges(self):
+        # repeated edges, reversed edges and self loops are dropped
+        compact = CompactGraph.from_edges([(5, 7), (7, 9), (9, 5), (7, 5), (9, 9), (5, 11)])
+
+        self.assertEqual(compact.vertices, [5, 7, 9, 11], 'Not equal')
+        self.assertEqual(list(compact.offsets), [0, 3, 5, 7, 8], 'Not equal')
+        self.assertEqual(compact.num_edges, 4, 'Not equal')
+        self.assertEqual(list(compact.neighbours(0)), [1, 2, 3], 'Not equal')
+
+    def test_neighbour_dict(self):
+        compact = CompactGraph.from_edges([(1, 2), (2, 3), (3, 1), (1, 2)])
+        expected_neighbours = {1: [2, 3], 2: [1, 3], 3: [2, 1]}
+        self.assertEqual(compact.neighbour_dict(), expected_neighbours, 'Not equal')
+
+    def test_save_load(self):
+        file_path = 'mock_graph.mfg'
+        self.addCleanup(os.remove, file_path)
+        for edges in ([(3, 1), (1, 2), (2, 3), (2, 7), (3, 3)], [('a', 'b'), ('b', 'c')], []):
+            adjacency = CompactGraph.from_edges(edges)
+            adjacency.save(file_path)
+            loaded = CompactGraph.load(file_path)
+            self.assertEqual(loaded, adjacency, 'Not equal')
+            self.assertEqual(loaded.neighbour_dict(), adjacency.neighbour_dict(), 'Not equal')
+
+            # a loaded graph is pickled as its path and mapped again
+            self.assertEqual(pickle.loads(pickle.dumps(loaded)), adjacency, 'Not equal')
+
+        # graphs can be simulated straight from the file
+        edges = [(3, 1), (1, 2), (2, 3), (2, 7)]
+        CompactGraph.from_edges(edges).save(file_path)
+        graph = GraphCreater(file_path, 'All 0')
+        graph.run_simulation('ordered', 5)
+        expected = GraphCreater(edges, 'All 0')
+        expected.run_simulation('ordered', 5)
+        self.assertEqual(graph.val_map, expected.val_map, 'Not equal')
+        self.assertEqual(graph.adjacency, expected.adjacency, 'Not equal')
+
+    def test_invalid_file(self):
+        file_path = 'mock_graph.mfg'
+        self.addCleanup(os.remove, file_path)
+        with open(file_path, 'wb') as file:
+            file.write(b'not a graph file, just some text')
+        with self.assertRaises(ValueError):
+            CompactGraph.load(file_path)
+
+# tests the translation between vertex labels and dense indices
+class TestLabelMap(unittest.TestCase):
+
+    def test_label_map(self):
+        label_map = LabelMap()
+        for label in [40, 7, 40, 1000]:
+            label_map.add(label)
+
+        self.assertEqual(label_map.labels, [40, 7, 1000], 'Not equal')
+        self.assertEqual(label_map.to_index(1000), 2, 'Not equal')
+        self.assertEqual(label_map.to_label(1), 7, 'Not equal')
+        self.assertEqual(label_map.to_label_dict([1, 0, 1]), {40: 1, 7: 0, 1000: 1}, 'Not equal')
+
+    def test_sparse_labels(self):
+        # colors and frustrations are reported with the original labels
+        graph = GraphCreater([(100, 20), (20, 3000), (3000, 100)], 'All 1')
+        graph.flip_vertex(3000)
+
+        self.assertEqual(graph.val_map, {100: 1, 20: 1, 3000: 0}, 'Not equal')
+        self.assertEqual(graph.vertices_frustration, {100: 0.0, 20: 0.0, 3000: -2.0}, 'Not equal')
+
+        # writes to val_map go through to the colors and frustrations of the graph
+        graph.val_map[3000] = 1
+        self.assertEqual(graph.val_map, {100: 1, 20: 1, 3000: 1}, 'Not equal')
+        self.assertEqual(graph.global_frustration, 3.0, 'Not equal')
+        with self.assertRaises(ValueError):
+            graph.val_map[20] = 2
+
+# tests the bucket queue used by MaxViolation updates
+class TestBucketQueue(unittest.TestCase):
+
+    def test_first_tie_break(self):
+        queue = BucketQueue([1, 3, -2, 3], max_key=3)
+        self.assertEqual(queue.peek_max(), 1, 'Not equal')
+
+        queue.update(1, -3)
+        self.assertEqual(queue.peek_max(), 3, 'Not equal')
+
+        # a vertex moving back into the top bucket is found again
+        queue.update(3, 1)
+        queue.update(1, 3)
+        self.assertEqual(queue.peek_max(), 1, 'Not equal')
+
+    def test_random_tie_break(self):
+        queue = BucketQueue([2, 2, 0, 2], max_key=2, tie_break='random')
+        self.assertIn(queue.peek_max(), [0, 1, 3], 'Not a vertex with largest key')
+
+        queue.update(0, -2)
+        queue.update(3, 0)
+        self.assertEqual(queue.peek_max(), 1, 'Not equal')
+
+    def test_unknown_tie_break(self):
+        # an unknown tie break is refused when the graph is built, not at its first MaxViolation update
+        with self.assertRaises(ValueError):
+            GraphCreater([(1, 2), (2, 3)], 'All 0', tie_break='bogus')
+
+# tests the replica-batched MonteCarlo engine
+@unittest.skipIf(np is None, 'numpy is not installed')
+class TestReplicaMonteCarlo(unittest.TestCase):
+
+    def test_replicas_match_single_graph(self):
+        from replica_engine import ReplicaMonteCarlo
+
+        edges = [(i, j) for i in range(25) for j in range(i + 1, 25) if (i * 3 + j * 7) % 6 < 2]
+        engine = ReplicaMonteCarlo(CompactGraph.from_edges(edges), replicas=5, seed=3)
+        initial_colors = engine.colors
+        history = engine.run('montecarlo', 3)
+        self.assertEqual(history.shape, (5, 4), 'Not equal')
+
+        # every replica follows the same path as a single graph with its initial colors
+        for replica in range(5):
+            graph = GraphCreater(edges, 'All 0')
+            graph.val_map = graph.label_map.to_label_dict(initial_colors[replica].tolist())
+            self.assertEqual(history[replica, 0], graph.global_frustration, 'Not equal')
+
+            graph.run_simulation('montecarlo', 3, stop_at_convergence=False)
+            self.assertEqual(engine.colors[replica].tolist(), list(graph.colors), 'Not equal')
+            self.assertEqual(history[replica, 1:].tolist(), graph.total_frustration[1:], 'Not equal')
+
+    def test_temperature_per_replica(self):
+        from replica_engine import ReplicaMonteCarlo
+
+        edges = [(i, j) for i in range(25) for j in range(i + 1, 25) if (i * 3 + j * 7) % 6 < 2]
+        engine = ReplicaMonteCarlo(CompactGraph.from_edges(edges), replicas=2, color_pattern='All 0', seed=3)
+        history = engine.run('metropolis', 10, temperature=[0.0, 5.0])
+
+        # the cold replica only lowers its frustration, the hot one also raises it
+        self.assertTrue(all(b <= a for a, b in zip(history[0], history[0, 1:])), 'Not equal')
+        self.assertTrue(any(b > a for a, b in zip(history[1], history[1, 1:])), 'Not equal')
+        self.assertEqual(engine.global_frustration.tolist(), engine.compute_global_frustration().tolist(), 'Not equal')
+
+# tests simulated annealing
+class TestAnnealer(unittest.TestCase):
+
+    def test_schedules(self):
+        from annealing import Annealer
+
+        edges = [(i, j) for i in range(40) for j in range(i + 1, 40) if (i * 7 + j * 3) % 5 < 2]
+        for schedule in ('linear', 'geometric', 'adaptive'):
+            graph = GraphCreater(edges, 'All 0', seed=2)
+            annealer = Annealer(graph, schedule, sweeps=60, sweeps_per_temperature=5)
+            result = annealer.run()
+
+            # the graph is left in the best coloring, with consistent frustrations
+            self.assertLessEqual(result['sweeps'], 60, 'Not equal')
+            self.assertEqual(result['best_frustration'], min(graph.total_frustration), 'Not equal')
+            self.assertEqual(graph.global_frustration, result['best_frustration'], 'Not equal')
+            self.assertEqual(graph.val_map, result['best_colors'], 'Not equal')
+            graph.check_global_frustration()
+
+            # the temperature never rises
+            self.assertTrue(all(b <= a for a, b in zip(annealer.temperatures, annealer.temperatures[1:])),
+                            'Not equal')
+
+    def test_budget_required(self):
+        from annealing import Annealer
+
+        with self.assertRaises(ValueError):
+            Annealer(GraphCreater([(1, 2)], 'All 0'))
+        # a start temperature at or below the end temperature has no schedule
+        for start_temperature in (0.0, -1.0, 0.05):
+            with self.assertRaises(ValueError):
+                Annealer(GraphCreater([(1, 2)], 'All 0'), start_temperature=start_temperature, sweeps=10)
+
+# tests replica exchange
+class TestParallelTempering(unittest.TestCase):
+
+    def setUp(self):
+        self.edges = [(i, j) for i in range(30) for j in range(i + 1, 30) if (i * 5 + j * 3) % 7 < 2]
+        self.adjacency = CompactGraph.from_edges(self.edges)
+
+    def assert_consistent(self, result, rounds):
+        # the best colors have the best frustration
+        graph = GraphCreater(self.edges, 'All 0')
+        graph.val_map = result['best_colors']
+        self.assertEqual(graph.global_frustration, result['best_frustration'], 'Not equal')
+        self.assertEqual([len(history) for history in result['history']], [rounds + 1] * 4, 'Not equal')
+        self.assertEqual(len(result['swap_acceptance']), 3, 'Not equal')
+
+    @unittest.skipIf(np is None, 'numpy is not installed')
+    def test_batched(self):
+        from tempering import ParallelTempering
+
+        # exchanges between (nearly) equal high temperatures are always accepted
+        tempering = ParallelTempering(self.adjacency, [100, 101, 102, 103], seed=1)
+        result = tempering.run(40)
+        self.assert_consistent(result, 40)
+        self.assertEqual(result['swap_acceptance'], [1.0, 1.0, 1.0], 'Not equal')
+        self.assertGreater(result['round_trips'], 0, 'Not equal')
+        self.assertEqual(sorted(tempering.replica_at), [0, 1, 2, 3], 'Not equal')
+
+    def test_processes(self):
+        from tempering import ParallelTempering
+
+        with ParallelTempering(self.adjacency, [0.5, 1.0, 2.0, 4.0], seed=1, swap_interval=2, workers=2) as tempering:
+            result = tempering.run(10)
+        self.assert_consistent(result, 10)
+        self.assertEqual(result['sweeps'], 20, 'Not equal')
+
+# tests the random number streams
+class TestRandomStream(unittest.TestCase):
+
+    def test_blocks(self):
+        # numbers come in the same order whether drawn one by one or in blocks of any size
+        single = RandomStream(7, block_size=16)
+        blocks = RandomStream(7, block_size=16)
+        numbers = [single.random() for _ in range(100)]
+        self.assertEqual(blocks.random_block(5) + blocks.random_block(40) + [blocks.random()] + blocks.random_block(54),
+                         numbers, 'Not equal')
+
+    def test_spawn(self):
+        stream = RandomStream(7)
+        children = stream.spawn(2)
+        self.assertEqual([child.spawn_key for child in children], [(0,), (1,)], 'Not equal')
+        self.assertNotEqual(children[0].random_block(10), children[1].random_block(10), 'Not equal')
+
+        # a spawned stream is reproduced from its seed and spawn key
+        self.assertEqual(RandomStream(7, (1,)).random_block(10), RandomStream(7).spawn(2)[1].random_block(10),
+                         'Not equal')
+
+    def test_seeded_graphs(self):
+        self.assertEqual(generate_random_graph(30, 0.3, seed=4), generate_random_graph(30, 0.3, seed=4), 'Not equal')
+        first = GraphCreater([(i, i + 1) for i in range(50)], 'All random', seed=4)
+        second = GraphCreater([(i, i + 1) for i in range(50)], 'All random', seed=first.rng.seed)
+        self.assertEqual(first.colors, second.colors, 'Not equal')
+
+# tests the bounded-memory frustration history
+class TestFrustrationHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.values = [float((7 * i) % 23 - 11) for i in range(100)]
+
+    def test_list_like(self):
+        history = FrustrationHistory(self.values)
+        self.assertEqual(history, self.values, 'Not equal')
+        self.assertEqual((history[5], history[-1], history[10:20]), (self.values[5], self.values[-1],
+                                                                     self.values[10:20]), 'Not equal')
+        self.assertEqual((history.min, history.argmin), (min(self.values), self.values.index(min(self.values))),
+                         'Not equal')
+
+    def test_ring_buffer(self):
+        with tempfile.TemporaryDirectory() as directory:
+            history = FrustrationHistory(self.values, capacity=16, spill=os.path.join(directory, 'history.bin'),
+                                         flush_size=10)
+            # old values are read back from the spill file
+            self.assertEqual(len(history._values), 16, 'Not equal')
+            self.assertEqual(history.tolist(), self.values, 'Not equal')
+            self.assertEqual(history[3:90:7], self.values[3:90:7], 'Not equal')
+            history.close()
+
+        history = FrustrationHistory(self.values, capacity=16)
+        self.assertEqual(history[-16:], self.values[-16:], 'Not equal')
+        with self.assertRaises(IndexError):
+            history[0]
+
+    def test_downsampling(self):
+        history = FrustrationHistory(self.values, max_buckets=8)
+        self.assertEqual(history.downsample(10), (list(range(0, 100, 10)), self.values[::10]), 'Not equal')
+
+        steps, lowest, highest = history.min_max()
+        self.assertEqual(history.bucket_width, 16, 'Not equal')
+        self.assertEqual(steps, list(range(0, 100, 16)), 'Not equal')
+        self.assertEqual(lowest, [min(self.values[i:i + 16]) for i in steps], 'Not equal')
+        self.assertEqual(highest, [max(self.values[i:i + 16]) for i in steps], 'Not equal')
+        self.assertEqual(history.min_max(20)[0], [0, 16], 'Not equal')
+
+    def test_graph_history(self):
+        graph = GraphCreater(generate_random_graph(30, 0.2, seed=1), 'All random', temperature=2.0, seed=2,
+                             history=FrustrationHistory(capacity=10))
+        graph.run_simulation('MonteCarlo', 50)
+        self.assertEqual((len(graph.total_frustration), graph.total_frustration[-1]), (51, graph.global_frustration),
+                         'Not equal')
+
+# tests the benchmark suite
+class TestBenchmarks(unittest.TestCase):
+
+    def test_fit_exponent(self):
+        sizes = [100, 1000, 10000]
+        self.assertAlmostEqual(fit_exponent(sizes, [3e-6 * n ** 2 for n in sizes]), 2.0, msg='Not equal')
+        self.assertIsNone(fit_exponent([100], [1.0]), 'Not equal')
+
+    def test_run_and_compare(self):
+        report = run_benchmarks([50, 200], ['lattice'], min_time=0)
+        operations = {result['operation'] for result in report['results']}
+        self.assertTrue({'construct', 'update_vertex_frustration', 'global_metric', 'sweep_MonteCarlo',
+                         'create_graph_from_file'} <= operations, 'Not equal')
+        self.assertEqual(set(report['exponents']['lattice']), operations, 'Not equal')
+        self.assertEqual(compare_benchmarks(report, report), [], 'Not equal')
+
+        # a quadratic operation is reported
+        slower = json.loads(json.dumps(report))
+        slower['exponents']['lattice']['construct'] = 2.0
+        self.assertEqual(len(compare_benchmarks(report, slower, time_factor=math.inf)), 1, 'Not equal')
+
+# tests the online observables
+class TestObservables(unittest.TestCase):
+
+    def test_running_moments(self):
+        values = [3.0, -1.0, 4.0, 1.0, -5.0, 9.0]
+        moments = RunningMoments()
+        for value in values:
+            moments.add(value)
+        mean = sum(values) / len(values)
+        self.assertAlmostEqual(moments.mean, mean, msg='Not equal')
+        self.assertAlmostEqual(moments.variance, sum((v - mean) ** 2 for v in values) / len(values), msg='Not equal')
+
+    def test_autocorrelation(self):
+        correlation = Autocorrelation(max_lag=10)
+        for step in range(1000):
+            correlation.add(1000.0 + (-1) ** step)
+        self.assertAlmostEqual(correlation.correlation(1), -1.0, places=6, msg='Not equal')
+        self.assertAlmostEqual(correlation.correlation(2), 1.0, places=6, msg='Not equal')
+
+    def test_run_report(self):
+        graph = GraphCreater(generate_random_graph(40, 0.15, seed=3), 'All random', temperature=2.0, seed=4)
+        graph.add_observer(Observables(burn_in=10))
+        report = graph.run_simulation('MonteCarlo', 200)['observables']
+
+        # the magnetisation follows every flip
+        self.assertEqual(graph.color_count, graph.colors.count(1), 'Not equal')
+        self.assertEqual(report['samples'], 190, 'Not equal')
+        energies = graph.total_frustration[11:]
+        self.assertAlmostEqual(report['energy']['mean'], sum(energies) / len(energies), msg='Not equal')
+        self.assertGreaterEqual(report['energy']['autocorrelation_time'], 0.5, 'Not equal')
+        self.assertAlmostEqual(report['specific_heat'], report['energy']['variance'] / (4.0 * len(graph.colors)),
+                               msg='Not equal')
+
+# tests checkpointing and resuming of long runs
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.path = os.path.join(self.directory, 'run.ckpt')
+        self.edges = generate_random_graph(40, 0.15, seed=8)
+
+    def copy_at(self, step):
+        # an observer keeping the checkpoint saved before step, as if the run had died there
+        def observer(graph, current_step):
+            if current_step == step:
+                for name in ('run.ckpt', 'run.ckpt.total_frustration', 'run.ckpt.temperatures'):
+                    if os.path.exists(os.path.join(self.directory, name)):
+                        shutil.copy(os.path.join(self.directory, name), os.path.join(self.directory, 'copy.' + name))
+        return observer
+
+    def test_stream_state(self):
+        stream = RandomStream(7, block_size=16)
+        stream.random_block(20)
+        state = stream.getstate()
+        numbers = stream.random_block(40)
+        resumed = RandomStream(7, block_size=16)
+        resumed.setstate(state)
+        self.assertEqual(resumed.random_block(40), numbers, 'Not equal')
+        with self.assertRaises(ValueError):
+            RandomStream(8).setstate(state)
+
+    def test_save_load(self):
+        checkpointer = Checkpointer(self.path)
+        checkpointer.save({'step': 1}, {'colors': array('b', [0, 1, 1])}, {'history': [1.0, 2.0]})
+        checkpointer.save({'step': 2}, {'colors': array('b', [1, 1, 0])}, {'history': [1.0, 2.0, 0.5]})
+        saved = Checkpointer(self.path).load()
+        self.assertEqual(saved.meta, {'step': 2}, 'Not equal')
+        self.assertEqual(saved.arrays['colors'], array('b', [1, 1, 0]), 'Not equal')
+        self.assertEqual(list(saved.series['history']), [1.0, 2.0, 0.5], 'Not equal')
+
+        with open(self.path, 'wb') as file:
+            file.write(b'not a checkpoint')
+        with self.assertRaises(ValueError):
+            Checkpointer(self.path).load()
+
+    def test_resume_simulation(self):
+        graph = GraphCreater(self.edges, 'All random', temperature=2.0, seed=5)
+        graph.add_observer(Observables(burn_in=10, max_lag=20))
+        graph.add_observer(self.copy_at(60))
+        convergence = graph.run_simulation('MonteCarlo', 100, checkpoint=self.path, checkpoint_interval=0)
+
+        resumed = resume_simulation(os.path.join(self.directory, 'copy.run.ckpt'), self.edges)
+        self.assertEqual(resumed.colors, graph.colors, 'Not equal')
+        self.assertEqual(resumed.total_frustration, graph.total_frustration, 'Not equal')
+        # the statistics cover the steps before the checkpoint too
+        self.assertEqual(resumed.convergence, convergence, 'Not equal')
+        self.assertEqual(resumed.convergence['observables']['samples'], 90, 'Not equal')
+
+    def test_resume_bounded_history(self):
+        # a history with a capacity keeps its older values in its spill file, also after a resume
+        spill = os.path.join(self.directory, 'history.bin')
+        graph = GraphCreater(self.edges, 'All random', temperature=2.0, seed=5,
+                             history=FrustrationHistory(capacity=16, spill=spill, flush_size=8))
+        graph.add_observer(self.copy_at(60))
+        graph.run_simulation('MonteCarlo', 100, checkpoint=self.path, checkpoint_interval=0)
+        expected = graph.total_frustration.tolist()
+        graph.total_frustration.close()
+
+        resumed = resume_simulation(os.path.join(self.directory, 'copy.run.ckpt'), self.edges)
+        history = resumed.total_frustration
+        self.assertEqual((history.capacity, len(history._values)), (16, 16), 'Not equal')
+        self.assertEqual(history.tolist(), expected, 'Not equal')
+        self.assertEqual((history.min, history.argmin), (min(expected), expected.index(min(expected))), 'Not equal')
+
+        # without a spill file only the values in memory are saved
+        graph = GraphCreater(self.edges, 'All random', temperature=2.0, seed=5, history=FrustrationHistory(capacity=16))
+        graph.run_simulation('MonteCarlo', 100, checkpoint=self.path, checkpoint_interval=0)
+        self.assertEqual(len(Checkpointer(self.path).load().arrays['total_frustration']), 16, 'Not equal')
+
+    def test_resume_annealing(self):
+        from annealing import Annealer
+        graph = GraphCreater(self.edges, 'All random', seed=5)
+        graph.add_observer(self.copy_at(30))
+        result = Annealer(graph, sweeps=50).run(checkpoint=self.path, checkpoint_interval=0)
+
+        copy = GraphCreater(self.edges, 'All random', seed=5)
+        annealer = Annealer(copy, sweeps=50)
+        resumed = annealer.run(checkpoint=os.path.join(self.directory, 'copy.run.ckpt'), resume=True)
+        self.assertEqual(copy.total_frustration, graph.total_frustration, 'Not equal')
+        for key in ('best_frustration', 'best_colors', 'best_sweep', 'final_temperature', 'sweeps'):
+            self.assertEqual(resumed[key], result[key], 'Not equal')
+
+# tests the union-find connectivity
+class TestUnionFind(unittest.TestCase):
+
+    def setUp(self):
+        # a path, a triangle and a self loop, with the edges of the path shuffled
+        self.edges = [(4, 5), (1, 2), (9, 7), (3, 4), (2, 3), (7, 8), (8, 9), (6, 5), (11, 11)]
+        self.adjacency = CompactGraph.from_edges(self.edges)
+
+    def test_union_find(self):
+        union_find = UnionFind(4)
+        self.assertTrue(union_find.union(0, 2), 'Not equal')
+        self.assertFalse(union_find.union(2, 0), 'Not equal')
+        self.assertEqual(union_find.add(), 4, 'Not equal')
+        union_find.union(3, 4)
+        self.assertEqual(list(union_find.components()), [0, 1, 0, 2, 2], 'Not equal')
+
+    def test_components(self):
+        tracker = edge_components(self.edges)
+        self.assertEqual(tracker.labels, list(self.adjacency.vertices), 'Not equal')
+        self.assertEqual(tracker.components(), self.adjacency.connected_components(), 'Not equal')
+
+        report = tracker.report()
+        self.assertEqual(report.sizes, [6, 3, 1], 'Not equal')
+        self.assertEqual((report.num_components, report.largest_size, report.is_connected), (3, 6, False),
+                         'Not equal')
+        self.assertTrue(edge_components([(1, 2), (3, 2)]).report().is_connected, 'Not equal')
+
+    def test_batches(self):
+        # components joined batch by batch equal those of all edges at once
+        tracker = ComponentTracker()
+        for k in range(0, len(self.edges), 2):
+            tracker.add_edges(self.edges[k:k + 2])
+        self.assertEqual(tracker.components(), self.adjacency.connected_components(), 'Not equal')
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'edges.txt')
+            with open(file_path, 'w') as file:
+                file.write(''.join(f"{u}, {v}\n" for u, v in self.edges))
+            self.assertEqual(file_components(file_path, chunk_size=16).report().sizes, [6, 3, 1], 'Not equal')
+
+    def test_hub_in_later_batch(self):
+        # the vertices are seen before the hub, whose edges then all join in one batch
+        tracker = ComponentTracker()
+        tracker.add_edges([(v, v + 1) for v in range(1, 2000, 2)])
+        tracker.add_edges([(0, v) for v in range(2000, 0, -1)])
+        union_find = UnionFind(tracker.num_vertices)
+        index = {label: i for i, label in enumerate(tracker.labels)}
+        for v in range(1, 2000, 2):
+            union_find.union(index[v], index[v + 1])
+        for v in range(2000, 0, -1):
+            union_find.union(index[0], index[v])
+        self.assertEqual(tracker.components(), union_find.components(), 'Not equal')
+        self.assertEqual(tracker.report().sizes, [2001], 'Not equal')
+
+    def test_largest_component(self):
+        largest = self.adjacency.largest_component()
+        self.assertEqual(largest, CompactGraph.from_edges([(4, 5), (1, 2), (3, 4), (2, 3), (6, 5)]), 'Not equal')
+        self.assertEqual(self.adjacency.subgraph([False] * self.adjacency.num_vertices).num_vertices, 0,
+                         'Not equal')
+
+# tests the random graph generators
+class TestRandomGraphs(unittest.TestCase):
+
+    def assert_simple(self, edges, n):
+        edges = [tuple(edge) for edge in edges]
+        self.assertTrue(all(0 <= i < j < n for i, j in edges), 'Not equal')
+        self.assertEqual(edges, sorted(set(edges)), 'Not equal')
+
+    def test_gnp(self):
+        self.assert_simple(gnp_edges(200, 0.05, seed=3), 200)
+        self.assertEqual(len(gnp_edges(20, 1.0, seed=3)), 190, 'Not equal')
+        self.assertEqual(len(gnp_edges(20, 0.0, seed=3)), 0, 'Not equal')
+        self.assertEqual(generate_random_graph(20, 1.0), [(i, j) for i in range(20) for j in range(i + 1, 20)],
+                         'Not equal')
+
+    def test_gnm(self):
+        edges = gnm_edges(200, 500, seed=3)
+        self.assert_simple(edges, 200)
+        self.assertEqual(len(edges), 500, 'Not equal')
+        self.assertEqual(len(gnm_edges(20, 190, seed=3)), 190, 'Not equal')
+        with self.assertRaises(ValueError):
+            gnm_edges(20, 191)
+
+    def test_seeded(self):
+        self.assertEqual(edges_to_tuples(gnp_edges(300, 0.02, seed=9)), edges_to_tuples(gnp_edges(300, 0.02, seed=9)),
+                         'Not equal')
+        self.assertEqual(edges_to_tuples(gnm_edges(300, 400, seed=9)), edges_to_tuples(gnm_edges(300, 400, seed=9)),
+                         'Not equal')
+
+    def test_compact_graph(self):
+        # vertices without edges are kept, and vertex i has label i
+        edges = edges_to_tuples(gnp_edges(100, 0.01, seed=2))
+        adjacency = random_compact_graph(100, p=0.01, seed=2)
+        self.assertEqual(adjacency.num_vertices, 100, 'Not equal')
+        self.assertEqual(list(adjacency.label_map.labels), list(range(100)), 'Not equal')
+        self.assertEqual(adjacency, CompactGraph.from_edges(edges, num_vertices=100), 'Not equal')
+
+# tests the bit-packed multi-spin engine
+class TestMultiSpinEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.edges = [(i, j) for i in range(20) for j in range(i + 1, 20) if (i * 5 + j * 3) % 7 < 2]
+        self.adjacency = CompactGraph.from_edges(self.edges)
+
+    def assert_replicas_match(self, engine, update_procedure, iterations):
+        initial_colors = [engine.replica_colors(replica) for replica in range(engine.replicas)]
+        history = engine.run(update_procedure, iterations)
+
+        # every replica follows the same path as a single graph with its initial colors
+        for replica in range(engine.replicas):
+            graph = GraphCreater(self.edges, 'All 0')
+            graph.val_map = graph.label_map.to_label_dict(initial_colors[replica])
+            start = graph.global_frustration
+            graph.run_simulation(update_procedure, iterations, stop_at_convergence=False)
+            self.assertEqual(engine.replica_colors(replica), graph.colors, 'Not equal')
+            self.assertEqual(history[replica], [start] + graph.total_frustration[1:], 'Not equal')
+
+    def test_ordered(self):
+        self.assert_replicas_match(MultiSpinEngine(self.adjacency, seed=1), 'ordered', 3)
+
+    def test_max_violation(self):
+        self.assert_replicas_match(MultiSpinEngine(self.adjacency, replicas=10, seed=2), 'maxviolation', 6)
+
+    def test_metropolis(self):
+        engine = MultiSpinEngine(self.adjacency, replicas=64, seed=3)
+        history = engine.run('metropolis', 3, temperature=1.5)
+
+        # the global metric of each replica matches its colors
+        for replica in range(engine.replicas):
+            graph = GraphCreater(self.edges, 'All 0')
+            graph.val_map = graph.label_map.to_label_dict(engine.replica_colors(replica))
+            self.assertEqual(history[replica][-1], graph.global_frustration, 'Not equal')
+        mean_frustration = sum(history[replica][-1] for replica in range(64)) / 64
+        self.assertAlmostEqual(engine.mean_global_frustration(), mean_frustration)
+
+    def test_seed_and_temperature(self):
+        # a RandomStream seeds the engine like the other engines, and its seed is reported
+        engine = MultiSpinEngine(self.adjacency, replicas=8, seed=RandomStream(4))
+        same = MultiSpinEngine(self.adjacency, replicas=8, seed=4)
+        self.assertEqual(engine.words, same.words, 'Not equal')
+        self.assertEqual(engine.run('metropolis', 2, temperature=1.0), same.run('metropolis', 2, temperature=1.0),
+                         'Not equal')
+        self.assertEqual((engine.convergence['seed'], engine.convergence['spawn_key']), (4, ()), 'Not equal')
+
+        # Metropolis updates without a temperature are refused
+        with self.assertRaises(ValueError):
+            engine.run('metropolis', 1)
+
+# tests the process pool ensemble runner
+class TestEnsemble(unittest.TestCase):
+
+    def test_run_ensemble(self):
+        from ensemble import run_ensemble, run_job, aggregate_ensemble
+
+        graphs = {'triangles': [(0, 1), (1, 2), (2, 0), (2, 3), (3, 4), (4, 2)], 'path': [(0, 1), (1, 2), (2, 3)]}
+        results = list(run_ensemble(graphs, ['All 0', 'All random'], ['Ordered', 'MonteCarlo'], [1, 2, 3],
+                                    iterations=5, max_workers=2))
+        self.assertEqual(len(results), 24, 'Not equal')
+
+        # a run in a worker gives the same result as in this process
+        result = [run for run in results if run['graph'] == 'path' and run['seed'] == 2
+                  and run['color_pattern'] == 'All random' and run['update_procedure'] == 'MonteCarlo'][0]
+        expected = run_job(CompactGraph.from_edges(graphs['path']), 'path', 'All random', 'MonteCarlo', 2, 5)
+        key = ('path', 'All random', 'MonteCarlo')
+        self.assertEqual(result, expected, 'Not equal')
+
+        summary = aggregate_ensemble(results)
+        self.assertEqual(len(summary), 8, 'Not equal')
+        self.assertEqual(summary[('path', 'All 0', 'Ordered')]['runs'], 3, 'Not equal')
+        self.assertEqual(summary[('path', 'All 0', 'Ordered')]['best_frustration'], -3.0, 'Not equal')
+
+        # runs that never converged are left out of the mean convergence step
+        runs = [dict(result, sweeps=sweeps, converged=converged)
+                for sweeps, converged in [(2, True), (4, True), (100, False)]]
+        self.assertEqual(aggregate_ensemble(runs)[key]['mean_convergence_step'], 3, 'Not equal')
+        self.assertIsNone(aggregate_ensemble(runs[2:])[key]['mean_convergence_step'], 'Not equal')
+
 # tests the update_graph_connection function
 class TestUpdateGraphConnection(unittest.TestCase):
 
@@ -167,6 +919,152 @@ class TestGraphSimulator(unittest.TestCase):
         self.assertEqual(test_monte_carlo.val_map, expected_valmap, 'Not equal')
         self.assertEqual(test_monte_carlo.total_frustration, expected_total_frustration, 'Not equal')
 
+    def test_running_global_frustration(self):
+        test = self.setUp_test_graph()
+        test.run_simulation('maxviolation', 4, check_interval=1)
+
+        # running total must match a sum over all vertex frustrations
+        self.assertEqual(test.global_frustration, test.global_metric(), 'Not equal')
+        self.assertEqual(test.total_frustration[-1], test.global_metric(), 'Not equal')
+
+        # a corrupted running total is reported by the check
+        test.global_frustration += 2
+        with self.assertRaises(RuntimeError):
+            test.check_global_frustration()
+
+    def test_max_violation_matches_scan(self):
+        edges = [(i, j) for i in range(12) for j in range(i + 1, 12) if (i * j + i + j) % 3 == 0]
+        test = GraphCreater(edges, 'All 0')
+
+        for step in range(30):
+            # vertex with largest local action, first in vertices_list on ties
+            local_actions = list(test.local_actions)
+            expected_vertex = local_actions.index(max(local_actions))
+            expected_colors = list(test.colors)
+            expected_colors[expected_vertex] = 1 - expected_colors[expected_vertex]
+
+            test.update_max_violation()
+            self.assertEqual(list(test.colors), expected_colors, 'Not equal')
+
+    @unittest.skipIf(np is None, 'numpy is not installed')
+    def test_numpy_backend(self):
+        edges = [(i, j) for i in range(40) for j in range(i + 1, 40) if (i * 7 + j * 3) % 5 == 0]
+        python_graph = GraphCreater(edges, 'All random')
+        numpy_graph = GraphCreater(edges, 'All 0', backend='numpy')
+        numpy_graph.val_map = python_graph.val_map
+
+        # vectorised frustrations are identical to the pure Python ones
+        self.assertEqual(numpy_graph.vertices_frustration, python_graph.vertices_frustration, 'Not equal')
+        self.assertEqual(numpy_graph.global_frustration, python_graph.global_frustration, 'Not equal')
+
+        python_graph.run_simulation('ordered', 2)
+        numpy_graph.run_simulation('ordered', 2, check_interval=1)
+        self.assertEqual(numpy_graph.total_frustration[1:], python_graph.total_frustration[1:], 'Not equal')
+
+    def test_observer(self):
+        test = self.setUp_test_graph()
+        self.assertIsNone(test.vis_graph, 'Graph is not headless')
+
+        # observer is only called every third iteration
+        steps = []
+        test.add_observer(lambda graph, step: steps.append((step, graph.global_frustration)), every=3)
+        test.run_simulation('ordered', 7, stop_at_convergence=False)
+        self.assertEqual(steps, [(3, test.total_frustration[3]), (6, test.total_frustration[6])], 'Not equal')
+
+    def test_ordered_worklist(self):
+        edges = [(i, j) for i in range(30) for j in range(i + 1, 30) if (i * 5 + j * 11) % 7 < 2]
+        test = GraphCreater(edges, 'All random')
+        expected = GraphCreater(edges, 'All 0')
+        expected.val_map = test.val_map
+
+        # worklist sweeps give the same colors as visiting every vertex
+        test.run_simulation('ordered', 3, stop_at_convergence=False)
+        for sweep in range(3):
+            for i in range(len(expected.local_actions)):
+                if expected.local_actions[i] > 0:
+                    expected._flip(i)
+        self.assertEqual(list(test.colors), list(expected.colors), 'Not equal')
+
+    def test_stop_at_convergence(self):
+        test = self.setUp_test_graph()
+        report = test.run_simulation('ordered', 10000)
+
+        # the run stops at the fixed point instead of doing all iterations
+        self.assertTrue(report['converged'], 'Fail: is not True')
+        self.assertEqual(report['sweeps'], 1, 'Not equal')
+        self.assertEqual(report['flips'], 4, 'Not equal')
+        self.assertEqual(len(test.total_frustration), report['sweeps'] + 1, 'Not equal')
+
+        report = test.run_simulation('maxviolation', 10000)
+        self.assertEqual((report['converged'], report['sweeps'], report['flips']), (True, 0, 0), 'Not equal')
+        self.assertEqual(report['seed'], test.rng.seed, 'Not equal')
+
+    @unittest.skipIf(np is None, 'numpy is not installed')
+    def test_update_checkerboard(self):
+        edges = [(i, j) for i in range(30) for j in range(i + 1, 30) if (i * 5 + j * 11) % 7 < 2]
+        test = GraphCreater(edges, 'All random')
+        expected = GraphCreater(edges, 'All 0')
+        expected.val_map = test.val_map
+
+        # independent sets cover every vertex and contain no neighbours
+        independent_sets = test.adjacency.independent_sets()
+        self.assertEqual(sorted(i for vertices in independent_sets for i in vertices), list(range(30)), 'Not equal')
+        for vertices in independent_sets:
+            for i in vertices:
+                self.assertFalse(set(test.adjacency.neighbours(i)) & set(vertices), 'Neighbours in the same set')
+
+        # a vectorised sweep gives the same colors as visiting the sets one vertex at a time
+        test.run_simulation('checkerboard', 2, check_interval=1, stop_at_convergence=False)
+        for sweep in range(2):
+            for vertices in independent_sets:
+                for i in vertices:
+                    if expected.local_actions[i] > 0:
+                        expected._flip(i)
+        self.assertEqual(list(test.colors), list(expected.colors), 'Not equal')
+
+        # the python backend stays in Python for its other updates
+        self.assertIsNone(test.kernel, 'Not equal')
+        test.update_vertex_frustration()
+        self.assertEqual(test.global_frustration, expected.global_frustration, 'Not equal')
+        self.assertEqual(list(test.local_actions), list(expected.local_actions), 'Not equal')
+        self.assertEqual(test.global_frustration, expected.global_frustration, 'Not equal')
+
+    def test_flip_vertex(self):
+        test = self.setUp_test_graph()
+        test.flip_vertex(4)
+
+        # frustrations after the flip must equal a full recomputation
+        expected_valmap = {0: 0, 1: 0, 3: 0, 4: 1.0, 5: 0, 2: 0}
+        incremental_frustration = dict(test.vertices_frustration)
+        test.update_vertex_frustration()
+        self.assertEqual(test.val_map, expected_valmap, 'Not equal')
+        self.assertEqual(incremental_frustration, test.vertices_frustration, 'Not equal')
+
+    def test_acceptance_table(self):
+        # probabilities of local actions -2..2
+        self.assertEqual(acceptance_table(0, 2), [0.0, 0.0, 0.0, 1.0, 1.0], 'Not equal')
+        metropolis = acceptance_table(2.0, 2)
+        self.assertEqual(metropolis[2:], [1.0, 1.0, 1.0], 'Not equal')
+        self.assertAlmostEqual(metropolis[0], math.exp(-2), msg='Not equal')
+        heat_bath = acceptance_table(2.0, 2, 'heatbath')
+        self.assertAlmostEqual(heat_bath[2], 0.5, msg='Not equal')
+        self.assertAlmostEqual(heat_bath[0] + heat_bath[4], 1.0, msg='Not equal')
+        self.assertEqual(acceptance_table(1e-9, 2, 'heatbath')[0], 0.0, 'Not equal')
+
+    def test_monte_carlo_temperature(self):
+        test = GraphCreater(self.setUp_test_graph().edges, 'All 0', temperature=3.0, seed=5)
+        convergence = test.run_simulation('MonteCarlo', 20)
+
+        # at high temperature colours keep swapping, also against the frustration
+        self.assertFalse(convergence['converged'], 'Not equal')
+        self.assertEqual(convergence['sweeps'], 20, 'Not equal')
+        self.assertTrue(any(b > a for a, b in zip(test.total_frustration, test.total_frustration[1:])), 'Not equal')
+        test.check_global_frustration()
+
+        test.acceptance = 'heatbath'
+        test.run_simulation('MonteCarlo', 5)
+        test.check_global_frustration()
+
 
 
 if __name__ == '__main__':
@@ -0,0 +1,318 @@
+"""
+This module provides FrustrationHistory, a record of the global frustration after every step of a run that takes
+8 bytes per step, or a fixed amount of memory however long the run.
+
+Requirements
+------------
+Python 3.7 or higher.
+
+Notes
+-----
+Values are kept in an array of doubles. With a capacity the array is a ring buffer of the last capacity values, and
+older values are only kept in the spill file, if one is given: an append-only file of little endian doubles,
+written in blocks of flush_size values. Indexing and slicing use the step of a value, as for a list of all values,
+and read values no longer in memory back from the spill file.
+The lowest and highest value and their steps are kept as values are added. So is a min/max summary of at most
+max_buckets buckets of consecutive steps: when it is full, neighbouring buckets are merged and the width of a bucket
+doubles, so plots and summaries of any run length cost O(max_buckets).
+The spill file is only opened when the first values are written to it, and getstate and setstate save and restore
+everything but the values, so a resumed history continues the spill file of the run it resumes and keeps only its
+last capacity values in memory.
+"""
+
+# Import dependencies
+from array import array
+from typing import Iterable, List, Optional
+import math as math
+import sys as sys
+
+# Values read from the spill file at once
+READ_SIZE = 1 << 20
+
+
+class FrustrationHistory:
+    """Each instance of this class records the global frustration after every step of a run, like a list of floats."""
+
+    def __init__(self, values: Iterable[float] = (), capacity: Optional[int] = None, spill: Optional[str] = None,
+                 max_buckets: int = 1024, flush_size: int = 65536) -> None:
+        """
+        Parameters
+        ----------
+        values: Iterable[float], default = ()
+            First values of the history.
+        capacity: Optional[int], default = None
+            Number of values kept in memory, the last ones. None keeps all values.
+        spill: Optional[str], default = None
+            Path of an append-only file every value is written to. Values no longer in memory are read from it.
+        max_buckets: int, default = 1024
+            Largest number of buckets of the min/max summary, must be even.
+        flush_size: int, default = 65536
+            Values collected before they are written to the spill file.
+        """
+        if capacity is not None and capacity < 1:
+            raise ValueError("The capacity of a history must be at least 1.")
+        if max_buckets < 2 or max_buckets % 2:
+            raise ValueError("The number of buckets must be even and at least 2.")
+
+        self.capacity = capacity
+        self.spill = spill
+        self.max_buckets = max_buckets
+        self.flush_size = flush_size
+        self._spill_file = None
+        # a new history starts its spill file again, a restored one appends to it
+        self._spill_mode = 'wb'
+        self._pending = array('d')
+        self._start_summary()
+        self.extend(values)
+
+    def _start_summary(self) -> None:
+        """Forget every value"""
+        self._values = array('d', bytes(8 * self.capacity)) if self.capacity else array('d')
+        self._count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.argmin = None
+        self.argmax = None
+        # min/max summary of buckets of bucket_width consecutive steps
+        self.bucket_width = 1
+        self._bucket_min = array('d')
+        self._bucket_max = array('d')
+
+    def append(self, value: float) -> None:
+        """Add the value of the next step"""
+        step = self._count
+        if self.capacity:
+            self._values[step % self.capacity] = value
+        else:
+            self._values.append(value)
+        self._count = step + 1
+
+        if value < self.min:
+            self.min, self.argmin = value, step
+        if value > self.max:
+            self.max, self.argmax = value, step
+
+        bucket = step // self.bucket_width
+        if bucket == len(self._bucket_min):
+            if bucket == self.max_buckets:
+                self._merge_buckets()
+            self._bucket_min.append(value)
+            self._bucket_max.append(value)
+        else:
+            if value < self._bucket_min[bucket]:
+                self._bucket_min[bucket] = value
+            if value > self._bucket_max[bucket]:
+                self._bucket_max[bucket] = value
+
+        if self.spill is not None:
+            self._pending.append(value)
+            if len(self._pending) >= self.flush_size:
+                self.flush()
+
+    def extend(self, values: Iterable[float]) -> None:
+        """Add the values of the next steps"""
+        for value in values:
+            self.append(value)
+
+    def _merge_buckets(self) -> None:
+        """Halve the number of buckets of the summary by merging neighbours"""
+        lows = self._bucket_min
+        highs = self._bucket_max
+        self._bucket_min = array('d', map(min, lows[0::2], lows[1::2]))
+        self._bucket_max = array('d', map(max, highs[0::2], highs[1::2]))
+        self.bucket_width *= 2
+
+    def flush(self) -> None:
+        """Write the collected values to the spill file"""
+        if self.spill is None or not self._pending:
+            return
+        if self._spill_file is None:
+            self._spill_file = open(self.spill, self._spill_mode)
+            self._spill_mode = 'ab'
+        values = self._pending
+        if sys.byteorder != 'little':
+            values = array('d', values)
+            values.byteswap()
+        self._spill_file.write(values.tobytes())
+        self._spill_file.flush()
+        self._pending = array('d')
+
+    def close(self) -> None:
+        """Write the collected values and close the spill file"""
+        self.flush()
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+
+    def clear(self) -> None:
+        """Forget every value, and empty the spill file"""
+        self._start_summary()
+        self._pending = array('d')
+        if self._spill_file is not None:
+            self._spill_file.seek(0)
+            self._spill_file.truncate()
+        elif self.spill is not None:
+            self._spill_mode = 'wb'
+
+    def getstate(self) -> dict:
+        """Return dictionary of everything but the values of the history, see setstate. Collected values are written
+        to the spill file first.
+        """
+        self.flush()
+        return {
+            'count': self._count,
+            'capacity': self.capacity,
+            'spill': self.spill,
+            'max_buckets': self.max_buckets,
+            'min': self.min,
+            'max': self.max,
+            'argmin': self.argmin,
+            'argmax': self.argmax,
+            'bucket_width': self.bucket_width,
+            'bucket_min': self._bucket_min.tolist(),
+            'bucket_max': self._bucket_max.tolist(),
+        }
+
+    def setstate(self, state: dict, values: Iterable[float]) -> None:
+        """Continue the history of a state from getstate, with the same capacity. values are the last values of that
+        history, at least those it kept in memory. The spill file of the state is continued: values written to it
+        after the state are dropped.
+        """
+        if state['capacity'] != self.capacity:
+            raise ValueError(f"The history has capacity {self.capacity}, the state {state['capacity']}.")
+        values = array('d', values)
+        count = state['count']
+        if len(values) < count - self._first_in_memory(count) or len(values) > count:
+            raise ValueError(f"{len(values)} values do not end the {count} steps of the state.")
+
+        self.close()
+        self._start_summary()
+        self.spill = state['spill']
+        self.max_buckets = state['max_buckets']
+        self._pending = array('d')
+        if self.spill is not None:
+            with open(self.spill, 'ab') as file:
+                file.truncate(8 * count)
+            self._spill_mode = 'ab'
+
+        first = self._first_in_memory(count)
+        if self.capacity:
+            for step, value in enumerate(values[len(values) - (count - first):], first):
+                self._values[step % self.capacity] = value
+        else:
+            self._values = values
+        self._count = count
+        self.min, self.max = state['min'], state['max']
+        self.argmin, self.argmax = state['argmin'], state['argmax']
+        self.bucket_width = state['bucket_width']
+        self._bucket_min = array('d', state['bucket_min'])
+        self._bucket_max = array('d', state['bucket_max'])
+
+    def _first_in_memory(self, count: int) -> int:
+        """Return the step of the oldest value kept in memory after count steps"""
+        if self.capacity:
+            return max(0, count - self.capacity)
+        return 0
+
+    @property
+    def first_in_memory(self) -> int:
+        """Return the step of the oldest value kept in memory"""
+        return self._first_in_memory(self._count)
+
+    def _read(self, start: int, stop: int) -> array:
+        """Return array('d') of the values of steps start..stop-1"""
+        values = array('d')
+        first_in_memory = self.first_in_memory
+        if start < first_in_memory:
+            if self.spill is None:
+                raise IndexError(f"Step {start} is no longer in memory and the history has no spill file.")
+            self.flush()
+            with open(self.spill, 'rb') as file:
+                file.seek(8 * start)
+                values.frombytes(file.read(8 * (min(stop, first_in_memory) - start)))
+            if sys.byteorder != 'little':
+                values.byteswap()
+            start = first_in_memory
+
+        if start < stop:
+            if not self.capacity:
+                values.extend(self._values[start:stop])
+            else:
+                # the ring buffer wraps around at most once
+                first, last = start % self.capacity, (stop - 1) % self.capacity + 1
+                if first < last:
+                    values.extend(self._values[first:last])
+                else:
+                    values.extend(self._values[first:])
+                    values.extend(self._values[:last])
+        return values
+
+    def __len__(self):
+        """Return the number of steps recorded"""
+        return self._count
+
+    def __getitem__(self, key):
+        """Return the value of a step, or list of the values of a slice of steps"""
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self._count)
+            if step == 1:
+                return self._read(start, stop).tolist() if start < stop else []
+            return [self[i] for i in range(start, stop, step)]
+
+        if key < 0:
+            key += self._count
+        if not 0 <= key < self._count:
+            raise IndexError("History index out of range.")
+        if key >= self.first_in_memory:
+            return self._values[key % self.capacity] if self.capacity else self._values[key]
+        return self._read(key, key + 1)[0]
+
+    def __iter__(self):
+        """Iterate over the values of all steps, reading at most READ_SIZE of them at once"""
+        for start in range(0, self._count, READ_SIZE):
+            yield from self._read(start, min(start + READ_SIZE, self._count))
+
+    def tolist(self) -> List[float]:
+        """Return list of the values of all steps"""
+        return self[:]
+
+    def index(self, value: float) -> int:
+        """Return the first step with value"""
+        for step, other in enumerate(self):
+            if other == value:
+                return step
+        raise ValueError(f"{value} is not in the history.")
+
+    def downsample(self, every: int, stop: Optional[int] = None) -> tuple:
+        """Return lists of the steps 0, every, 2 * every, ... before stop and of their values"""
+        stop = self._count if stop is None else min(stop, self._count)
+        steps = list(range(0, stop, every))
+        values = []
+        for start in range(0, stop, READ_SIZE * every):
+            values.extend(self._read(start, min(start + READ_SIZE * every, stop))[::every])
+        return steps, values
+
+    def min_max(self, stop: Optional[int] = None) -> tuple:
+        """Return lists of the first step, lowest value and highest value of every bucket of the summary that starts
+        before stop. A bucket holds bucket_width consecutive steps.
+        """
+        stop = self._count if stop is None else min(stop, self._count)
+        num_buckets = -(-stop // self.bucket_width)
+        steps = list(range(0, num_buckets * self.bucket_width, self.bucket_width))
+        return steps, self._bucket_min[:num_buckets].tolist(), self._bucket_max[:num_buckets].tolist()
+
+    def __eq__(self, other):
+        """Return true if other holds the same values, as a history or any sequence"""
+        try:
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        except TypeError:
+            return NotImplemented
+
+    def __repr__(self):
+        """Return a Python-like representation of this instance"""
+        return (f"FrustrationHistory(steps={self._count}, capacity={self.capacity}, "
+                f"min={self.min}, max={self.max})")
+
+    def __del__(self):
+        if getattr(self, 'spill', None) is not None:
+            self.close()
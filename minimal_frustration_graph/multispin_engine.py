@@ -0,0 +1,382 @@
+"""
+This module provides MultiSpinEngine, a class simulating up to 64 colorings (replicas) of one graph with the colours
+of a vertex packed into the bits of one 64-bit word (multi-spin coding).
+
+Requirements
+------------
+Python 3.7 or higher.
+
+Notes
+-----
+Bit r of the word of a vertex is its colour in replica r. The neighbours that disagree with a vertex in each replica
+are the set bits of word_i XOR word_j, and they are counted for all replicas at once with bit-sliced counters: plane b
+of a counter holds bit b of the count of every replica. A site with degree d and D disagreeing neighbours has local
+action d - 2D, so the update rules become comparisons of bit-sliced counters with constants. The counters of all
+vertices are kept up to date by every swap, so a swap costs O(degree) word operations for all replicas together.
+MaxViolation picks the largest local action of every replica in one scan over the vertices, which costs O(V) word
+operations per step for all replicas together.
+Random bits come from a RandomStream as 64-bit words, drawn WORD_BLOCK words at a time.
+"""
+
+# Import dependencies
+from array import array
+from typing import List, Optional
+from compact_graph import CompactGraph, as_compact_graph
+from graph import acceptance_table
+from rng import as_stream
+
+# Count the set bits of an int
+try:
+    popcount = int.bit_count
+except AttributeError:  # Python before 3.10
+    def popcount(word: int) -> int:
+        return bin(word).count('1')
+
+# Bits of precision of the acceptance probabilities of Metropolis updates
+PROBABILITY_BITS = 53
+# Random words drawn from the stream at once
+WORD_BLOCK = 4096
+
+
+def _add_masked(planes: list, mask: int) -> None:
+    """Add 1 to the bit-sliced counter planes in the replicas set in mask"""
+    carry = mask
+    k = 0
+    while carry:
+        if k == len(planes):
+            planes.append(carry)
+            return
+        plane = planes[k]
+        planes[k] = plane ^ carry
+        carry = plane & carry
+        k += 1
+
+
+def _subtract_masked(planes: list, mask: int) -> None:
+    """Subtract 1 from the bit-sliced counter planes in the replicas set in mask (the counters must be positive)"""
+    borrow = mask
+    k = 0
+    while borrow:
+        plane = planes[k]
+        planes[k] = plane ^ borrow
+        borrow = ~plane & borrow
+        k += 1
+
+
+def _less_than(planes: list, constant: int, full: int) -> int:
+    """Return mask of the replicas whose bit-sliced counter is smaller than constant"""
+    less = 0
+    equal = full
+    for b in range(max(len(planes), constant.bit_length()) - 1, -1, -1):
+        plane = planes[b] if b < len(planes) else 0
+        if (constant >> b) & 1:
+            less |= equal & ~plane
+            equal &= plane
+        else:
+            equal &= ~plane
+    return less
+
+
+def _equal_to(planes: list, constant: int, full: int) -> int:
+    """Return mask of the replicas whose bit-sliced counter equals constant"""
+    equal = full
+    for b in range(max(len(planes), constant.bit_length())):
+        plane = planes[b] if b < len(planes) else 0
+        equal &= plane if (constant >> b) & 1 else ~plane
+    return equal
+
+
+def _unpack(planes: list, replicas: int) -> List[int]:
+    """Return the value of a bit-sliced counter in every replica"""
+    return [sum(((plane >> r) & 1) << b for b, plane in enumerate(planes)) for r in range(replicas)]
+
+
+class MultiSpinEngine:
+    """Each instance of this class holds up to 64 colorings of a graph packed bitwise, one word per vertex."""
+
+    def __init__(
+        self,
+        adjacency: CompactGraph,
+        replicas: int = 64,
+        color_pattern: str = 'All random',
+        seed=None) -> None:
+        """
+        Parameters
+        ----------
+        adjacency: CompactGraph
+            Compact adjacency of the graph shared by all replicas, or the path of a binary graph file.
+        replicas: int, default = 64
+            Number of colorings, between 1 and 64.
+        color_pattern: str, default = 'All random'
+            Initial color of the vertices: 'All 0', 'All 1' or random colors drawn independently for each replica.
+        seed: default = None
+            Seed (or RandomStream) of the random numbers of the engine.
+        """
+        if not 1 <= replicas <= 64:
+            raise ValueError("A word holds between 1 and 64 replicas.")
+
+        self.adjacency = as_compact_graph(adjacency)
+        self.replicas = replicas
+        self.full = (1 << replicas) - 1
+        self.rng = as_stream(seed)
+        # block of random words and the position of the next one
+        self._random_words = []
+        self._word_position = 0
+        self.words = self.create_words(color_pattern)
+        self._planes = None
+        self.convergence = None
+
+    def create_words(self, color_pattern: str) -> array:
+        """Return array('Q') with the packed colours of every vertex following color_pattern"""
+        num_vertices = self.adjacency.num_vertices
+
+        if color_pattern == 'All 0':
+            return array('Q', [0]) * num_vertices
+        if color_pattern == 'All 1':
+            return array('Q', [self.full]) * num_vertices
+        return array('Q', [word & self.full for word in self.rng.words(num_vertices)])
+
+    def _random_word(self) -> int:
+        """Return the next uniform 64-bit word of the block, drawing a new block when it is used up"""
+        if self._word_position == len(self._random_words):
+            self._random_words = self.rng.words(WORD_BLOCK)
+            self._word_position = 0
+        word = self._random_words[self._word_position]
+        self._word_position += 1
+        return word
+
+    def replica_colors(self, replica: int) -> array:
+        """Return array('b') with the color of every vertex in replica"""
+        return array('b', [(word >> replica) & 1 for word in self.words])
+
+    def set_replica_colors(self, replica: int, colors) -> None:
+        """Set the color of every vertex in replica"""
+        bit = 1 << replica
+        words = self.words
+        for i, color in enumerate(colors):
+            words[i] = words[i] | bit if color else words[i] & ~bit
+        self._planes = None
+
+    def _disagreement_planes(self, i: int, word: int) -> list:
+        """Return the bit-sliced count of the neighbours of vertex i that disagree with the colours in word"""
+        offsets = self.adjacency.offsets
+        words = self.words
+        planes = []
+
+        for j in self.adjacency.indices[offsets[i]:offsets[i + 1]]:
+            _add_masked(planes, word ^ words[j])
+        return planes
+
+    def _edge_disagreements(self) -> list:
+        """Return the bit-sliced count of the edges whose end points disagree, in every replica"""
+        offsets = self.adjacency.offsets
+        indices = self.adjacency.indices
+        words = self.words
+        planes = []
+
+        for i in range(self.adjacency.num_vertices):
+            word = words[i]
+            for j in indices[offsets[i]:offsets[i + 1]]:
+                if j > i:
+                    _add_masked(planes, word ^ words[j])
+        return planes
+
+    def global_frustration(self) -> List[float]:
+        """Return the global metric of every replica.
+        Every edge adds +1 if its end points agree and -1 otherwise.
+        """
+        num_edges = self.adjacency.num_edges
+        return [float(num_edges - 2 * count) for count in _unpack(self._edge_disagreements(), self.replicas)]
+
+    def mean_global_frustration(self) -> float:
+        """Return the global metric averaged over the replicas, counting disagreements with popcount"""
+        offsets = self.adjacency.offsets
+        indices = self.adjacency.indices
+        words = self.words
+        disagreements = 0
+
+        for i in range(self.adjacency.num_vertices):
+            word = words[i]
+            for j in indices[offsets[i]:offsets[i + 1]]:
+                if j > i:
+                    disagreements += popcount(word ^ words[j])
+        return self.adjacency.num_edges - 2 * disagreements / self.replicas
+
+    def disagreement_planes(self) -> list:
+        """Return the bit-sliced count of disagreeing neighbours of every vertex.
+        The counters are built on first use and then kept up to date by every swap.
+        """
+        if self._planes is None:
+            self._planes = [self._disagreement_planes(i, self.words[i]) for i in range(self.adjacency.num_vertices)]
+        return self._planes
+
+    def update_ordered(self) -> None:
+        """Visit each site and swap its colour in the replicas where its local action is positive"""
+        offsets = self.adjacency.offsets
+        planes = self.disagreement_planes()
+        full = self.full
+
+        for i in range(self.adjacency.num_vertices):
+            # local action d - 2D is positive for D < (d + 1) // 2
+            swap = _less_than(planes[i], (offsets[i + 1] - offsets[i] + 1) // 2, full)
+            if swap:
+                self._flip_masked(i, swap)
+
+    def acceptance_thresholds(self, temperature: float) -> dict:
+        """Return dictionary with local action a <= 0 as key and exp(2a / temperature) as a PROBABILITY_BITS bit
+        integer as value. Sites with positive local action are always accepted.
+        """
+        scale = 1 << PROBABILITY_BITS
+        max_degree = self.adjacency.max_degree()
+        table = acceptance_table(temperature, max_degree)
+        return {a: int(table[a + max_degree] * scale) for a in range(-max_degree, 1)}
+
+    def _bernoulli_mask(self, threshold: int) -> int:
+        """Return mask with each replica set with probability threshold / 2**PROBABILITY_BITS.
+        A uniform number is compared with the threshold bit by bit from the top, one random word per bit for all
+        replicas, until every replica is decided (about log2(replicas) + 1 words).
+        """
+        random_word = self._random_word
+        undecided = self.full
+        result = 0
+
+        for b in range(PROBABILITY_BITS - 1, -1, -1):
+            word = random_word()
+            if (threshold >> b) & 1:
+                result |= undecided & ~word
+                undecided &= word
+            else:
+                undecided &= ~word
+            if not undecided:
+                break
+        return result
+
+    def update_metropolis(self, temperature: float) -> None:
+        """Visit each site and swap its colour in every replica with Metropolis probability min(1, exp(2a / T)),
+        where a is the local action of the site in the replica.
+        """
+        if temperature <= 0:
+            raise ValueError("Metropolis updates need a positive temperature.")
+
+        offsets = self.adjacency.offsets
+        all_planes = self.disagreement_planes()
+        full = self.full
+        thresholds = self.acceptance_thresholds(temperature)
+        scale = 1 << PROBABILITY_BITS
+
+        for i in range(self.adjacency.num_vertices):
+            degree = offsets[i + 1] - offsets[i]
+            planes = all_planes[i]
+            positive = (degree + 1) // 2
+
+            # positive local action is always accepted, the others with their probability
+            swap = _less_than(planes, positive, full)
+            for disagreements in range(positive, degree + 1):
+                equal = _equal_to(planes, disagreements, full)
+                if equal:
+                    threshold = thresholds[degree - 2 * disagreements]
+                    swap |= equal if threshold >= scale else equal & self._bernoulli_mask(threshold)
+            if swap:
+                self._flip_masked(i, swap)
+
+    def update_max_violation(self) -> List[float]:
+        """Swap the colour of the site with the largest local action in every replica, the first site in order
+        of dense index on ties. Return the local action of the swapped site in every replica.
+        """
+        offsets = self.adjacency.offsets
+        full = self.full
+        max_degree = self.adjacency.max_degree()
+        width = (2 * max_degree).bit_length()
+
+        planes = self.disagreement_planes()
+
+        # bit-sliced running maximum of local action + max degree, recording where it grows in each replica
+        best = None
+        improvements = []
+        for i in range(self.adjacency.num_vertices):
+            value = []
+            borrow = 0
+            constant = offsets[i + 1] - offsets[i] + max_degree
+            disagreements = planes[i]
+            for b in range(width):
+                x = full if (constant >> b) & 1 else 0
+                y = disagreements[b - 1] if 1 <= b <= len(disagreements) else 0
+                value.append(x ^ y ^ borrow)
+                borrow = ((~x & (y | borrow)) | (y & borrow)) & full
+
+            if best is None:
+                best = value
+                improvements.append((i, full))
+                continue
+
+            greater = 0
+            equal = full
+            for b in range(width - 1, -1, -1):
+                greater |= equal & value[b] & ~best[b]
+                equal &= ~(value[b] ^ best[b])
+            if greater:
+                best = [(best[b] & ~greater) | (value[b] & greater) for b in range(width)]
+                improvements.append((i, greater))
+
+        if best is None:
+            return []
+
+        # the last improvement of a replica is its site with the largest local action
+        remaining = full
+        for i, greater in reversed(improvements):
+            chosen = greater & remaining
+            if chosen:
+                self._flip_masked(i, chosen)
+                remaining &= ~chosen
+                if not remaining:
+                    break
+
+        return [float(value - max_degree) for value in _unpack(best, self.replicas)]
+
+    def _flip_masked(self, i: int, mask: int) -> None:
+        """Swap the colour of vertex i in the replicas set in mask and update the disagreement counters"""
+        offsets = self.adjacency.offsets
+        words = self.words
+        planes = self._planes
+        old_word = words[i]
+        words[i] = old_word ^ mask
+        own_planes = []
+
+        # each edge of vertex i toggles between agreeing and disagreeing in the replicas set in mask
+        for j in self.adjacency.indices[offsets[i]:offsets[i + 1]]:
+            disagree = old_word ^ words[j]
+            _subtract_masked(planes[j], mask & disagree)
+            _add_masked(planes[j], mask & ~disagree)
+            _add_masked(own_planes, words[i] ^ words[j])
+        planes[i] = own_planes
+
+    def run(self, update_procedure: str, iterations: int, temperature: Optional[float] = None) -> List[List[float]]:
+        """Update all replicas for a number of iterations with 'ordered', 'maxviolation' or 'metropolis', which needs
+        a temperature. Return list with the global metric of each replica before and after every iteration, and store
+        dictionary with keys 'iterations' and the 'seed' and 'spawn_key' of the random numbers in self.convergence.
+        """
+        procedure = update_procedure.lower()
+        if procedure == "metropolis" and temperature is None:
+            raise ValueError("Metropolis updates need a temperature.")
+        global_frustration = self.global_frustration()
+        history = [[frustration] for frustration in global_frustration]
+
+        for iteration in range(iterations):
+            if procedure == "ordered":
+                self.update_ordered()
+                global_frustration = self.global_frustration()
+            elif procedure == "maxviolation":
+                # a swap lowers the global metric by 2 * local action
+                actions = self.update_max_violation()
+                global_frustration = [h - 2 * a for h, a in zip(global_frustration, actions)]
+            elif procedure == "metropolis":
+                self.update_metropolis(temperature)
+                global_frustration = self.global_frustration()
+            else:
+                raise ValueError(f"Unknown update procedure '{update_procedure}'.")
+
+            for replica_history, frustration in zip(history, global_frustration):
+                replica_history.append(frustration)
+
+        self.convergence = {'iterations': iterations, 'seed': self.rng.seed, 'spawn_key': self.rng.spawn_key}
+        return history
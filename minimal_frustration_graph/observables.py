@@ -0,0 +1,228 @@
+"""
+This module provides Observables, an observer of run_simulation that keeps statistics of the global frustration
+(energy) and the magnetisation of a graph while it runs, and the accumulators it is built from: RunningMoments and
+Autocorrelation.
+
+Requirements
+------------
+Python 3.7 or higher.
+
+Notes
+-----
+RunningMoments updates mean and variance with Welford's method, so nothing but three numbers is stored.
+Autocorrelation keeps the last max_lag values in a ring buffer and the running sums of x_t x_t-k for every lag
+k < max_lag, which costs O(max_lag) per value, however long the run. Every value is written twice into a buffer of
+2 max_lag values, so the lagged values of the newest one are always a single slice. Values are shifted by the first
+value before they are summed, so large energies do not swamp the fluctuations. The integrated autocorrelation time
+tau = 1/2 + sum of rho(k) for k = 1..W uses the smallest window W >= window_factor * tau (Sokal), and is marked
+unreliable if no such window below max_lag exists. The error of a mean is sqrt(variance * 2 tau / n).
+The magnetisation m = 1 - 2 * (mean colour) is read from the running count of vertices with colour 1 of the graph.
+getstate and setstate save and restore all of it as JSON-compatible dictionaries, for checkpoints of a run.
+"""
+
+# Import dependencies
+from array import array
+import math as math
+
+
+class RunningMoments:
+    """Each instance of this class keeps the count, mean and variance of the values added to it."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.mean = 0.0
+        # sum of squared differences from the mean
+        self._m2 = 0.0
+
+    def add(self, value: float) -> None:
+        """Add a value"""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self) -> float:
+        """Return the variance of the values (of the population, 0 for fewer than 2 values)"""
+        return self._m2 / self.count if self.count > 1 else 0.0
+
+    def getstate(self) -> dict:
+        """Return dictionary of the state, see setstate"""
+        return {'count': self.count, 'mean': self.mean, 'm2': self._m2}
+
+    def setstate(self, state: dict) -> None:
+        """Continue from a state returned by getstate"""
+        self.count, self.mean, self._m2 = state['count'], state['mean'], state['m2']
+
+
+class Autocorrelation:
+    """Each instance of this class estimates the autocorrelation of the values added to it, up to a largest lag."""
+
+    def __init__(self, max_lag: int = 100, window_factor: float = 5.0) -> None:
+        """
+        Parameters
+        ----------
+        max_lag: int, default = 100
+            Number of lags (0..max_lag-1) whose correlation is kept.
+        window_factor: float, default = 5.0
+            The window of the integrated autocorrelation time is the first lag W with W >= window_factor * tau.
+        """
+        self.max_lag = max_lag
+        self.window_factor = window_factor
+        self.count = 0
+        self._shift = None
+        # the last max_lag shifted values (twice), and the sums of the shifted values and of their lagged products
+        self._buffer = array('d', bytes(16 * max_lag))
+        self._sum = 0.0
+        self._products = [0.0] * max_lag
+
+    def add(self, value: float) -> None:
+        """Add the next value of the series"""
+        if self._shift is None:
+            self._shift = value
+        value -= self._shift
+        max_lag = self.max_lag
+        position = self.count % max_lag
+        buffer = self._buffer
+        buffer[position] = buffer[position + max_lag] = value
+
+        # values at lags 0..max_lag-1, zeros before the first value
+        lagged = buffer[position + max_lag:position:-1]
+        self._products = [product + value * other for product, other in zip(self._products, lagged)]
+        self._sum += value
+        self.count += 1
+
+    def getstate(self) -> dict:
+        """Return dictionary of the state, see setstate"""
+        return {'max_lag': self.max_lag, 'count': self.count, 'shift': self._shift, 'buffer': self._buffer.tolist(),
+                'sum': self._sum, 'products': list(self._products)}
+
+    def setstate(self, state: dict) -> None:
+        """Continue from a state returned by getstate of an Autocorrelation with the same max_lag"""
+        if state['max_lag'] != self.max_lag:
+            raise ValueError(f"The state has max_lag {state['max_lag']}, not {self.max_lag}.")
+        self.count, self._shift, self._sum = state['count'], state['shift'], state['sum']
+        self._buffer = array('d', state['buffer'])
+        self._products = list(state['products'])
+
+    def correlation(self, lag: int) -> float:
+        """Return the normalised autocorrelation rho(lag) of the values, 0 if it cannot be estimated"""
+        if lag >= min(self.count, self.max_lag):
+            return 0.0
+        mean = self._sum / self.count
+        variance = self._products[0] / self.count - mean * mean
+        if variance <= 0:
+            return 0.0
+        return (self._products[lag] / (self.count - lag) - mean * mean) / variance
+
+    def integrated_time(self) -> tuple:
+        """Return the integrated autocorrelation time and whether its window fitted below max_lag"""
+        tau = 0.5
+        for lag in range(1, min(self.count, self.max_lag)):
+            tau += self.correlation(lag)
+            if lag >= self.window_factor * tau:
+                return max(tau, 0.5), True
+        return max(tau, 0.5), False
+
+
+class Observables:
+    """Each instance of this class is an observer of a graph that keeps statistics of its energy and magnetisation."""
+
+    def __init__(self, burn_in: int = 0, max_lag: int = 100) -> None:
+        """
+        Parameters
+        ----------
+        burn_in: int, default = 0
+            Number of first steps left out of the statistics, while the run is still far from equilibrium.
+        max_lag: int, default = 100
+            Largest lag of the autocorrelation estimates, see Autocorrelation.
+        """
+        self.burn_in = burn_in
+        self.max_lag = max_lag
+        self.graph = None
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget every step seen"""
+        self.steps = 0
+        self.energy = RunningMoments()
+        self.magnetisation = RunningMoments()
+        self.absolute_magnetisation = RunningMoments()
+        self.energy_correlation = Autocorrelation(self.max_lag)
+        self.magnetisation_correlation = Autocorrelation(self.max_lag)
+
+    def getstate(self) -> dict:
+        """Return dictionary of the settings and statistics, see setstate"""
+        return {
+            'burn_in': self.burn_in,
+            'max_lag': self.max_lag,
+            'steps': self.steps,
+            'energy': self.energy.getstate(),
+            'magnetisation': self.magnetisation.getstate(),
+            'absolute_magnetisation': self.absolute_magnetisation.getstate(),
+            'energy_correlation': self.energy_correlation.getstate(),
+            'magnetisation_correlation': self.magnetisation_correlation.getstate(),
+        }
+
+    def setstate(self, state: dict) -> None:
+        """Continue the statistics of a state returned by getstate"""
+        self.burn_in, self.max_lag = state['burn_in'], state['max_lag']
+        self.reset()
+        self.steps = state['steps']
+        for name in ('energy', 'magnetisation', 'absolute_magnetisation', 'energy_correlation',
+                     'magnetisation_correlation'):
+            getattr(self, name).setstate(state[name])
+
+    def attach(self, graph) -> None:
+        """Remember the graph, for its temperature and number of vertices"""
+        self.graph = graph
+
+    def __call__(self, graph, step: int) -> None:
+        """Add the energy and magnetisation of graph after step"""
+        self.steps += 1
+        if self.steps <= self.burn_in:
+            return
+        energy = graph.global_frustration
+        magnetisation = graph.magnetisation
+        self.energy.add(energy)
+        self.magnetisation.add(magnetisation)
+        self.absolute_magnetisation.add(abs(magnetisation))
+        self.energy_correlation.add(energy)
+        self.magnetisation_correlation.add(magnetisation)
+
+    def _summary(self, moments: RunningMoments, correlation: Autocorrelation) -> dict:
+        """Return dictionary with the statistics of one observable"""
+        tau, reliable = correlation.integrated_time()
+        count = moments.count
+        return {
+            'mean': moments.mean,
+            'variance': moments.variance,
+            'error': math.sqrt(moments.variance * 2 * tau / count) if count else 0.0,
+            'autocorrelation_time': tau,
+            'autocorrelation_reliable': reliable,
+            'effective_samples': count / (2 * tau),
+        }
+
+    def report(self) -> dict:
+        """Return dictionary with keys 'samples' (steps after the burn in), 'energy' and 'magnetisation' (each with
+        'mean', 'variance', 'error', 'autocorrelation_time', 'autocorrelation_reliable' and 'effective_samples'),
+        'mean_color', 'absolute_magnetisation', and at positive temperature 'specific_heat' and 'susceptibility'
+        per vertex (None otherwise).
+        """
+        magnetisation = self._summary(self.magnetisation, self.magnetisation_correlation)
+        report = {
+            'samples': self.energy.count,
+            'energy': self._summary(self.energy, self.energy_correlation),
+            'magnetisation': magnetisation,
+            'mean_color': (1 - magnetisation['mean']) / 2,
+            'absolute_magnetisation': self.absolute_magnetisation.mean,
+            'specific_heat': None,
+            'susceptibility': None,
+        }
+
+        temperature = getattr(self.graph, 'temperature', 0.0)
+        if self.graph is not None and temperature > 0:
+            num_vertices = len(self.graph.colors)
+            report['specific_heat'] = self.energy.variance / (temperature ** 2 * num_vertices)
+            report['susceptibility'] = num_vertices * self.magnetisation.variance / temperature
+        return report
@@ -0,0 +1,135 @@
+"""
+This module provides gnp_edges and gnm_edges, functions generating the edges of sparse random graphs in time
+proportional to the number of edges, and random_compact_graph, which builds their compact adjacency directly.
+
+Requirements
+------------
+Python 3.7 or higher.
+Optional: package numpy https://numpy.org/, which makes the generators vectorised and their edges (E x 2) int64
+arrays instead of lists of tuples.
+
+Notes
+-----
+The n (n - 1) / 2 possible edges (i, j) with i < j are numbered row by row. G(n, p) jumps from one edge to the next
+with geometrically distributed gaps (Batagelj and Brandes, 2005), so only the edges that are present cost any work.
+G(n, m) samples m distinct edge numbers. The edge numbers are turned back into (i, j) with a square root, corrected
+by one row where rounding went wrong. Both give the edges in the order of generate_random_graph.
+"""
+
+# Import dependencies
+from typing import Optional
+import math as math
+from compact_graph import CompactGraph
+from rng import as_stream
+
+# Optional dependency for the vectorised generators
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _num_pairs(n: int) -> int:
+    """Return the number of possible edges of a simple graph with n vertices"""
+    return n * (n - 1) // 2
+
+
+def _row_start(i, n: int):
+    """Return the number of the first possible edge of row i: the number of edges (i', j) with i' < i"""
+    return i * (2 * n - i - 1) // 2
+
+
+def _pairs_from_numbers(numbers, n: int):
+    """Return (k x 2) int64 array of the edges (i, j), i < j, of an array of edge numbers"""
+    numbers = np.asarray(numbers, dtype=np.int64)
+    b = 2 * n - 1
+    rows = ((b - np.sqrt(np.maximum(b * b - 8.0 * numbers, 0.0))) // 2).astype(np.int64)
+
+    # correct rows that floating point rounding put one too high or too low
+    rows -= _row_start(rows, n) > numbers
+    rows += _row_start(rows + 1, n) <= numbers
+
+    columns = numbers - _row_start(rows, n) + rows + 1
+    return np.stack([rows, columns], axis=1)
+
+
+def _pair_from_number(number: int, n: int) -> tuple:
+    """Return the edge (i, j), i < j, with number"""
+    b = 2 * n - 1
+    i = int((b - math.sqrt(max(b * b - 8 * number, 0))) // 2)
+    while _row_start(i, n) > number:
+        i -= 1
+    while _row_start(i + 1, n) <= number:
+        i += 1
+    return i, number - _row_start(i, n) + i + 1
+
+
+def gnp_edges(n: int, p: float, seed=None):
+    """Return the edges of a G(n, p) random graph: each of the n (n - 1) / 2 possible edges is present with
+    probability p. seed (or a RandomStream) makes the graph reproducible.
+    """
+    if not 0 <= p <= 1:
+        raise ValueError("The edge probability p must be between 0 and 1.")
+    rng = as_stream(seed)
+    num_pairs = _num_pairs(n)
+
+    if np is not None:
+        if p == 0 or num_pairs == 0:
+            return np.empty((0, 2), dtype=np.int64)
+        if p == 1:
+            return _pairs_from_numbers(np.arange(num_pairs), n)
+
+        # draw the gaps between present edges in blocks of about the expected number of edges
+        expected = num_pairs * p
+        block = int(expected + 5 * math.sqrt(expected)) + 16
+        numbers = []
+        last = -1
+        while True:
+            positions = last + np.cumsum(rng.generator.geometric(p, size=block))
+            numbers.append(positions[positions < num_pairs])
+            if positions[-1] >= num_pairs:
+                break
+            last = positions[-1]
+        return _pairs_from_numbers(np.concatenate(numbers), n)
+
+    edges = []
+    if p == 0:
+        return edges
+    log_q = math.log1p(-p) if p < 1 else -math.inf
+    number = -1
+    while True:
+        # a geometric gap of at least 1 from a uniform float
+        number += 1 + (int(math.log(1.0 - rng.random()) / log_q) if p < 1 else 0)
+        if number >= num_pairs:
+            return edges
+        edges.append(_pair_from_number(number, n))
+
+
+def gnm_edges(n: int, m: int, seed=None):
+    """Return the edges of a G(n, m) random graph: m edges drawn uniformly from the n (n - 1) / 2 possible edges.
+    seed (or a RandomStream) makes the graph reproducible.
+    """
+    num_pairs = _num_pairs(n)
+    if not 0 <= m <= num_pairs:
+        raise ValueError(f"A graph with {n} vertices has between 0 and {num_pairs} edges.")
+    rng = as_stream(seed)
+
+    if np is not None:
+        numbers = np.sort(rng.generator.choice(num_pairs, size=m, replace=False))
+        return _pairs_from_numbers(numbers, n)
+
+    numbers = sorted(rng.sample(num_pairs, m))
+    return [_pair_from_number(number, n) for number in numbers]
+
+
+def random_compact_graph(n: int, p: Optional[float] = None, m: Optional[int] = None, seed=None) -> CompactGraph:
+    """Return the compact adjacency of a G(n, p) (if p is given) or G(n, m) (if m is given) random graph.
+    Vertex i has label i, vertices without edges included.
+    """
+    if (p is None) == (m is None):
+        raise ValueError("Give either the edge probability p or the number of edges m.")
+    edges = gnp_edges(n, p, seed) if p is not None else gnm_edges(n, m, seed)
+
+    if np is not None:
+        return CompactGraph.from_edge_array(edges, num_vertices=n)
+    return CompactGraph.from_edges(edges, num_vertices=n)
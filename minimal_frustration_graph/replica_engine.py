@@ -0,0 +1,135 @@
+"""
+This module provides ReplicaMonteCarlo, a class advancing many colorings (replicas) of one graph together.
+
+Requirements
+------------
+Package numpy https://numpy.org/ which can be installed via PIP.
+Python 3.7 or higher.
+
+Notes
+-----
+The colorings are stored as one (replicas x vertices) array. Each vertex is updated in all replicas at once with
+vectorised neighbour sums and random numbers drawn for a whole sweep, so the Python work per sweep does not grow
+with the number of replicas.
+"""
+
+# Import dependencies
+import numpy as np
+from compact_graph import CompactGraph, as_compact_graph
+from graph import NumpyFrustrationKernel, acceptance_table
+from rng import as_stream
+
+
+class ReplicaMonteCarlo:
+    """Each instance of this class holds R colorings of a graph and advances them with the same update procedure."""
+
+    def __init__(
+        self,
+        adjacency: CompactGraph,
+        replicas: int,
+        color_pattern: str = 'All random',
+        seed=None) -> None:
+        """
+        Parameters
+        ----------
+        adjacency: CompactGraph
+            Compact adjacency of the graph shared by all replicas, or the path of a binary graph file.
+        replicas: int
+            Number of colorings advanced together.
+        color_pattern: str, default = 'All random'
+            Initial color of the vertices: 'All 0', 'All 1' or random colors drawn independently for each replica.
+        seed: default = None
+            Seed (or RandomStream) of the random numbers of the replicas.
+        """
+        self.adjacency = adjacency = as_compact_graph(adjacency)
+        self.replicas = replicas
+        self.stream = as_stream(seed)
+        self.rng = self.stream.generator
+        self.kernel = NumpyFrustrationKernel(adjacency)
+
+        # spins (+1/-1) of every replica, stored vertex by vertex so the spins of one vertex in all replicas
+        # are contiguous in memory
+        self.spins = np.asfortranarray(1 - 2 * self.create_colors(color_pattern))
+        self.global_frustration = self.compute_global_frustration()
+
+    def create_colors(self, color_pattern: str):
+        """Return (replicas x vertices) int8 array of colors following color_pattern"""
+        shape = (self.replicas, self.adjacency.num_vertices)
+
+        if color_pattern == 'All 0':
+            return np.zeros(shape, dtype=np.int8)
+        if color_pattern == 'All 1':
+            return np.ones(shape, dtype=np.int8)
+        return self.rng.integers(0, 2, size=shape, dtype=np.int8)
+
+    @property
+    def colors(self):
+        """(replicas x vertices) int8 array with the color of every vertex in every replica"""
+        return ((1 - self.spins) // 2).astype(np.int8)
+
+    @colors.setter
+    def colors(self, colors) -> None:
+        """Set the colors of all replicas, a single coloring is copied to every replica"""
+        colors = np.broadcast_to(np.asarray(colors, dtype=np.int8), self.spins.shape)
+        self.spins[:] = 1 - 2 * colors
+        self.global_frustration = self.compute_global_frustration()
+
+    def compute_global_frustration(self):
+        """Return the global metric of every replica, computed from the spins"""
+        spins = self.spins.T.astype(np.int64)
+        local_actions = spins * self.kernel.neighbour_sums(spins)
+        return 0.5 * local_actions.sum(axis=0).astype(np.float64)
+
+    def acceptance_tables(self, temperature, rule: str = 'metropolis'):
+        """Return (replicas x 2 * max degree + 1) array with the acceptance table of each replica (see
+        acceptance_table). temperature is one temperature for all replicas or one temperature per replica.
+        """
+        temperatures = np.broadcast_to(np.asarray(temperature, dtype=np.float64), (self.replicas,))
+        max_degree = self.adjacency.max_degree()
+        tables = {t: acceptance_table(t, max_degree, rule) for t in set(temperatures.tolist())}
+        return np.array([tables[t] for t in temperatures.tolist()], dtype=np.float64)
+
+    def sweep(self, update_procedure: str = 'montecarlo', temperature=0.0) -> None:
+        """Visit each site in order of dense index and update it in all replicas at once.
+        'ordered' swaps the colour where the local action is positive, 'montecarlo' (or 'metropolis') and
+        'heatbath' with the acceptance probability of the local action at the temperature of each replica.
+        """
+        spins = self.spins
+        offsets = self.kernel.offsets
+        indices = self.kernel.indices
+        global_frustration = self.global_frustration
+        procedure = update_procedure.lower()
+        thermal = procedure != 'ordered' and np.any(np.asarray(temperature) > 0)
+
+        # look up the acceptance probabilities and draw the random numbers of the whole sweep at once
+        if thermal:
+            rule = 'heatbath' if procedure == 'heatbath' else 'metropolis'
+            tables = self.acceptance_tables(temperature, rule)
+            rows = np.arange(self.replicas)
+            max_degree = self.adjacency.max_degree()
+            random_numbers = self.rng.random((self.adjacency.num_vertices, self.replicas))
+
+        for i in range(self.adjacency.num_vertices):
+            column = spins[:, i]
+            local_action = column * spins[:, indices[offsets[i]:offsets[i + 1]]].sum(axis=1)
+            if thermal:
+                swap = random_numbers[i] < tables[rows, local_action + max_degree]
+            else:
+                swap = local_action > 0
+
+            # swap colours and lower the global metric by 2 * local action where accepted
+            global_frustration -= 2 * np.where(swap, local_action, 0)
+            np.negative(column, out=column, where=swap)
+
+    def run(self, update_procedure: str, sweeps: int, temperature=0.0):
+        """Advance all replicas for a number of sweeps at temperature (one for all replicas or one per replica).
+        Return (replicas x sweeps + 1) array with the global metric of each replica before and after every sweep.
+        """
+        history = np.empty((self.replicas, sweeps + 1), dtype=np.float64)
+        history[:, 0] = self.global_frustration
+
+        for sweep in range(sweeps):
+            self.sweep(update_procedure, temperature)
+            history[:, sweep + 1] = self.global_frustration
+
+        return history
@@ -0,0 +1,183 @@
+"""
+This module provides RandomStream, a seedable source of random numbers that are drawn in large blocks, and
+as_stream, a function turning a seed (or an existing stream) into a stream.
+
+Requirements
+------------
+Python 3.7 or higher.
+Optional: package numpy https://numpy.org/, without it the streams fall back to the random module.
+
+Notes
+-----
+With numpy a stream is a PCG64 Generator seeded by a SeedSequence(seed, spawn_key). spawn gives child streams whose
+spawn keys extend the key of their parent, so the streams of replicas and worker processes are independent and each
+can be reproduced from (seed, spawn_key) alone. Without numpy a stream is a random.Random seeded with the text of
+(seed, spawn_key), which is reproducible in the same way but not statistically independent by construction.
+Uniform floats are taken from a pre-filled block of block_size numbers, so the cost of the generator is paid once
+per block instead of once per number. The state of a stream (see getstate) holds the state of the generator before
+the current block was drawn and the position in the block, so the block is drawn again instead of being stored.
+"""
+
+# Import dependencies
+from typing import List, Optional
+import random as random
+
+# Optional dependency for the generator
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class RandomStream:
+    """Each instance of this class is one reproducible stream of random numbers."""
+
+    def __init__(self, seed: Optional[int] = None, spawn_key: tuple = (), block_size: int = 65536) -> None:
+        """
+        Parameters
+        ----------
+        seed: Optional[int], default = None
+            Seed of the stream. If None, a seed is drawn from the operating system and stored in self.seed.
+        spawn_key: tuple, default = ()
+            Position of the stream in the tree of spawned streams, () for a root stream.
+        block_size: int, default = 65536
+            Number of uniform floats drawn at once.
+        """
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(128)
+        self.seed = seed
+        self.spawn_key = tuple(spawn_key)
+        self.block_size = block_size
+        self.children = 0
+
+        if np is not None:
+            self.seed_sequence = np.random.SeedSequence(seed, spawn_key=self.spawn_key)
+            self.generator = np.random.Generator(np.random.PCG64(self.seed_sequence))
+            self._random = None
+        else:
+            self.seed_sequence = None
+            self.generator = None
+            self._random = random.Random(f"{seed}/{self.spawn_key}")
+
+        self._block = []
+        self._position = 0
+        # state of the generator before the current block was drawn
+        self._block_state = None
+
+    def _generator_state(self):
+        """Return the state of the underlying generator, as plain (JSON serialisable) values"""
+        if self.generator is not None:
+            return self.generator.bit_generator.state
+        version, internal_state, gauss_next = self._random.getstate()
+        return [version, list(internal_state), gauss_next]
+
+    def _set_generator_state(self, state) -> None:
+        """Set the state of the underlying generator from _generator_state"""
+        if self.generator is not None:
+            self.generator.bit_generator.state = state
+        else:
+            version, internal_state, gauss_next = state
+            self._random.setstate((version, tuple(internal_state), gauss_next))
+
+    def _fill_block(self) -> None:
+        """Draw a new block of uniform floats"""
+        self._block_state = self._generator_state()
+        self._block = self._draw(self.block_size)
+        self._position = 0
+
+    def getstate(self) -> dict:
+        """Return the state of this stream as a dictionary of plain (JSON serialisable) values"""
+        partial_block = self._position < len(self._block)
+        return {
+            'seed': self.seed,
+            'spawn_key': list(self.spawn_key),
+            'block_size': self.block_size,
+            'children': self.children,
+            'generator': self._generator_state(),
+            'block_state': self._block_state if partial_block else None,
+            'position': self._position if partial_block else 0,
+        }
+
+    def setstate(self, state: dict) -> None:
+        """Continue this stream from a state returned by getstate, drawing the same numbers from then on"""
+        if state['seed'] != self.seed or tuple(state['spawn_key']) != self.spawn_key:
+            raise ValueError("The state belongs to a stream with another seed or spawn key.")
+        self.block_size = state['block_size']
+        self.children = state['children']
+        self._block = []
+        self._position = 0
+        self._block_state = None
+        if state['block_state'] is not None:
+            self._set_generator_state(state['block_state'])
+            self._fill_block()
+            self._position = state['position']
+        self._set_generator_state(state['generator'])
+
+    def spawn(self, n: int) -> List["RandomStream"]:
+        """Return n new streams, independent of this stream and of each other"""
+        children = [RandomStream(self.seed, self.spawn_key + (self.children + k,), self.block_size) for k in range(n)]
+        self.children += n
+        return children
+
+    def _draw(self, n: int) -> list:
+        """Return list of n uniform floats in [0, 1) straight from the generator"""
+        if self.generator is not None:
+            return self.generator.random(n).tolist()
+        rand = self._random.random
+        return [rand() for _ in range(n)]
+
+    def random(self) -> float:
+        """Return the next uniform float in [0, 1)"""
+        if self._position == len(self._block):
+            self._fill_block()
+        value = self._block[self._position]
+        self._position += 1
+        return value
+
+    def random_block(self, n: int) -> list:
+        """Return list of the next n uniform floats in [0, 1)"""
+        numbers = self._block[self._position:self._position + n]
+        self._position += len(numbers)
+        if len(numbers) < n:
+            missing = n - len(numbers)
+            if missing >= self.block_size:
+                numbers.extend(self._draw(missing))
+            else:
+                self._fill_block()
+                self._position = missing
+                numbers.extend(self._block[:missing])
+        return numbers
+
+    def randrange(self, n: int) -> int:
+        """Return a uniform int in 0..n-1"""
+        return int(self.random() * n)
+
+    def sample(self, population_size: int, k: int) -> list:
+        """Return list of k distinct uniform ints in 0..population_size-1"""
+        if self.generator is not None:
+            return self.generator.choice(population_size, size=k, replace=False).tolist()
+        return self._random.sample(range(population_size), k)
+
+    def words(self, n: int) -> list:
+        """Return list of n uniform 64-bit unsigned ints, straight from the generator"""
+        if self.generator is not None:
+            return self.generator.integers(0, 1 << 64, size=n, dtype=np.uint64).tolist()
+        getrandbits = self._random.getrandbits
+        return [getrandbits(64) for _ in range(n)]
+
+    def bits(self, n: int) -> bytes:
+        """Return n uniform 0/1 values as bytes"""
+        if self.generator is not None:
+            return self.generator.integers(0, 2, size=n, dtype=np.int8).tobytes()
+        return bytes(self._random.choices((0, 1), k=n))
+
+    def __repr__(self):
+        """Return a Python-like representation of this instance"""
+        return f"RandomStream(seed={self.seed}, spawn_key={self.spawn_key})"
+
+
+def as_stream(seed=None) -> RandomStream:
+    """Return seed if it is a RandomStream already, otherwise a new RandomStream seeded with it"""
+    if isinstance(seed, RandomStream):
+        return seed
+    return RandomStream(seed)
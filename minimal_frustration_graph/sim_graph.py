@@ -119,26 +119,34 @@ class Toplevel1:
                 self.display_error_message("Invalid file path. Please enter a valid file path.")
                 return
 
-        # Store graph edges in list of tuples
-        graph_edges_list = []
-
-        # if random is checked, generate random graph edge list
+        # if random is checked, generate random graph edge list and check that it is connected
+        # before any simulation state is built
         if random_is_checked == 1:
             graph_edges_list = g.generate_random_graph(num_of_sites)
-        else:  # get file from program
+            is_connected = g.edge_components(graph_edges_list).report().is_connected
+        else:  # get file from program, compiled and checked once and then taken from the graph cache
             file_from_path = self.Entry1.get()
-            graph_edges_list = g.create_graph_from_file(r"" + file_from_path)
+            cached_graph = g.cached_graph_file(r"" + file_from_path)
+            if cached_graph is not None:
+                is_connected = cached_graph.is_connected
+            else:  # the cache cannot be used, read the file directly
+                graph_edges_list = g.create_graph_from_file(file_from_path, use_cache=False)
+                is_connected = g.edge_components(graph_edges_list).report().is_connected
 
-        # Create graph
-        sim_graph = g.GraphCreater(graph_edges_list, color_pattern)
-        
         # Check that graph is connected
-        if sim_graph.update_graph_connection() == True:
-            sim_graph.update_graph_connection()
-        else:
+        if not is_connected:
             self.display_error_message("Graph not connected. Try again.")
             return
 
+        if random_is_checked == 1 or cached_graph is None:
+            sim_graph = g.GraphCreater(graph_edges_list, color_pattern)
+        else:
+            sim_graph = g.GraphCreater(cached_graph.adjacency, color_pattern)
+        sim_graph.is_connected = is_connected
+
+        # Draw the graph while the simulation runs
+        sim_graph.add_observer(g.VisualObserver())
+
         # Run simulation
         sim_graph.run_simulation(update_procedure, number_of_iterations)
 
@@ -0,0 +1,243 @@
+"""
+This module provides ParallelTempering, a class running replica exchange MonteCarlo: one replica of a graph per
+temperature, where replicas at neighbouring temperatures regularly try to exchange their temperatures.
+
+Requirements
+------------
+Python 3.7 or higher.
+Package numpy https://numpy.org/ for the batched backend, the process backend runs without it.
+
+Notes
+-----
+A coloring with global frustration H has weight exp(-H / T), so replicas r and s at temperatures T_k and T_k+1
+exchange with probability min(1, exp((1/T_k - 1/T_k+1) (H_r - H_s))). Only the temperatures are exchanged, never
+the colorings, so the replicas can stay where they are: in one (replicas x vertices) array advanced by
+ReplicaMonteCarlo, or in GraphCreater instances on worker processes that only receive their temperatures and send
+back their global frustrations. Pairs (0, 1), (2, 3), ... and (1, 2), (3, 4), ... are tried in alternate rounds.
+A round trip is a replica moving from the lowest temperature to the highest and back.
+"""
+
+# Import dependencies
+from array import array
+from multiprocessing import Pipe, Process
+from typing import List, Optional, Sequence
+import math as math
+from compact_graph import CompactGraph, as_compact_graph
+from graph import GraphCreater
+from rng import RandomStream, as_stream
+
+
+def _replica_worker(connection, adjacency: CompactGraph, color_pattern: str, streams: List[RandomStream],
+                    rule: str) -> None:
+    """Hold replicas of a graph in a worker process and advance them at the temperatures received on connection.
+    Messages are ('sweep', temperatures, sweeps), answered with the global frustration of every replica,
+    ('best',), answered with the lowest global frustration and its colors of every replica, and ('stop',).
+    """
+    graphs = [GraphCreater(adjacency, color_pattern, acceptance=rule, seed=stream) for stream in streams]
+    best = [[graph.global_frustration, array('b', graph.colors)] for graph in graphs]
+
+    while True:
+        message = connection.recv()
+        if message[0] == 'sweep':
+            _, temperatures, sweeps = message
+            for graph, temperature, replica_best in zip(graphs, temperatures, best):
+                for _ in range(sweeps):
+                    graph.update_monte_carlo(temperature)
+                    if graph.global_frustration < replica_best[0]:
+                        replica_best[0] = graph.global_frustration
+                        replica_best[1][:] = graph.colors
+            connection.send([graph.global_frustration for graph in graphs])
+        elif message[0] == 'best':
+            connection.send(best)
+        else:
+            connection.close()
+            return
+
+
+class ParallelTempering:
+    """Each instance of this class holds one replica of a graph per temperature and exchanges their temperatures."""
+
+    def __init__(
+        self,
+        adjacency: CompactGraph,
+        temperatures: Sequence[float],
+        color_pattern: str = 'All random',
+        seed=None,
+        swap_interval: int = 1,
+        rule: str = 'metropolis',
+        workers: Optional[int] = None) -> None:
+        """
+        Parameters
+        ----------
+        adjacency: CompactGraph
+            Compact adjacency of the graph shared by all replicas, or the path of a binary graph file. Worker
+            processes map such a file themselves.
+        temperatures: Sequence[float]
+            Positive temperatures of the replicas in increasing order.
+        color_pattern: str, default = 'All random'
+            Initial color of the vertices of every replica.
+        seed: default = None
+            Seed (or RandomStream) of the random numbers. Every replica gets its own spawned stream.
+        swap_interval: int, default = 1
+            Sweeps of every replica between two rounds of exchanges.
+        rule: str, default = 'metropolis'
+            Acceptance rule of the MonteCarlo updates: 'metropolis' or 'heatbath'.
+        workers: Optional[int], default = None
+            None advances all replicas in one batched array (requires numpy), otherwise the replicas are spread
+            over this number of worker processes.
+        """
+        if any(t <= 0 for t in temperatures) or list(temperatures) != sorted(temperatures):
+            raise ValueError("Temperatures must be positive and in increasing order.")
+
+        self.adjacency = adjacency = as_compact_graph(adjacency)
+        self.temperatures = [float(t) for t in temperatures]
+        self.replicas = len(self.temperatures)
+        self.swap_interval = swap_interval
+        self.rule = rule
+        self.rng = as_stream(seed)
+        replica_streams = self.rng.spawn(self.replicas)
+
+        # replica_at[k] is the replica at temperature k, temperature_index[r] the temperature of replica r
+        self.replica_at = list(range(self.replicas))
+        self.temperature_index = list(range(self.replicas))
+        self.swap_attempts = [0] * (self.replicas - 1)
+        self.swap_accepts = [0] * (self.replicas - 1)
+        # +1 after a replica visited the lowest temperature, -1 after it then visited the highest one
+        self.direction = [0] * self.replicas
+        self.round_trips = [0] * self.replicas
+        self.rounds = 0
+
+        self.engine = None
+        self.connections = []
+        self.processes = []
+        if workers is None:
+            from replica_engine import ReplicaMonteCarlo
+            # the batched replicas share one generator, spawned from the stream of the exchanges
+            self.engine = ReplicaMonteCarlo(adjacency, self.replicas, color_pattern, self.rng.spawn(1)[0])
+            self.global_frustration = self.engine.global_frustration.tolist()
+            self.best_frustration = list(self.global_frustration)
+            self.best_colors = [array('b', colors.tolist()) for colors in self.engine.colors]
+        else:
+            # contiguous chunks of replicas, one per worker
+            workers = max(1, min(workers, self.replicas))
+            self.chunks = [range(w * self.replicas // workers, (w + 1) * self.replicas // workers)
+                           for w in range(workers)]
+            for chunk in self.chunks:
+                connection, child_connection = Pipe()
+                process = Process(target=_replica_worker, daemon=True,
+                                  args=(child_connection, adjacency, color_pattern,
+                                        [replica_streams[r] for r in chunk], rule))
+                process.start()
+                self.connections.append(connection)
+                self.processes.append(process)
+            self.global_frustration = self._advance(0)
+            self.best_frustration = list(self.global_frustration)
+            self.best_colors = None
+
+        self.history = [[self.global_frustration[r]] for r in self.replica_at]
+
+    def _advance(self, sweeps: int) -> List[float]:
+        """Advance every replica for a number of sweeps at its temperature and return their global frustrations"""
+        temperatures = [self.temperatures[k] for k in self.temperature_index]
+
+        if self.engine is not None:
+            procedure = 'heatbath' if self.rule == 'heatbath' else 'metropolis'
+            engine = self.engine
+            for _ in range(sweeps):
+                engine.sweep(procedure, temperatures)
+                for r in range(self.replicas):
+                    if engine.global_frustration[r] < self.best_frustration[r]:
+                        self.best_frustration[r] = float(engine.global_frustration[r])
+                        self.best_colors[r][:] = array('b', ((1 - engine.spins[r]) // 2).tolist())
+            return engine.global_frustration.tolist()
+
+        for connection, chunk in zip(self.connections, self.chunks):
+            connection.send(('sweep', [temperatures[r] for r in chunk], sweeps))
+        global_frustration = []
+        for connection in self.connections:
+            global_frustration.extend(connection.recv())
+        return global_frustration
+
+    def exchange(self) -> None:
+        """Try to exchange the temperatures of the replicas at neighbouring temperatures, alternating between
+        the pairs starting at even and at odd temperatures in successive rounds.
+        """
+        replica_at = self.replica_at
+        global_frustration = self.global_frustration
+
+        for k in range(self.rounds % 2, self.replicas - 1, 2):
+            r, s = replica_at[k], replica_at[k + 1]
+            log_acceptance = ((1 / self.temperatures[k] - 1 / self.temperatures[k + 1])
+                              * (global_frustration[r] - global_frustration[s]))
+            self.swap_attempts[k] += 1
+            if log_acceptance >= 0 or self.rng.random() < math.exp(log_acceptance):
+                self.swap_accepts[k] += 1
+                replica_at[k], replica_at[k + 1] = s, r
+                self.temperature_index[r], self.temperature_index[s] = k + 1, k
+
+        # count round trips from the lowest temperature to the highest and back
+        coldest, hottest = replica_at[0], replica_at[-1]
+        if self.direction[coldest] == -1:
+            self.round_trips[coldest] += 1
+        self.direction[coldest] = 1
+        if self.direction[hottest] == 1:
+            self.direction[hottest] = -1
+
+    def run(self, rounds: int) -> dict:
+        """Run a number of rounds, each of swap_interval sweeps of every replica followed by exchanges.
+        Return dictionary with keys 'rounds', 'sweeps', 'swap_acceptance' (fraction of accepted exchanges of every
+        pair of neighbouring temperatures), 'round_trips', 'best_frustration', 'best_colors' (vertex label as key
+        and color as value), 'history' (global frustration at every temperature after every round) and the 'seed'
+        of the random numbers.
+        """
+        for _ in range(rounds):
+            self.global_frustration = self._advance(self.swap_interval)
+            self.exchange()
+            self.rounds += 1
+            for k, r in enumerate(self.replica_at):
+                self.history[k].append(self.global_frustration[r])
+
+        best_frustration, best_colors = self.best()
+        return {
+            'rounds': self.rounds,
+            'sweeps': self.rounds * self.swap_interval,
+            'swap_acceptance': self.swap_acceptance(),
+            'round_trips': sum(self.round_trips),
+            'best_frustration': best_frustration,
+            'best_colors': self.adjacency.label_map.to_label_dict(best_colors),
+            'history': self.history,
+            'seed': self.rng.seed,
+        }
+
+    def swap_acceptance(self) -> List[float]:
+        """Return the fraction of accepted exchanges of every pair of neighbouring temperatures"""
+        return [accepts / attempts if attempts else 0.0
+                for accepts, attempts in zip(self.swap_accepts, self.swap_attempts)]
+
+    def best(self) -> tuple:
+        """Return the lowest global frustration of any replica and its colors"""
+        if self.engine is None:
+            for connection in self.connections:
+                connection.send(('best',))
+            best = [replica_best for connection in self.connections for replica_best in connection.recv()]
+            self.best_frustration = [frustration for frustration, _ in best]
+            self.best_colors = [colors for _, colors in best]
+
+        r = min(range(self.replicas), key=self.best_frustration.__getitem__)
+        return self.best_frustration[r], self.best_colors[r]
+
+    def close(self) -> None:
+        """Stop the worker processes"""
+        for connection in self.connections:
+            connection.send(('stop',))
+            connection.close()
+        for process in self.processes:
+            process.join()
+        self.connections = []
+        self.processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,260 @@
+"""
+This module provides UnionFind, a disjoint set structure of dense indices, ComponentTracker, a class keeping the
+connected components of a graph while its edges are streamed in, and ComponentReport, a summary of the components.
+
+Requirements
+------------
+Python 3.7 or higher.
+Optional: package numpy https://numpy.org/, which joins whole batches of edges at once.
+
+Notes
+-----
+Vertex labels are mapped to dense indices in order of first appearance, like CompactGraph.from_edges, so the
+components of a tracker line up with the compact graph of the same edges. Only the label table and one parent per
+vertex are kept, never the edges, so the memory is O(V) however long the stream.
+Without numpy the edges are joined one by one with union by size and path halving, O(E α(V)) in total.
+With numpy a batch is joined in rounds: the larger root of every edge whose ends have different roots is hooked
+below the smallest root it shares an edge with and the parents are compressed by pointer jumping. A root is then
+always the smallest index of its component, and every root with an edge to a smaller root is removed in a round, so
+a batch takes few rounds in practice, also for a hub with many edges.
+"""
+
+# Import dependencies
+from array import array
+from typing import Iterable, List, Optional
+from compact_graph import _first_occurrences
+from edge_parser import ParseReport, iter_edge_batches
+
+# Optional dependency for joining batches of edges
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class UnionFind:
+    """Each instance of this class keeps disjoint sets of the dense indices 0..n-1."""
+
+    def __init__(self, n: int = 0) -> None:
+        """
+        Parameters
+        ----------
+        n: int, default = 0
+            Number of indices, each in a set of its own. More are added with add.
+        """
+        self.parent = array('i', range(n))
+        self.size = array('i', [1]) * n
+
+    def add(self) -> int:
+        """Add a new index in a set of its own and return it"""
+        i = len(self.parent)
+        self.parent.append(i)
+        self.size.append(1)
+        return i
+
+    def find(self, i: int) -> int:
+        """Return the root of the set of index i"""
+        parent = self.parent
+        while parent[i] != i:
+            # path halving: point every other vertex on the path to its grandparent
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, i: int, j: int) -> bool:
+        """Join the sets of indices i and j. Return True if they were different sets"""
+        i = self.find(i)
+        j = self.find(j)
+        if i == j:
+            return False
+        if self.size[i] < self.size[j]:
+            i, j = j, i
+        self.parent[j] = i
+        self.size[i] += self.size[j]
+        return True
+
+    def components(self) -> array:
+        """Return array('i') with the set of every index, sets numbered in order of their first index"""
+        numbers = {}
+        return array('i', [numbers.setdefault(self.find(i), len(numbers)) for i in range(len(self.parent))])
+
+    def __len__(self):
+        """Return the number of indices"""
+        return len(self.parent)
+
+
+class ComponentReport:
+    """Each instance of this class summarises the connected components of a graph."""
+
+    def __init__(self, sizes: List[int]) -> None:
+        """
+        Parameters
+        ----------
+        sizes: List[int]
+            Number of vertices of every component, components in order of their first vertex.
+        """
+        self.sizes = list(sizes)
+        self.num_vertices = sum(self.sizes)
+        self.num_components = len(self.sizes)
+        self.is_connected = self.num_components == 1
+        # first of the largest components
+        self.largest_component = max(range(self.num_components), key=self.sizes.__getitem__, default=None)
+        self.largest_size = max(self.sizes, default=0)
+
+    def summary(self) -> str:
+        """Return one line describing the components"""
+        if self.is_connected:
+            return f"Graph is connected ({self.num_vertices} vertices)."
+        return (f"Graph not connected: {self.num_components} components, "
+                f"the largest has {self.largest_size} of {self.num_vertices} vertices.")
+
+    def __repr__(self):
+        """Return a Python-like representation of this instance"""
+        return (f"ComponentReport(vertices={self.num_vertices}, components={self.num_components}, "
+                f"largest={self.largest_size})")
+
+
+class ComponentTracker:
+    """Each instance of this class keeps the connected components of the edges added to it so far."""
+
+    def __init__(self) -> None:
+        if np is not None:
+            # labels seen in increasing order with their dense index, and the labels in order of first appearance
+            self._known = np.empty(0, dtype=np.int64)
+            self._known_index = np.empty(0, dtype=np.int64)
+            self._labels = []
+            # parents of the dense indices, grown by doubling
+            self._parent = np.empty(0, dtype=np.int64)
+            self._num_vertices = 0
+        else:
+            self._index = {}
+            self._union_find = UnionFind()
+
+    def _dense(self, values):
+        """Return the dense indices of an int64 array of labels, adding the labels not seen before"""
+        distinct, first, inverse = _first_occurrences(values)
+        position = np.searchsorted(self._known, distinct)
+        found = position < len(self._known)
+        found[found] = self._known[position[found]] == distinct[found]
+
+        index = np.empty(len(distinct), dtype=np.int64)
+        index[found] = self._known_index[position[found]]
+        new = np.flatnonzero(~found)
+        # new labels get the next indices in order of first appearance
+        by_appearance = new[np.argsort(first[new])]
+        start = self._num_vertices
+        index[by_appearance] = np.arange(start, start + len(new))
+
+        # positions of new labels are in increasing order, so inserting keeps the table sorted
+        self._known = np.insert(self._known, position[new], distinct[new])
+        self._known_index = np.insert(self._known_index, position[new], index[new])
+        self._labels.append(distinct[by_appearance])
+
+        self._num_vertices = end = start + len(new)
+        if end > len(self._parent):
+            parent = np.empty(max(end, 2 * len(self._parent)), dtype=np.int64)
+            parent[:start] = self._parent[:start]
+            self._parent = parent
+        self._parent[start:end] = np.arange(start, end)
+        return index[inverse]
+
+    def _compress(self) -> None:
+        """Point every index straight to its root by pointer jumping"""
+        parent = self._parent[:self.num_vertices]
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                return
+            parent[:] = grandparent
+
+    def add_edges(self, edges) -> None:
+        """Join the ends of a batch of edges: an (E x 2) int array with numpy, otherwise an iterable of tuples of
+        2 vertex labels.
+        """
+        if np is not None:
+            edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+            if not len(edges):
+                return
+            pairs = self._dense(edges.ravel()).reshape(-1, 2)
+            parent = self._parent
+            # with compressed parents the parent of an index is its root
+            first, second = pairs[:, 0], pairs[:, 1]
+            while True:
+                first_roots = parent[first]
+                second_roots = parent[second]
+                different = first_roots != second_roots
+                if not different.any():
+                    return
+                first, second = first[different], second[different]
+                first_roots, second_roots = first_roots[different], second_roots[different]
+                # every root is hooked below the smallest root it shares an edge with, not the last one written
+                np.minimum.at(parent, np.maximum(first_roots, second_roots), np.minimum(first_roots, second_roots))
+                self._compress()
+
+        index = self._index
+        union_find = self._union_find
+        for u, v in edges:
+            i = index.get(u)
+            if i is None:
+                i = index[u] = union_find.add()
+            j = index.get(v)
+            if j is None:
+                j = index[v] = union_find.add()
+            union_find.union(i, j)
+
+    @property
+    def num_vertices(self) -> int:
+        """Return the number of vertices seen so far"""
+        if np is not None:
+            return self._num_vertices
+        return len(self._union_find)
+
+    @property
+    def labels(self) -> list:
+        """Return the vertex labels in order of their dense index"""
+        if np is not None:
+            return np.concatenate(self._labels).tolist() if self._labels else []
+        return list(self._index)
+
+    def components(self) -> array:
+        """Return array('i') with the component of every vertex, components numbered in order of their first vertex"""
+        if np is None:
+            return self._union_find.components()
+
+        # roots are the smallest index of their component, so numbering the roots in order numbers the components
+        roots = self._parent[:self.num_vertices]
+        is_root = roots == np.arange(self.num_vertices)
+        numbers = np.cumsum(is_root) - 1
+        return array('i', numbers[roots].astype(np.int32).tobytes())
+
+    def report(self) -> ComponentReport:
+        """Return the ComponentReport of the edges added so far"""
+        components = self.components()
+        if np is not None:
+            return ComponentReport(np.bincount(np.frombuffer(components, dtype=np.int32)).tolist())
+        sizes = [0] * (max(components) + 1 if len(components) else 0)
+        for component in components:
+            sizes[component] += 1
+        return ComponentReport(sizes)
+
+    def __repr__(self):
+        """Return a Python-like representation of this instance"""
+        return f"ComponentTracker(vertices={self.num_vertices})"
+
+
+def edge_components(edges: Iterable) -> ComponentTracker:
+    """Return the ComponentTracker of a list of edges (tuples of 2 vertex labels) or an (E x 2) int array"""
+    tracker = ComponentTracker()
+    tracker.add_edges(edges)
+    return tracker
+
+
+def file_components(file_path: str, chunk_size: int = 1 << 23,
+                    report: Optional[ParseReport] = None) -> ComponentTracker:
+    """Return the ComponentTracker of the edge file at file_path, read in chunks of about chunk_size bytes without
+    keeping the edges. Lines are counted in report if one is given.
+    """
+    tracker = ComponentTracker()
+    for batch in iter_edge_batches(file_path, chunk_size, report):
+        tracker.add_edges(batch)
+    return tracker
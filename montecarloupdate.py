@@ -1,32 +1,19 @@
-import random
-import math
-
-def monte_carlo(self) -> None:
-    """Visit each site of the graph and swap colour if the exponential of the local action > a random float between 0,1.
+def monte_carlo(self, acceptance_table: list) -> None:
+    """Visit each site of the graph and swap colour with the acceptance probability of its local action.
     Parameters
     ----------
-    graph : list
-        DESCRIPTION. # TODO
-
-    # add tests
+    acceptance_table : list
+        Probability of swapping a site with local action a at index a + maximum degree, precomputed once per
+        temperature (see acceptance_table in minimal_frustration_graph/graph.py).
     """
-    vertices_list = self.vertices_list
-    vertices_frustration = self.vertices_frustration
-    val_map = self.val_map
-
-    # iterate over vertices in vertices_dictionary
-    for vertex in vertices_list:
-        # set local action for each vertex
-        local_action = vertices_frustration[vertex]
-        if local_action > 0:
-            current_color = val_map[vertex]  # set current color
-            random_number = random.uniform(0, 1)  # generate random float between 0 and 1
-            exp_local_action = math.exp(local_action)
-
-            if exp_local_action > random_number: #compare exponent to random number
-                new_color = 1.0 if current_color != 1.0 else 0.0 # swap current colour
-                val_map[vertex] = new_color
-                self.update_vertex_frustration()  # update vertices frustration
-                print("The colours of the sites have been swapped.")
+    local_actions = self.local_actions
+    # the table has one entry for every local action from -max_degree to max_degree
+    max_degree = len(acceptance_table) // 2
 
+    # draw the random numbers of the whole sweep at once from the seeded stream of the graph
+    random_numbers = self.rng.random_block(len(local_actions))
 
+    # iterate over vertices in order of their dense index
+    for i in range(len(local_actions)):
+        if random_numbers[i] < acceptance_table[local_actions[i] + max_degree]:
+            self._flip(i)  # swap colour and update frustrations